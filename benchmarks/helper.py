@@ -0,0 +1,19 @@
+import os
+import timeit
+
+from tests.helper import get_resource_dir
+
+
+def read_resource(fn):
+    with open(os.path.join(get_resource_dir(), fn), "r") as fd:
+        return fd.read()
+
+
+def per_call(f, number):
+    """Return the mean wall-clock seconds of calling `f`."""
+    f()  # warm up
+    return timeit.timeit(f, number=number) / number
+
+
+def report(label, seconds):
+    print(f"{label:<48} {seconds * 1e3:10.3f} ms")
@@ -0,0 +1,65 @@
+"""
+Per-call cost of lexing a TLC state expression.
+
+Compares building a fresh `Lexer` on every call (the previous behavior of
+`lex._lex`) with reusing the lexer returned by `lex.get_lexer`, and
+finding the beginning of line of each token by searching back in the input
+(the previous behavior of `lex._map_to_token`) with bisecting the offsets
+of the lines, on a long single-line expression.
+
+    python -m benchmarks.lex_benchmark
+"""
+from modelator_py.util.tla import _location, lex
+from modelator_py.util.tla import tokens as tokens_
+
+from .helper import per_call, read_resource, report
+
+NUMBER = 200
+LONG_LINE_TERMS = 50000
+
+
+def lex_with_new_lexer(data):
+    lexer = lex.Lexer()
+    lexer.input(data)
+    return list(lexer)
+
+
+def map_with_rfind(data, lextokens):
+    tokens = list()
+    for token in lextokens:
+        bol = lex.find_beginning_of_line(data, token)
+        start = token.lexpos
+        stop = start + len(token.value)
+        start_loc = _location.locus_of_position("", token.lineno, bol, start)
+        stop_loc = _location.locus_of_position("", token.lineno, bol, stop)
+        loc = start_loc.merge(stop_loc)
+        tokens.append(tokens_.Token(lex._map_to_token_(token), None, loc))
+    return tokens
+
+
+def map_with_line_starts(data, lextokens):
+    line_starts = lex._line_starts(data)
+    return [
+        lex._map_to_token(data, token, line_starts=line_starts) for token in lextokens
+    ]
+
+
+def main():
+    data = read_resource("TlcStateExpressionExample4.txt")
+    before = per_call(lambda: lex_with_new_lexer(data), NUMBER)
+    after = per_call(lambda: lex._lex(data), NUMBER)
+    report("lex, new Lexer per call", before)
+    report("lex, reused Lexer", after)
+    print(f"speedup: {before / after:.1f}x")
+
+    data = " + ".join(f"x{i}" for i in range(LONG_LINE_TERMS))
+    lextokens = lex._lex(data)
+    before = per_call(lambda: map_with_rfind(data, lextokens), 1)
+    after = per_call(lambda: map_with_line_starts(data, lextokens), 1)
+    report("locate tokens of long line, rfind", before)
+    report("locate tokens of long line, line starts", after)
+    print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
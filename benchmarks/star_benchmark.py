@@ -0,0 +1,69 @@
+"""
+Scaling of the repetition combinators `star` and `sep1` with the number of
+repetitions, on a set literal `{0, 1, ..., n - 1}` of up to 10k elements.
+
+Compares `star` with the previous implementation, which folded the replies
+pairwise into new lists and so took time quadratic in their number, then
+times parsing the whole set literal.
+
+    python -m benchmarks.star_benchmark
+"""
+from modelator_py.util.tla import _combinators as pco
+from modelator_py.util.tla import lex, parser, to_str
+
+from .helper import per_call, report
+
+SIZES = [1250, 2500, 5000, 10000]
+
+
+def quadratic_star(ap):
+    def f(pst):
+        results = list()
+        while True:
+            memo = pco.save(pst)
+            arep = pco.exec_(ap, pst)
+            if isinstance(arep.res, pco.Failed):
+                pco.restore(memo, pst)
+                break
+            results.append(arep)
+        results.append(pco.Reply(res=pco.Parsed(list()), loc=pst.lastpos))
+
+        def reducer(arep, brep):
+            ab = [arep.res.value] + brep.res.value
+            loc = pco.fuse(arep.loc, brep.loc)
+            return pco.Reply(res=pco.Parsed(ab), loc=loc)
+
+        while len(results) > 1:
+            r = reducer(results[-2], results[-1])
+            results = results[:-2] + [r]
+        return results[0]
+
+    return pco.Prs(f)
+
+
+def set_literal(n):
+    return "{" + ", ".join(str(i) for i in range(n)) + "}"
+
+
+def scan_all(star, tokens):
+    r, _ = pco.run(star(pco.satisfy(lambda t: True)), init=None, source=tokens)
+    assert len(r) == len(tokens)
+    return r
+
+
+def main():
+    for n in SIZES:
+        tokens = lex.tokenize(set_literal(n), omit_preamble=False)
+        before = per_call(lambda: scan_all(quadratic_star, tokens), 3)
+        after = per_call(lambda: scan_all(pco.star, tokens), 3)
+        report(f"star over {len(tokens)} tokens, quadratic fold", before)
+        report(f"star over {len(tokens)} tokens, in place", after)
+    for n in SIZES:
+        expr = set_literal(n)
+        seconds = per_call(lambda: parser.parse_expr(expr, nodes=to_str.Nodes), 1)
+        report(f"parse set literal of {n} elements", seconds)
+        print(f"{'':<48} {seconds / n * 1e6:10.1f} us/element")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,16 @@
 from .args import ApalacheArgs
 from .pure import PureCmd as ApalachePureCmd
-from .pure import apalache_pure
+from .pure import apalache_pure, apalache_pure_async, apalache_pure_batch
 from .raw import RawCmd as ApalacheRawCmd
-from .raw import apalache_raw
+from .raw import apalache_raw, apalache_raw_async
 
 __all__ = [
     "ApalacheArgs",
     "ApalachePureCmd",
     "ApalacheRawCmd",
     "apalache_pure",
+    "apalache_pure_async",
+    "apalache_pure_batch",
     "apalache_raw",
+    "apalache_raw_async",
 ]
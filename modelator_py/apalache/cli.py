@@ -1,6 +1,8 @@
 import json as stdjson
 
-from .pure import apalache_pure
+from ..cache import ResultCache
+from ..helper import write_json
+from .pure import apalache_pure, apalache_pure_batch
 from .raw import ApalacheArgs, RawCmd, apalache_raw
 
 
@@ -8,7 +10,7 @@ class Apalache:
     def __init__(self, stdin):
         self._stdin = stdin
 
-    def pure(self):
+    def pure(self, *, cache=False, refresh_cache=False, output_format="pretty"):
         """
         Run Apalache without side effects using json input data.
 
@@ -19,15 +21,62 @@ class Apalache:
         Writes the result to stdout in json.
 
         Requires json input data on stdin (`<command> < data.json`).
+
+        Arguments:
+            cache : Reuse the result of an earlier run of the same jar, args and files?
+            refresh_cache : Run Apalache even if the result is cached, and cache the new result?
+            output_format : Print the result "pretty" (default), "compact" or "ndjson" (one line).
         """
         assert (
             self._stdin is not None
         ), "The pure interface requires json input in stdin"
         json_dict = stdjson.loads(self._stdin.read())
 
-        result = apalache_pure(json=json_dict)
-        to_print = stdjson.dumps(result, indent=4, sort_keys=True)
-        print(to_print)
+        result = apalache_pure(
+            json=json_dict, cache=_result_cache(cache, refresh_cache)
+        )
+        write_json(result, output_format=output_format)
+
+    def batch(
+        self,
+        *,
+        max_jobs=None,
+        max_cores=None,
+        max_memory=None,
+        cache=False,
+        refresh_cache=False,
+    ):
+        """
+        Run many Apalache commands without side effects, concurrently.
+
+        Reads one json command per line on stdin (NDJSON), in the format of the
+        pure command, and writes one json result per line as each command
+        finishes. Each result has an "index" field with the position of its
+        command in the input (counting every line from 0, blank lines included),
+        and an "error" field if the command failed. Blank lines are skipped.
+
+        Arguments:
+            max_jobs : Number of Apalache processes to run at once (default: cpu count).
+            max_cores : Number of cores to share between the processes (default: cpu count).
+            max_memory : Total memory for the processes, e.g. 16g (default: unbounded).
+            cache : Reuse the results of earlier runs of the same jar, args and files?
+            refresh_cache : Run Apalache even if results are cached, and cache the new results?
+        """
+        assert (
+            self._stdin is not None
+        ), "The batch interface requires NDJSON input in stdin"
+        line_numbers = []  # line number of each job
+
+        results = apalache_pure_batch(
+            jsons=_non_blank_lines(self._stdin, line_numbers),
+            max_jobs=max_jobs,
+            max_cores=max_cores,
+            max_memory=max_memory,
+            cache=_result_cache(cache, refresh_cache),
+        )
+        for index, result in results:
+            index = line_numbers[index]
+            write_json({"index": index, **result}, output_format="ndjson")
 
     def raw(
         self,
@@ -165,3 +214,17 @@ class Apalache:
 
         to_print = stdjson.dumps(obj_to_print, indent=4, sort_keys=True)
         print(to_print)
+
+
+def _non_blank_lines(lines, line_numbers):
+    """Yield the lines that are not blank, appending their numbers to line_numbers."""
+    for number, line in enumerate(lines):
+        if line.strip():
+            line_numbers.append(number)
+            yield line
+
+
+def _result_cache(cache, refresh_cache):
+    if not (cache or refresh_cache):
+        return None
+    return ResultCache(refresh=refresh_cache)
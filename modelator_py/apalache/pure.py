@@ -1,12 +1,24 @@
+import asyncio
+import functools
+import json as stdjson
 import logging
 import os
 import tempfile
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from typing import Optional
 
-from ..helper import get_dirnames_in_dir, read_entire_dir_contents
+import pathos.multiprocessing as multiprocessing
+
+from ..cache import cached_run
+from ..helper import (
+    get_dirnames_in_dir,
+    parse_memory,
+    read_entire_dir_contents,
+    run_batch,
+    temporary_directory_async,
+)
 from .args import ApalacheArgs
-from .raw import RawCmd, apalache_raw
+from .raw import RawCmd, apalache_raw, apalache_raw_async
 
 LOG = logging.getLogger(__name__)
 
@@ -20,11 +32,14 @@ class PureCmd:
     ] = None  # Location of Apalache jar (full path with suffix like apalache.jar)
     args: Optional[ApalacheArgs] = None  # Apalache args
     files: Optional[str] = None  # Current working directory for child shell process
+    max_heap: Optional[str] = None  # Maximum JVM heap size (java -Xmx), e.g. "4g"
 
 
 # Used to overwrite Apalache's "--out-dir" flag
 APALACHE_OUT_DIR_NAME = "out"
 
+TEMP_DIR_PREFIX = "modelator-py-apalache-temp-dir-"
+
 
 def json_to_cmd(json) -> PureCmd:
     json = {
@@ -32,11 +47,13 @@ def json_to_cmd(json) -> PureCmd:
             "files": None,
             "jar": None,
             "args": None,
+            "max_heap": None,
         },
         **json,
     }
     cmd = PureCmd()
     cmd.jar = json["jar"]
+    cmd.max_heap = json["max_heap"]
     cmd.args = ApalacheArgs(**json["args"])
     cmd.files = json["files"]
     return cmd
@@ -97,11 +114,13 @@ def read_apalache_output_into_memory(full_dirname):
     return all_files
 
 
-def apalache_pure(*, cmd: PureCmd = None, json=None):  # type: ignore
+def apalache_pure(*, cmd: PureCmd = None, json=None, cache=None):  # type: ignore
     """
     Run a Apalache command using either a PureCmd object, or build the PureCmd from json.
 
-    Run Apalache without side effects in a temporary directory.
+    Run Apalache without side effects in a temporary directory. If a ResultCache
+    is given as cache, a result it holds for the same jar, args and files is
+    returned without running Apalache.
 
     Returns an ExecutionResult with .process and .files properties. Contains the
     subprocess result, and the list of filesystem files (and contents).
@@ -112,41 +131,91 @@ def apalache_pure(*, cmd: PureCmd = None, json=None):  # type: ignore
     if json is not None:
         cmd = json_to_cmd(json)
 
+    raw_cmd = _to_raw_cmd(cmd)
+
+    def run():
+        with tempfile.TemporaryDirectory(prefix=TEMP_DIR_PREFIX) as dirname:
+            raw_cmd.cwd = dirname
+            _write_files(dirname, cmd.files)
+
+            result = apalache_raw(cmd=raw_cmd)
+
+            files = _read_output_files(dirname, cmd.files)
+
+        return _to_dict(files, result)
+
+    return cached_run(cache, "apalache", cmd, raw_cmd.args, run)
+
+
+async def apalache_pure_async(
+    *, cmd: PureCmd = None, json=None, timeout=None, on_stdout=None, on_stderr=None
+):
+    """
+    Like apalache_pure, for asyncio. The temporary directory is set up and torn
+    down in the default executor of the event loop, and Apalache runs as in
+    apalache_raw_async.
+
+    Each line of Apalache's stdout (stderr) is passed to on_stdout (on_stderr) as
+    bytes as soon as it is printed. If timeout seconds pass, or the task is
+    cancelled, Apalache is killed and asyncio.TimeoutError (CancelledError) is
+    raised.
+    """
+    assert not (cmd is not None and json is not None)
+    assert (cmd is not None) or (json is not None)
+    if json is not None:
+        cmd = json_to_cmd(json)
+
+    raw_cmd = _to_raw_cmd(cmd)
+    loop = asyncio.get_running_loop()
+
+    async with temporary_directory_async(prefix=TEMP_DIR_PREFIX) as dirname:
+        raw_cmd.cwd = dirname
+        await loop.run_in_executor(None, _write_files, dirname, cmd.files)
+
+        result = await apalache_raw_async(
+            cmd=raw_cmd, timeout=timeout, on_stdout=on_stdout, on_stderr=on_stderr
+        )
+
+        files = await loop.run_in_executor(None, _read_output_files, dirname, cmd.files)
+
+    return _to_dict(files, result)
+
+
+def _to_raw_cmd(cmd: PureCmd) -> RawCmd:
     raw_cmd = RawCmd()
     raw_cmd.args = cmd.args
     raw_cmd.jar = cmd.jar
+    raw_cmd.max_heap = cmd.max_heap
 
     if raw_cmd.args.out_dir is not None:
         raise Exception(
             "--out-dir flag value is not None but Apalache pure command overwrites\
 this flag. Do not include a value for this flag."
         )
-    raw_cmd.args.out_dir = "out"
+    raw_cmd.args.out_dir = APALACHE_OUT_DIR_NAME
+    return raw_cmd
 
-    ret = {}
 
-    result = None
+def _write_files(dirname, files):
+    for filename, file_content_str in files.items():
+        full_path = os.path.join(dirname, filename)
+        with open(full_path, "w") as fd:
+            fd.write(file_content_str)
 
-    with tempfile.TemporaryDirectory(
-        prefix="modelator-py-apalache-temp-dir-"
-    ) as dirname:
-        raw_cmd.cwd = dirname
-        for filename, file_content_str in cmd.files.items():
-            full_path = os.path.join(dirname, filename)
-            with open(full_path, "w") as fd:
-                fd.write(file_content_str)
 
-        result = apalache_raw(cmd=raw_cmd)
+def _read_output_files(dirname, input_files):
+    try:
+        files = read_apalache_output_into_memory(dirname)
+    except FileNotFoundError:
+        files = dict()
 
-        try:
-            ret["files"] = read_apalache_output_into_memory(dirname)
-        except FileNotFoundError:
-            ret["files"] = dict()
+    # Throw out the files that the user originally gave as input
+    return {fn: content for fn, content in files.items() if fn not in input_files}
 
-        # Throw out the files that the user originally gave as input
-        ret["files"] = {
-            fn: content for fn, content in ret["files"].items() if fn not in cmd.files
-        }
+
+def _to_dict(files, result):
+    ret = {}
+    ret["files"] = files
 
     stdout_pretty = result.stdout.decode()
     stderr_pretty = result.stderr.decode()
@@ -157,3 +226,75 @@ this flag. Do not include a value for this flag."
     ret["stderr"] = stderr_pretty
 
     return ret
+
+
+def apalache_pure_batch(
+    *,
+    cmds=None,
+    jsons=None,
+    max_jobs=None,
+    max_cores=None,
+    max_memory=None,
+    cache=None,
+):
+    """
+    Run many Apalache commands, as apalache_pure, with bounded concurrency.
+
+    Takes an iterable of PureCmd objects or of json objects (or of strings
+    holding them, e.g. NDJSON lines). Yields (index of the command, result)
+    pairs as the jobs finish. A job that fails yields {"error": "<description>"}
+    as its result without affecting the other jobs.
+
+    Arguments:
+        max_jobs : number of Apalache processes to run at once (default: cpu count)
+        max_cores : number of cores to share between the processes, as counted
+            by their --nworkers argument (default: cpu count)
+        max_memory : total memory for the processes, in bytes or like "16g".
+            Split evenly between max_jobs as the JVM heap of commands without
+            max_heap.
+        cache : a ResultCache to take results from and store them in
+    """
+    assert (cmds is None) != (jsons is None)
+
+    if max_jobs is None:
+        max_jobs = multiprocessing.cpu_count()
+    share = None
+    if max_memory is not None:
+        share = parse_memory(max_memory) // max_jobs
+
+    def prepare():
+        for job in cmds if jsons is None else jsons:
+            try:
+                if jsons is not None:
+                    if isinstance(job, str):
+                        job = stdjson.loads(job)
+                    job = json_to_cmd(job)
+                if share is not None and job.max_heap is None:
+                    job = replace(job, max_heap=f"{share // 1024}k")
+                yield job
+            except Exception as e:
+                yield e
+
+    return run_batch(
+        functools.partial(_run_prepared, cache=cache),
+        prepare(),
+        resources=_resources,
+        max_jobs=max_jobs,
+        max_cores=max_cores,
+        max_memory=max_memory,
+    )
+
+
+def _run_prepared(cmd, *, cache=None):
+    if isinstance(cmd, Exception):
+        raise cmd
+    return apalache_pure(cmd=cmd, cache=cache)
+
+
+def _resources(cmd):
+    """Cores and bytes of memory used by the Apalache process running cmd."""
+    cores = int(cmd.args.nworkers or 1)
+    memory = 0
+    if cmd.max_heap is not None:
+        memory = parse_memory(cmd.max_heap)
+    return cores, memory
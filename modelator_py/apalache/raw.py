@@ -4,6 +4,7 @@ import tempfile
 from dataclasses import asdict, dataclass
 from typing import Optional
 
+from ..helper import run_process_async, temporary_directory_async
 from .args import ApalacheArgs
 
 # mypy: ignore-errors
@@ -16,6 +17,7 @@ class RawCmd:
         str
     ] = None  # Location of Apalache jar (full path with suffix like apalache.jar)
     args: Optional[ApalacheArgs] = None  # Apalache args
+    max_heap: Optional[str] = None  # Maximum JVM heap size (java -Xmx), e.g. "4g"
 
 
 def stringify_raw_cmd(cmd: RawCmd, java_temp_dir: str = None):
@@ -28,6 +30,11 @@ def stringify_raw_cmd(cmd: RawCmd, java_temp_dir: str = None):
     else:
         tmpdir_setup = " -Djava.io.tmpdir={}".format(java_temp_dir)
 
+    if cmd.max_heap is None:
+        heap_setup = ""
+    else:
+        heap_setup = f" -Xmx{cmd.max_heap}"
+
     def stringify(value):
         # Apalache will not accept capitalized bools
         if isinstance(value, bool):
@@ -36,7 +43,7 @@ def stringify_raw_cmd(cmd: RawCmd, java_temp_dir: str = None):
 
     args = ApalacheArgs(**{k: stringify(v) for k, v in asdict(args).items()})
 
-    cmd_str = f"""java{tmpdir_setup}\
+    cmd_str = f"""java{tmpdir_setup}{heap_setup}\
  -jar "{jar}"\
 {f" --config-file={args.config_file}" if args.config_file is not None else ""}\
 {f" --debug={args.debug}" if args.debug is not None else ""}\
@@ -85,12 +92,14 @@ def json_to_cmd(json) -> RawCmd:
             "cwd": None,
             "jar": None,
             "args": None,
+            "max_heap": None,
         },
         **json,
     }
     cmd = RawCmd()
     cmd.cwd = json["cwd"]
     cmd.jar = json["jar"]
+    cmd.max_heap = json["max_heap"]
     cmd.args = ApalacheArgs(**json["args"])
     return cmd
 
@@ -109,6 +118,56 @@ def apalache_raw(*, cmd: RawCmd = None, json=None):
     if json is not None:
         cmd = json_to_cmd(json)
 
+    check_paths(cmd)
+
+    with tempfile.TemporaryDirectory(
+        prefix="modelator-py-apalache-java-temp-dir-"
+    ) as java_temp:
+        cmd_str = stringify_raw_cmd(cmd, java_temp_dir=java_temp)
+
+        # Semantics a bit complex here - see https://stackoverflow.com/a/15109975/8346628
+        return subprocess.run(cmd_str, shell=True, capture_output=True, cwd=cmd.cwd)
+
+
+async def apalache_raw_async(
+    *, cmd: RawCmd = None, json=None, timeout=None, on_stdout=None, on_stderr=None
+):
+    """
+    Like apalache_raw, for asyncio: run Apalache as a child process of the event
+    loop.
+
+    Each line of Apalache's stdout (stderr) is passed to on_stdout (on_stderr) as
+    bytes as soon as it is printed. If timeout seconds pass, or the task is
+    cancelled, Apalache is killed and asyncio.TimeoutError (CancelledError) is
+    raised.
+
+    Returns a subprocess call result object.
+    """
+    assert cmd is not None or json is not None
+    assert not (cmd is not None and json is not None)
+
+    if json is not None:
+        cmd = json_to_cmd(json)
+
+    check_paths(cmd)
+
+    async with temporary_directory_async(
+        prefix="modelator-py-apalache-java-temp-dir-"
+    ) as java_temp:
+        cmd_str = stringify_raw_cmd(cmd, java_temp_dir=java_temp)
+        return await run_process_async(
+            cmd_str,
+            cwd=cmd.cwd,
+            timeout=timeout,
+            on_stdout=on_stdout,
+            on_stderr=on_stderr,
+        )
+
+
+def check_paths(cmd: RawCmd):
+    """
+    Expand the user in cmd.cwd and cmd.jar and check that both are absolute.
+    """
     if cmd.cwd is not None:
         cmd.cwd = os.path.expanduser(cmd.cwd)
         if not os.path.isabs(cmd.cwd):
@@ -121,11 +180,3 @@ def apalache_raw(*, cmd: RawCmd = None, json=None):
             raise Exception("Apalache jar path must be absolute (after expanding user)")
     if cmd.jar is None:
         raise Exception("Apalache jar path must be absolute (after expanding user)")
-
-    with tempfile.TemporaryDirectory(
-        prefix="modelator-py-apalache-java-temp-dir-"
-    ) as java_temp:
-        cmd_str = stringify_raw_cmd(cmd, java_temp_dir=java_temp)
-
-        # Semantics a bit complex here - see https://stackoverflow.com/a/15109975/8346628
-        return subprocess.run(cmd_str, shell=True, capture_output=True, cwd=cmd.cwd)
@@ -0,0 +1,268 @@
+import hashlib
+import json as stdjson
+import os
+import tempfile
+import threading
+import time
+from dataclasses import asdict
+
+from .helper import parse_memory
+
+# mypy: ignore-errors
+
+# Bump to invalidate all existing entries when the format of results changes
+CACHE_VERSION = 2
+
+DEFAULT_MAX_SIZE = "1g"
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60  # seconds
+# Seconds between two scans of the cache for expired entries
+EVICT_INTERVAL = 60 * 60
+# Fraction of max_size that a store going over max_size evicts down to, so that
+# the next stores have room without scanning again
+EVICT_TO = 0.9
+
+
+def default_cache_dir():
+    """$MODELATOR_PY_CACHE_DIR, else modelator-py in the user's cache directory."""
+    if "MODELATOR_PY_CACHE_DIR" in os.environ:
+        return os.environ["MODELATOR_PY_CACHE_DIR"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "modelator-py")
+
+
+class ResultCache:
+    """
+    On-disk cache of the results of tlc_pure and apalache_pure, so that running
+    the same command on the same model again returns the stored result without
+    starting Java.
+
+    Results are stored under a hash of the jar contents, the arguments, the JVM
+    heap size and the input files. Entries older than max_age seconds are
+    dropped, and the oldest entries are dropped while the cache takes more than
+    max_size (in bytes or like "512m"). The directory is scanned for entries to
+    drop on the first store, then when the stores push the size over max_size,
+    or once EVICT_INTERVAL seconds have passed since the last scan. With
+    refresh=True stored results are ignored, and the new results replace them.
+
+    Only use it with commands that are deterministic: e.g. TLC's -simulate
+    without a -seed is not.
+    """
+
+    def __init__(
+        self,
+        directory=None,
+        *,
+        max_size=DEFAULT_MAX_SIZE,
+        max_age=DEFAULT_MAX_AGE,
+        refresh=False,
+    ):
+        self.directory = directory if directory is not None else default_cache_dir()
+        self.max_size = parse_memory(max_size) if max_size is not None else None
+        self.max_age = max_age
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        self._size = None  # estimated size in bytes, None until scanned
+        self._scanned = None  # time of the last scan
+
+    def key(self, tool, jar, args, files, max_heap=None) -> str:
+        """
+        The key of running tool (e.g. "tlc") from jar with args on files, in a
+        JVM with max_heap.
+        """
+        h = hashlib.sha256()
+        h.update(f"{CACHE_VERSION}\0{tool}\0{jar_digest(jar)}\0".encode())
+        h.update(f"{max_heap}\0".encode())
+        h.update(_normalize_args(args).encode())
+        for filename in sorted(files):
+            content = files[filename].encode()
+            h.update(f"\0{filename}\0{len(content)}\0".encode())
+            h.update(content)
+        return h.hexdigest()
+
+    def get(self, key):
+        """The result stored under key, or None."""
+        if self.refresh:
+            return None
+        path = self._path(key)
+        try:
+            if self._expired(os.stat(path).st_mtime):
+                return None
+            with open(path, "r") as fd:
+                return stdjson.load(fd)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, result):
+        """Store result under key, then evict entries over the limits if due."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file and rename, so that concurrent readers
+        # never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                stdjson.dump(result, f)
+            size = os.stat(temp_path).st_size
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        if self._grow(size):
+            self.evict(low_water=True)
+
+    def _grow(self, size) -> bool:
+        """Count size more bytes. Is a scan for entries to evict due?"""
+        with self._lock:
+            if self._size is None:
+                return True
+            # Replaced entries are counted twice, which only scans earlier
+            self._size += size
+            return (self.max_size is not None and self.max_size < self._size) or (
+                self.max_age is not None
+                and EVICT_INTERVAL <= time.time() - self._scanned
+            )
+
+    def evict(self, low_water=False):
+        """
+        Remove expired entries, then the oldest ones above max_size (or, with
+        low_water, above EVICT_TO times max_size).
+        """
+        entries = []
+        for path in self._entries():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if self._expired(stat.st_mtime):
+                _remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        if self.max_size is not None:
+            limit = self.max_size * EVICT_TO if low_water else self.max_size
+            for _, size, path in sorted(entries):
+                if total <= limit:
+                    break
+                _remove(path)
+                total -= size
+        with self._lock:
+            self._size = total
+            self._scanned = time.time()
+
+    def clear(self):
+        """Remove all entries."""
+        for path in self._entries():
+            _remove(path)
+        with self._lock:
+            self._size = 0
+            self._scanned = time.time()
+
+    def stats(self):
+        """Number of entries and their total size in bytes."""
+        sizes = []
+        for path in self._entries():
+            try:
+                sizes.append(os.stat(path).st_size)
+            except OSError:
+                continue
+        return {"directory": self.directory, "entries": len(sizes), "size": sum(sizes)}
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _expired(self, mtime):
+        return self.max_age is not None and self.max_age < time.time() - mtime
+
+    def _entries(self):
+        if not os.path.isdir(self.directory):
+            return
+        for subdir in os.scandir(self.directory):
+            if subdir.is_dir():
+                for entry in os.scandir(subdir.path):
+                    if entry.name.endswith(".json"):
+                        yield entry.path
+
+
+def cached_run(cache, tool, cmd, args, run):
+    """
+    Return the result of run() for cmd, which has .jar, .files and .max_heap,
+    running tool with args. If cache is a ResultCache, a stored result is
+    returned instead of calling run, and a new result is stored if the tool ran
+    (see tool_ran).
+    """
+    if cache is None:
+        return run()
+    # The jar path is taken as check_paths takes it when running the tool
+    jar = os.path.expanduser(cmd.jar) if cmd.jar is not None else None
+    if jar is None or not os.path.isabs(jar):
+        # Let the tool's own checks reject the path
+        return run()
+    key = cache.key(tool, jar, args, cmd.files, cmd.max_heap)
+    result = cache.get(key)
+    if result is None:
+        result = run()
+        if tool_ran(result):
+            cache.put(key, result)
+    return result
+
+
+# Messages of java when the JVM could not start the tool, e.g. with an invalid
+# -Xmx or a missing jar
+JVM_START_ERRORS = [
+    "Error: Could not create the Java Virtual Machine",
+    "Error occurred during initialization of VM",
+    "Error: Unable to access jarfile",
+    "Error: Invalid or corrupt jarfile",
+]
+
+
+def tool_ran(result) -> bool:
+    """
+    Did the tool of the result (as returned by tlc_pure and apalache_pure) run,
+    rather than fail to launch? The shell returns 126 or 127 when java cannot be
+    run, and the return code is negative when a signal killed the process.
+    """
+    return_code = result["return_code"]
+    if return_code < 0 or return_code in (126, 127):
+        return False
+    return not any(error in result["stderr"] for error in JVM_START_ERRORS)
+
+
+def jar_digest(jar) -> str:
+    """sha256 of the contents of the file jar, remembered while it is unchanged."""
+    stat = os.stat(jar)
+    identity = (os.path.realpath(jar), stat.st_size, stat.st_mtime_ns)
+    with _jar_digests_lock:
+        if identity in _jar_digests:
+            return _jar_digests[identity]
+    h = hashlib.sha256()
+    with open(jar, "rb") as fd:
+        for chunk in iter(lambda: fd.read(1 << 20), b""):
+            h.update(chunk)
+    with _jar_digests_lock:
+        _jar_digests[identity] = h.hexdigest()
+    return h.hexdigest()
+
+
+_jar_digests = {}
+_jar_digests_lock = threading.Lock()
+
+
+def _normalize_args(args) -> str:
+    # Unset arguments don't appear in the command line, and values are passed
+    # as strings, so e.g. workers=4 and workers="4" run the same command
+    def normalize(value):
+        if isinstance(value, bool):
+            return str(value).lower()
+        return str(value)
+
+    args = {k: normalize(v) for k, v in asdict(args).items() if v is not None}
+    return stdjson.dumps(args, sort_keys=True)
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
@@ -1,18 +1,33 @@
+import json as stdjson
 import sys
 
 import fire
 
 from .apalache.cli import Apalache
+from .cache import ResultCache
 from .tlc.cli import Tlc
 from .util.cli import Util
 
 
+class Cache:
+    """Manage the cache of results used by the --cache flag of the pure commands."""
+
+    def info(self):
+        """Print the directory, number of entries and size in bytes of the cache."""
+        print(stdjson.dumps(ResultCache().stats(), indent=4, sort_keys=True))
+
+    def clear(self):
+        """Remove all cached results."""
+        ResultCache().clear()
+
+
 class App:
     def __init__(self, stdin):
         self._stdin = stdin
         self.tlc = Tlc(stdin)
         self.apalache = Apalache(stdin)
         self.util = Util(stdin)
+        self.cache = Cache()
 
     def easter(self, fizz, *, foo=True, bar=None, wiz):
         """
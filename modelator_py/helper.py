@@ -1,9 +1,28 @@
+import asyncio
+import collections
+import contextlib
+import functools
+import json as stdjson
 import logging
+import math
 import os
+import queue
+import re
+import shlex
 import shutil
+import subprocess
+import sys
+import tempfile
+import threading
 import typing
 
 import pathos.multiprocessing as multiprocessing
+import pathos.pools as pools
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 LOG = logging.getLogger(__name__)
 
@@ -43,13 +62,382 @@ def delete_dir(path):
     shutil.rmtree(path)
 
 
-def parallel_map(function, data: typing.List):
-    cores = multiprocessing.cpu_count()
+BACKENDS = ("serial", "thread", "process")
+
+# Below this total estimated cost (see parallel_map) the work runs in-process,
+# as handing it to a pool costs more than it saves.
+SERIAL_COST_THRESHOLD = 500
+
+
+def get_pool(backend="process", workers=None):
+    """
+    Return the thread or process pool shared by all parallel_map calls.
+
+    Pools are started on first use and stay alive for the lifetime of the
+    interpreter, so that consecutive calls don't pay the worker startup again.
+    """
+    if backend not in ("thread", "process"):
+        raise ValueError(f"No pool for {backend=}, expected 'thread' or 'process'")
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    key = (backend, workers)
+    if key not in _pools:
+        if backend == "thread":
+            _pools[key] = pools.ThreadPool(workers)
+        else:
+            _pools[key] = pools.ProcessPool(workers)
+    return _pools[key]
+
+
+_pools: typing.Dict[typing.Tuple[str, int], typing.Any] = {}
 
+
+def parallel_map(
+    function,
+    data: typing.List,
+    *,
+    backend=None,
+    workers=None,
+    costs: typing.Optional[typing.List[int]] = None,
+    pool=None,
+):
+    """
+    Map function over data, in order, with the given backend.
+
+    Arguments:
+        backend : "serial", "thread" or "process". By default the data is
+            processed in-process if its total cost is below
+            SERIAL_COST_THRESHOLD, and by the process pool otherwise.
+        workers : number of pool workers (defaults to the number of cores)
+        costs : estimated cost of each item, e.g. its number of states
+            (defaults to 1 per item)
+        pool : an explicit pool to run on, overrides backend and workers
+    """
+    data = list(data)
+    if costs is None:
+        costs = [1] * len(data)
+
+    if pool is None:
+        if backend is None:
+            small = len(data) <= 1 or sum(costs) < SERIAL_COST_THRESHOLD
+            backend = "serial" if small else "process"
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown {backend=}, expected one of {BACKENDS}")
+        if backend == "serial":
+            return [function(e) for e in data]
+        pool = get_pool(backend, workers)
+
+    # Process pools report their size as ncpus, thread pools as nthreads
+    size = getattr(pool, "ncpus", None) or getattr(pool, "nthreads", 1)
+    return pool.map(function, data, chunksize=_chunksize(costs, size))
+
+
+def _chunksize(costs, workers):
     # Make chunk size smaller to fill up gaps
     # if processing time for different chunks differ
     HEURISTIC_PARAM = 2
-    chunksize = len(data) // (cores * HEURISTIC_PARAM)
+    if not costs:
+        return 1
+    target = sum(costs) / (workers * HEURISTIC_PARAM)
+    # Size chunks for the most expensive item, so no chunk gets far above the
+    # target cost when item costs are uneven.
+    return max(1, int(target // max(max(costs), 1)))
+
+
+class LRUCache:
+    """
+    A thread-safe mapping holding at most maxsize entries, which drops the
+    least recently used entry first. Counts hits and misses for tuning maxsize.
+    """
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: typing.OrderedDict = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def map(self, function, keys, mapper=None):
+        """
+        Return [function(key) for key in keys], calling function only once per
+        distinct key that is not cached. The keys to compute are passed as a
+        list to mapper (default: a serial map), e.g. parallel_map.
+        """
+        keys = list(keys)
+        results = [None] * len(keys)
+        missing: typing.Dict = {}  # key -> indices in keys
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    results[i] = self._data[key]
+                    self.hits += 1
+                elif key in missing:
+                    missing[key].append(i)
+                    self.hits += 1
+                else:
+                    missing[key] = [i]
+                    self.misses += 1
+
+        if missing:
+            if mapper is None:
+                values = [function(key) for key in missing]
+            else:
+                values = mapper(function, list(missing))
+            with self._lock:
+                for (key, indices), value in zip(missing.items(), values):
+                    for i in indices:
+                        results[i] = value
+                    self._data[key] = value
+                    self._data.move_to_end(key)
+                while self.maxsize < len(self._data):
+                    self._data.popitem(last=False)
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def parse_memory(size) -> int:
+    """
+    Number of bytes in a memory size given in bytes or, like java's -Xmx, as a
+    string with a k, m or g suffix (e.g. "512m").
+    """
+    if isinstance(size, int):
+        return size
+    m = re.fullmatch(r"\s*(\d+)\s*([kKmMgG]?)\s*", str(size))
+    if m is None:
+        raise ValueError(f"Invalid memory size {size=}")
+    number, unit = m.groups()
+    return int(number) * 1024 ** " kmg".index(unit.lower() or " ")
+
+
+def physical_memory() -> int:
+    """Total physical memory of the machine in bytes."""
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+
+def run_batch(
+    function,
+    jobs: typing.Iterable,
+    *,
+    resources=None,
+    max_jobs=None,
+    max_cores=None,
+    max_memory=None,
+):
+    """
+    Run function on each job in a thread, with bounded concurrency, and yield
+    (index of the job, result) pairs in the order the jobs finish.
+
+    Jobs are started in order, as long as the running jobs leave room for them:
+    at most max_jobs at once, using at most max_cores cores and max_memory bytes
+    in total, as estimated by resources(job) -> (cores, memory in bytes). A job
+    that needs more than the limits on its own runs alone.
+
+    An exception raised by function is returned as the result
+    {"error": "<description>"} of its job and does not affect the other jobs.
+    Jobs are only pulled from the iterable when they can be started.
+    """
+    if max_jobs is None:
+        max_jobs = multiprocessing.cpu_count()
+    if max_cores is None:
+        max_cores = multiprocessing.cpu_count()
+    if max_memory is not None:
+        max_memory = parse_memory(max_memory)
+    if resources is None:
+        resources = lambda job: (1, 0)  # noqa: E731
+
+    done = queue.Queue()
+    running = {}  # index -> (cores, memory)
+
+    def work(index, job):
+        try:
+            result = function(job)
+        except Exception as e:
+            LOG.debug(f"Batch job {index} failed", exc_info=True)
+            result = {"error": f"{type(e).__name__}: {e}"}
+        done.put((index, result))
+
+    def fits(cores, memory):
+        if not running:
+            return True
+        used_cores = sum(c for c, _ in running.values())
+        used_memory = sum(m for _, m in running.values())
+        return (
+            len(running) < max_jobs
+            and used_cores + cores <= max_cores
+            and (max_memory is None or used_memory + memory <= max_memory)
+        )
+
+    jobs = enumerate(jobs)
+    head = next(jobs, None)
+    while head is not None or running:
+        while head is not None:
+            index, job = head
+            try:
+                need = resources(job)
+            except Exception:
+                # The job will report its own error when it runs
+                need = (1, 0)
+            if not fits(*need):
+                break
+            running[index] = need
+            threading.Thread(target=work, args=(index, job), daemon=True).start()
+            head = next(jobs, None)
+
+        index, result = done.get()
+        del running[index]
+        yield index, result
+
+
+@contextlib.asynccontextmanager
+async def temporary_directory_async(prefix):
+    """
+    Like tempfile.TemporaryDirectory, for use with `async with`. Creating and
+    deleting the directory happens in the default executor of the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    mkdtemp = functools.partial(tempfile.mkdtemp, prefix=prefix)
+    dirname = await loop.run_in_executor(None, mkdtemp)
+    try:
+        yield dirname
+    finally:
+        rmtree = functools.partial(shutil.rmtree, dirname, ignore_errors=True)
+        await loop.run_in_executor(None, rmtree)
+
+
+# Longest line of output that run_process_async can pass to its callbacks
+MAX_LINE_LENGTH = 1 << 24
+
+
+async def run_process_async(
+    cmd_str, *, cwd=None, timeout=None, on_stdout=None, on_stderr=None
+):
+    """
+    Run the command in cmd_str (split like a shell would) as a child process
+    and return a subprocess.CompletedProcess with its captured output.
+
+    Each line of stdout (stderr) is passed to on_stdout (on_stderr) as bytes as
+    soon as it is read. If timeout seconds pass, or the calling task is
+    cancelled, the process is killed and asyncio.TimeoutError (CancelledError)
+    is raised.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *shlex.split(cmd_str),
+        cwd=cwd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        limit=MAX_LINE_LENGTH,
+    )
+
+    async def read(stream, callback):
+        lines = []
+        while True:
+            line = await stream.readline()
+            if not line:
+                return b"".join(lines)
+            lines.append(line)
+            if callback is not None:
+                callback(line)
+
+    try:
+        stdout, stderr, returncode = await asyncio.wait_for(
+            asyncio.gather(
+                read(process.stdout, on_stdout),
+                read(process.stderr, on_stderr),
+                process.wait(),
+            ),
+            timeout,
+        )
+    except BaseException:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        raise
+
+    return subprocess.CompletedProcess(cmd_str, returncode, stdout, stderr)
+
+
+OUTPUT_FORMATS = ("pretty", "compact", "ndjson")
+
+
+def write_json(obj, *, output_format="pretty", out=None):
+    """
+    Write obj as Json to out (default: sys.stdout), followed by a newline.
+
+    Formats:
+        pretty : indented by 4 spaces, over many lines
+        compact, ndjson : on a single line without spaces, so that a sequence
+            of objects written this way is NDJSON
+
+    Keys are sorted. Compact output is encoded with orjson when it is
+    installed, and written as bytes to the binary buffer under out if it has
+    one; otherwise the json module encodes it the same way: non-ASCII
+    characters are written as they are, and NaN and infinities as null.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown {output_format=}, expected one of {OUTPUT_FORMATS}")
+    if out is None:
+        out = sys.stdout
+
+    if output_format == "pretty":
+        stdjson.dump(obj, out, indent=4, sort_keys=True)
+        out.write("\n")
+        out.flush()
+        return
+
+    data = None
+    if orjson is not None:
+        try:
+            data = orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            # e.g. integers beyond 64 bits
+            data = None
+    if data is None:
+        out.write(_compact_json(obj))
+        out.write("\n")
+    elif hasattr(out, "buffer"):
+        out.flush()
+        out.buffer.write(data)
+        out.buffer.write(b"\n")
+        out.buffer.flush()
+    else:
+        out.write(data.decode())
+        out.write("\n")
+    out.flush()
+
+
+def _compact_json(obj) -> str:
+    """obj as compact Json, as orjson writes it (up to the spelling of floats)."""
+    options = dict(
+        separators=(",", ":"), sort_keys=True, ensure_ascii=False, allow_nan=False
+    )
+    try:
+        return stdjson.dumps(obj, **options)
+    except ValueError:
+        # NaN or infinities, which are not Json
+        return stdjson.dumps(_finite(obj), **options)
+
 
-    with multiprocessing.ProcessPool(cores) as p:
-        return p.map(function, data, chunksize=chunksize)
+def _finite(value):
+    """value with NaN and infinities replaced by None."""
+    if isinstance(value, dict):
+        return {k: _finite(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(v) for v in value]
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
@@ -0,0 +1,128 @@
+import java.io.BufferedReader;
+import java.io.File;
+import java.io.FileOutputStream;
+import java.io.InputStreamReader;
+import java.io.PrintStream;
+import java.lang.reflect.InvocationTargetException;
+import java.lang.reflect.Method;
+import java.net.URL;
+import java.net.URLClassLoader;
+import java.nio.charset.StandardCharsets;
+
+/**
+ * Runs TLC jobs one after the other in a single, long-lived JVM.
+ *
+ * <p>Launched by modelator_py.tlc.worker as {@code java TlcWorker.java}. Each job
+ * is read from stdin as the lines
+ *
+ * <pre>
+ * TLC jar
+ * cwd
+ * stdout file
+ * stderr file
+ * number of TLC arguments n
+ * argument 1
+ * ...
+ * argument n
+ * </pre>
+ *
+ * and answered on stdout with a single line holding TLC's exit code. TLC's own
+ * output is written to the given files, so that it survives TLC calling
+ * System.exit, which ends the worker with TLC's exit code.
+ *
+ * <p>TLC keeps global state in static fields, so its classes are loaded by a
+ * fresh class loader for every job. The JVM itself and the JDK classes stay warm.
+ */
+public final class TlcWorker {
+
+    public static void main(String[] args) throws Exception {
+        PrintStream protocol = System.out;
+        PrintStream log = System.err;
+        BufferedReader in =
+                new BufferedReader(new InputStreamReader(System.in, StandardCharsets.UTF_8));
+
+        String jarPath;
+        while ((jarPath = in.readLine()) != null) {
+            URL[] jar = {new File(jarPath).toURI().toURL()};
+            String cwd = in.readLine();
+            String stdout = in.readLine();
+            String stderr = in.readLine();
+            String[] tlcArgs = new String[Integer.parseInt(in.readLine())];
+            for (int i = 0; i < tlcArgs.length; i++) {
+                tlcArgs[i] = in.readLine();
+            }
+
+            int exitCode;
+            try (PrintStream out = new PrintStream(new FileOutputStream(stdout), true, "UTF-8");
+                    PrintStream err = new PrintStream(new FileOutputStream(stderr), true, "UTF-8")) {
+                System.setOut(out);
+                System.setErr(err);
+                System.setProperty("user.dir", cwd);
+                try {
+                    exitCode = run(jar, tlcArgs);
+                } catch (Throwable e) {
+                    e.printStackTrace(err);
+                    exitCode = 255;
+                } finally {
+                    System.setOut(protocol);
+                    System.setErr(log);
+                }
+            }
+            protocol.println(exitCode);
+            protocol.flush();
+        }
+    }
+
+    /** Does what tlc2.TLC.main does, without exiting. */
+    private static int run(URL[] jar, String[] args) throws Throwable {
+        ClassLoader parent = ClassLoader.getPlatformClassLoader();
+        try (URLClassLoader loader = new URLClassLoader(jar, parent)) {
+            Thread.currentThread().setContextClassLoader(loader);
+            Class<?> tlcClass = Class.forName("tlc2.TLC", true, loader);
+            Object tlc = tlcClass.getConstructor().newInstance();
+
+            if (!(Boolean) invoke(tlcClass, tlc, "handleParameters", args)) {
+                return 1;
+            }
+            Method checkEnvironment = find(tlcClass, "checkEnvironment");
+            if (checkEnvironment != null && !(Boolean) call(checkEnvironment, tlc)) {
+                return 1;
+            }
+            Class<?> resolverClass = Class.forName("util.FilenameToStream", true, loader);
+            Object resolver =
+                    Class.forName("util.SimpleFilenameToStream", true, loader)
+                            .getConstructor()
+                            .newInstance();
+            Method setResolver = tlcClass.getDeclaredMethod("setResolver", resolverClass);
+            call(setResolver, tlc, resolver);
+
+            return (Integer) invoke(tlcClass, tlc, "process");
+        }
+    }
+
+    private static Object invoke(Class<?> cls, Object obj, String name, String[] args)
+            throws Throwable {
+        return call(cls.getDeclaredMethod(name, String[].class), obj, (Object) args);
+    }
+
+    private static Object invoke(Class<?> cls, Object obj, String name) throws Throwable {
+        return call(cls.getDeclaredMethod(name), obj);
+    }
+
+    private static Method find(Class<?> cls, String name) {
+        try {
+            return cls.getDeclaredMethod(name);
+        } catch (NoSuchMethodException e) {
+            return null;
+        }
+    }
+
+    private static Object call(Method method, Object obj, Object... args) throws Throwable {
+        method.setAccessible(true);
+        try {
+            return method.invoke(obj, args);
+        } catch (InvocationTargetException e) {
+            throw e.getCause();
+        }
+    }
+}
@@ -1,7 +1,21 @@
 from .args import TlcArgs
 from .pure import PureCmd as TlcPureCmd
-from .pure import tlc_pure
+from .pure import tlc_pure, tlc_pure_async, tlc_pure_batch, tlc_pure_itf, tlc_pure_lines
 from .raw import RawCmd as TlcRawCmd
-from .raw import tlc_raw
+from .raw import tlc_raw, tlc_raw_async, tlc_raw_lines
+from .worker import TlcWorkerPool
 
-__all__ = ["TlcArgs", "TlcPureCmd", "TlcRawCmd", "tlc_pure", "tlc_raw"]
+__all__ = [
+    "TlcArgs",
+    "TlcPureCmd",
+    "TlcRawCmd",
+    "TlcWorkerPool",
+    "tlc_pure",
+    "tlc_pure_async",
+    "tlc_pure_batch",
+    "tlc_pure_itf",
+    "tlc_pure_lines",
+    "tlc_raw",
+    "tlc_raw_async",
+    "tlc_raw_lines",
+]
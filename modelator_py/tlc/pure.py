@@ -1,12 +1,25 @@
+import asyncio
+import functools
+import json as stdjson
 import os
 import tempfile
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from typing import Optional
 
+import pathos.multiprocessing as multiprocessing
+
 from modelator_py.tlc.args import TlcArgs
 
-from ..helper import read_entire_dir_contents
-from .raw import RawCmd, tlc_raw
+from ..cache import cached_run
+from ..helper import (
+    parse_memory,
+    physical_memory,
+    read_entire_dir_contents,
+    run_batch,
+    temporary_directory_async,
+)
+from ..util.tlc.itf import tlc_itf_stream
+from .raw import RawCmd, tlc_raw, tlc_raw_async, tlc_raw_lines
 
 # mypy: ignore-errors
 
@@ -18,6 +31,10 @@ class PureCmd:
         str
     ] = None  # Location of TLC jar (e.g. full path with suffix like tla2tools.jar)
     args: Optional[TlcArgs] = None  # TLC args
+    max_heap: Optional[str] = None  # Maximum JVM heap size (java -Xmx), e.g. "4g"
+
+
+TEMP_DIR_PREFIX = "modelator-py-tlc-temp-dir-"
 
 
 def json_to_cmd(json) -> PureCmd:
@@ -26,21 +43,26 @@ def json_to_cmd(json) -> PureCmd:
             "files": None,
             "jar": None,
             "args": None,
+            "max_heap": None,
         },
         **json,
     }
     cmd = PureCmd()
     cmd.jar = json["jar"]
+    cmd.max_heap = json["max_heap"]
     cmd.args = TlcArgs(**json["args"])
     cmd.files = json["files"]
     return cmd
 
 
-def tlc_pure(*, cmd: PureCmd = None, json=None):  # type: ignore
+def tlc_pure(*, cmd: PureCmd = None, json=None, pool=None, cache=None):  # type: ignore
     """
     Run a TLC command using either a PureCmd object, or build the PureCmd from json.
 
-    Run TLC without side effects in a temporary directory.
+    Run TLC without side effects in a temporary directory. If a TlcWorkerPool is
+    given as pool, TLC runs in one of its resident JVMs instead of a new one. If
+    a ResultCache is given as cache, a result it holds for the same jar, args and
+    files is returned without running TLC.
 
     Returns an ExecutionResult with .process and .files properties. Contains the
     subprocess result, and the list of filesystem files (and contents).
@@ -51,32 +73,137 @@ def tlc_pure(*, cmd: PureCmd = None, json=None):  # type: ignore
     if json is not None:
         cmd = json_to_cmd(json)
 
+    raw_cmd = _to_raw_cmd(cmd)
+
+    def run():
+        with tempfile.TemporaryDirectory(prefix=TEMP_DIR_PREFIX) as dirname:
+            raw_cmd.cwd = dirname
+            _write_files(dirname, cmd.files)
+
+            if pool is None:
+                result = tlc_raw(cmd=raw_cmd)
+            else:
+                result = pool.tlc_raw(cmd=raw_cmd)
+
+            files = _read_output_files(dirname, cmd.files)
+
+        return _to_dict(files, result)
+
+    return cached_run(cache, "tlc", cmd, raw_cmd.args, run)
+
+
+def tlc_pure_lines(*, cmd: PureCmd = None, json=None):
+    """
+    Run a TLC command like tlc_pure, but yield the lines of its output as TLC
+    prints them (see tlc_raw_lines).
+
+    Closing the generator kills TLC and removes the temporary directory.
+    """
+    assert not (cmd is not None and json is not None)
+    assert (cmd is not None) or (json is not None)
+
+    if json is not None:
+        cmd = json_to_cmd(json)
+
+    raw_cmd = _to_raw_cmd(cmd)
+
+    with tempfile.TemporaryDirectory(prefix=TEMP_DIR_PREFIX) as dirname:
+        raw_cmd.cwd = dirname
+        _write_files(dirname, cmd.files)
+
+        lines = tlc_raw_lines(cmd=raw_cmd)
+        try:
+            yield from lines
+        finally:
+            lines.close()
+
+
+def tlc_pure_itf(
+    *, cmd: PureCmd = None, json=None, lists=True, records=True, max_traces=None
+):
+    """
+    Run a TLC command like tlc_pure, and yield the counterexamples it finds in
+    the Informal Trace Format (as Json-ready objects, see tlc_itf_stream) while
+    TLC is still running.
+
+    TLC is killed once max_traces traces have been yielded, or when the
+    generator is closed.
+    """
+    if max_traces is not None and max_traces <= 0:
+        return
+
+    lines = tlc_pure_lines(cmd=cmd, json=json)
+    try:
+        traces = tlc_itf_stream(lines, lists=lists, records=records)
+        for count, trace in enumerate(traces, start=1):
+            yield trace
+            if count == max_traces:
+                break
+    finally:
+        lines.close()
+
+
+async def tlc_pure_async(
+    *, cmd: PureCmd = None, json=None, timeout=None, on_stdout=None, on_stderr=None
+):
+    """
+    Like tlc_pure, for asyncio. The temporary directory is set up and torn down
+    in the default executor of the event loop, and TLC runs as in tlc_raw_async.
+
+    Each line of TLC's stdout (stderr) is passed to on_stdout (on_stderr) as
+    bytes as soon as TLC prints it. If timeout seconds pass, or the task is
+    cancelled, TLC is killed and asyncio.TimeoutError (CancelledError) is raised.
+    """
+    assert not (cmd is not None and json is not None)
+    assert (cmd is not None) or (json is not None)
+
+    if json is not None:
+        cmd = json_to_cmd(json)
+
+    raw_cmd = _to_raw_cmd(cmd)
+    loop = asyncio.get_running_loop()
+
+    async with temporary_directory_async(prefix=TEMP_DIR_PREFIX) as dirname:
+        raw_cmd.cwd = dirname
+        await loop.run_in_executor(None, _write_files, dirname, cmd.files)
+
+        result = await tlc_raw_async(
+            cmd=raw_cmd, timeout=timeout, on_stdout=on_stdout, on_stderr=on_stderr
+        )
+
+        files = await loop.run_in_executor(None, _read_output_files, dirname, cmd.files)
+
+    return _to_dict(files, result)
+
+
+def _to_raw_cmd(cmd: PureCmd) -> RawCmd:
     raw_cmd = RawCmd()
     raw_cmd.args = cmd.args
     # Always specify tlc '-cleanup'
     raw_cmd.args.cleanup = True
     raw_cmd.jar = cmd.jar
+    raw_cmd.max_heap = cmd.max_heap
+    return raw_cmd
 
-    ret = {}
 
-    result = None
+def _write_files(dirname, files):
+    for filename, file_content_str in files.items():
+        full_path = os.path.join(dirname, filename)
+        with open(full_path, "w") as fd:
+            fd.write(file_content_str)
 
-    with tempfile.TemporaryDirectory(prefix="modelator-py-tlc-temp-dir-") as dirname:
-        raw_cmd.cwd = dirname
-        for filename, file_content_str in cmd.files.items():
-            full_path = os.path.join(dirname, filename)
-            with open(full_path, "w") as fd:
-                fd.write(file_content_str)
 
-        result = tlc_raw(cmd=raw_cmd)
+def _read_output_files(dirname, input_files):
+    # Read dir contents (not recursively)
+    all_files = read_entire_dir_contents(dirname)
+    all_files = {os.path.basename(fn): content for fn, content in all_files.items()}
+    # Throw out the files that the user gave as input
+    return {fn: content for fn, content in all_files.items() if fn not in input_files}
 
-        # Read dir contents (not recursively)
-        all_files = read_entire_dir_contents(dirname)
-        all_files = {os.path.basename(fn): content for fn, content in all_files.items()}
-        # Throw out the files that the user gave as input
-        ret["files"] = {
-            fn: content for fn, content in all_files.items() if fn not in cmd.files
-        }
+
+def _to_dict(files, result):
+    ret = {}
+    ret["files"] = files
 
     stdout_pretty = result.stdout.decode()
     stderr_pretty = result.stderr.decode()
@@ -87,3 +214,95 @@ def tlc_pure(*, cmd: PureCmd = None, json=None):  # type: ignore
     ret["stderr"] = stderr_pretty
 
     return ret
+
+
+def tlc_pure_batch(
+    *,
+    cmds=None,
+    jsons=None,
+    max_jobs=None,
+    max_cores=None,
+    max_memory=None,
+    cache=None,
+):
+    """
+    Run many TLC commands, as tlc_pure, with bounded concurrency.
+
+    Takes an iterable of PureCmd objects or of json objects (or of strings
+    holding them, e.g. NDJSON lines). Yields (index of the command, result)
+    pairs as the jobs finish. A job that fails yields {"error": "<description>"}
+    as its result without affecting the other jobs.
+
+    Arguments:
+        max_jobs : number of TLC processes to run at once (default: cpu count)
+        max_cores : number of cores to share between the processes, as counted
+            by their TLC -workers argument (default: cpu count)
+        max_memory : total memory for the processes, in bytes or like "16g".
+            Split evenly between max_jobs: commands without max_heap get half of
+            their share as JVM heap and commands without fpmem get the other half
+            for fingerprints.
+        cache : a ResultCache to take results from and store them in
+    """
+    assert (cmds is None) != (jsons is None)
+
+    if max_jobs is None:
+        max_jobs = multiprocessing.cpu_count()
+    share = None
+    if max_memory is not None:
+        share = parse_memory(max_memory) // max_jobs
+
+    def prepare():
+        for job in cmds if jsons is None else jsons:
+            try:
+                if jsons is not None:
+                    if isinstance(job, str):
+                        job = stdjson.loads(job)
+                    job = json_to_cmd(job)
+                yield _with_memory_share(job, share)
+            except Exception as e:
+                yield e
+
+    return run_batch(
+        functools.partial(_run_prepared, cache=cache),
+        prepare(),
+        resources=_resources,
+        max_jobs=max_jobs,
+        max_cores=max_cores,
+        max_memory=max_memory,
+    )
+
+
+def _with_memory_share(cmd: PureCmd, share):
+    if share is None:
+        return cmd
+    args = cmd.args
+    if args.fpmem is None:
+        args = replace(args, fpmem=f"{share / 2 / physical_memory():.6f}")
+    max_heap = cmd.max_heap
+    if max_heap is None:
+        max_heap = f"{share // 2 // 1024}k"
+    return replace(cmd, args=args, max_heap=max_heap)
+
+
+def _run_prepared(cmd, *, cache=None):
+    if isinstance(cmd, Exception):
+        raise cmd
+    return tlc_pure(cmd=cmd, cache=cache)
+
+
+def _resources(cmd):
+    """Cores and bytes of memory used by the TLC process running cmd."""
+    workers = cmd.args.workers
+    if workers is None:
+        cores = 1
+    elif str(workers) == "auto":
+        cores = multiprocessing.cpu_count()
+    else:
+        cores = int(workers)
+
+    memory = 0
+    if cmd.max_heap is not None:
+        memory += parse_memory(cmd.max_heap)
+    if cmd.args.fpmem is not None and float(cmd.args.fpmem) < 1:
+        memory += int(float(cmd.args.fpmem) * physical_memory())
+    return cores, memory
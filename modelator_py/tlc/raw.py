@@ -1,9 +1,11 @@
 import os
+import shlex
 import subprocess
 import tempfile
 from dataclasses import asdict, dataclass
 from typing import Optional
 
+from ..helper import run_process_async, temporary_directory_async
 from .args import TlcArgs
 
 # mypy: ignore-errors
@@ -16,6 +18,7 @@ class RawCmd:
         str
     ] = None  # Location of TLC jar (full path with suffix like tla2tools.jar)
     args: Optional[TlcArgs] = None  # TLC args
+    max_heap: Optional[str] = None  # Maximum JVM heap size (java -Xmx), e.g. "4g"
 
 
 def stringify_raw_cmd(cmd: RawCmd, java_temp_dir: str = None) -> str:
@@ -31,6 +34,11 @@ def stringify_raw_cmd(cmd: RawCmd, java_temp_dir: str = None) -> str:
     else:
         tmpdir_setup = " -Djava.io.tmpdir={}".format(java_temp_dir)
 
+    if cmd.max_heap is None:
+        heap_setup = ""
+    else:
+        heap_setup = f" -Xmx{cmd.max_heap}"
+
     def stringify(value):
         # Tlc will not accept capitals
         if isinstance(value, bool):
@@ -39,7 +47,7 @@ def stringify_raw_cmd(cmd: RawCmd, java_temp_dir: str = None) -> str:
 
     args = TlcArgs(**{k: stringify(v) for k, v in asdict(args).items()})
 
-    cmd_str = f"""java{tmpdir_setup}\
+    cmd_str = f"""java{tmpdir_setup}{heap_setup}\
  -cp "{jar}"\
  tlc2.TLC\
 {f" -aril {args.aril}" if args.aril is not None else ""}\
@@ -83,12 +91,14 @@ def json_to_cmd(json) -> RawCmd:
             "cwd": None,
             "jar": None,
             "args": None,
+            "max_heap": None,
         },
         **json,
     }
     cmd = RawCmd()
     cmd.cwd = json["cwd"]
     cmd.jar = json["jar"]
+    cmd.max_heap = json["max_heap"]
     cmd.args = TlcArgs(**json["args"])
     return cmd
 
@@ -107,6 +117,91 @@ def tlc_raw(*, cmd: RawCmd = None, json=None):
     if json is not None:
         cmd = json_to_cmd(json)
 
+    check_paths(cmd)
+
+    with tempfile.TemporaryDirectory(
+        prefix="modelator-py-tlc-java-temp-dir-"
+    ) as java_temp:
+        cmd_str = stringify_raw_cmd(cmd, java_temp_dir=java_temp)
+
+        # Semantics a bit complex here - see https://stackoverflow.com/a/15109975/8346628
+        return subprocess.run(cmd_str, shell=True, capture_output=True, cwd=cmd.cwd)
+
+
+def tlc_raw_lines(*, cmd: RawCmd = None, json=None):
+    """
+    Run a TLC command like tlc_raw, but yield the lines of its output as TLC
+    prints them. stderr is merged into stdout.
+
+    Closing the generator (e.g. by leaving a for loop over it early) kills TLC.
+    """
+    assert cmd is not None or json is not None
+    assert not (cmd is not None and json is not None)
+
+    if json is not None:
+        cmd = json_to_cmd(json)
+
+    check_paths(cmd)
+
+    with tempfile.TemporaryDirectory(
+        prefix="modelator-py-tlc-java-temp-dir-"
+    ) as java_temp:
+        cmd_str = stringify_raw_cmd(cmd, java_temp_dir=java_temp)
+
+        # Not through a shell, so that killing the process kills TLC
+        process = subprocess.Popen(
+            shlex.split(cmd_str),
+            cwd=cmd.cwd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            encoding="utf-8",
+        )
+        try:
+            yield from process.stdout
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            process.stdout.close()
+
+
+async def tlc_raw_async(
+    *, cmd: RawCmd = None, json=None, timeout=None, on_stdout=None, on_stderr=None
+):
+    """
+    Like tlc_raw, for asyncio: run TLC as a child process of the event loop.
+
+    Each line of TLC's stdout (stderr) is passed to on_stdout (on_stderr) as
+    bytes as soon as TLC prints it. If timeout seconds pass, or the task is
+    cancelled, TLC is killed and asyncio.TimeoutError (CancelledError) is raised.
+
+    Returns a subprocess call result object.
+    """
+    assert cmd is not None or json is not None
+    assert not (cmd is not None and json is not None)
+
+    if json is not None:
+        cmd = json_to_cmd(json)
+
+    check_paths(cmd)
+
+    async with temporary_directory_async(
+        prefix="modelator-py-tlc-java-temp-dir-"
+    ) as java_temp:
+        cmd_str = stringify_raw_cmd(cmd, java_temp_dir=java_temp)
+        return await run_process_async(
+            cmd_str,
+            cwd=cmd.cwd,
+            timeout=timeout,
+            on_stdout=on_stdout,
+            on_stderr=on_stderr,
+        )
+
+
+def check_paths(cmd: RawCmd):
+    """
+    Expand the user in cmd.cwd and cmd.jar and check that both are absolute.
+    """
     if cmd.cwd is not None:
         cmd.cwd = os.path.expanduser(cmd.cwd)
         if not os.path.isabs(cmd.cwd):
@@ -119,11 +214,3 @@ def tlc_raw(*, cmd: RawCmd = None, json=None):
             raise Exception("TLC jar path must be absolute (after expanding user)")
     if cmd.jar is None:
         raise Exception("TLC jar path must be absolute (after expanding user)")
-
-    with tempfile.TemporaryDirectory(
-        prefix="modelator-py-tlc-java-temp-dir-"
-    ) as java_temp:
-        cmd_str = stringify_raw_cmd(cmd, java_temp_dir=java_temp)
-
-        # Semantics a bit complex here - see https://stackoverflow.com/a/15109975/8346628
-        return subprocess.run(cmd_str, shell=True, capture_output=True, cwd=cmd.cwd)
@@ -0,0 +1,182 @@
+import os
+import queue
+import shlex
+import subprocess
+import tempfile
+import threading
+from dataclasses import replace
+
+from .pure import tlc_pure
+from .raw import RawCmd, check_paths, json_to_cmd, stringify_raw_cmd
+
+# mypy: ignore-errors
+
+SHIM = os.path.join(os.path.dirname(os.path.abspath(__file__)), "TlcWorker.java")
+
+# TLC arguments naming files, which are resolved against the cwd of the job as
+# the resident JVMs cannot change their working directory. The file of -dump
+# is its last word, after the optional "dot" options. Files that TLC names
+# itself (e.g. the MC_TE spec of -generateSpecTE) may still be written relative
+# to the working directory of the JVMs, which is that of the pool's process.
+PATH_ARGS = ["file", "config", "metadir", "recover", "userfile"]
+
+
+class _Jvm:
+    """A JVM running TlcWorker.java, which executes TLC jobs sent on its stdin."""
+
+    def __init__(self, java_temp_dir):
+        self.jobs = 0
+        self.process = subprocess.Popen(
+            ["java", f"-Djava.io.tmpdir={java_temp_dir}", SHIM],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            encoding="utf-8",
+        )
+
+    def alive(self):
+        return self.process.poll() is None
+
+    def run(self, jar, cwd, args, stdout_file, stderr_file) -> int:
+        self.jobs += 1
+        lines = [jar, cwd, stdout_file, stderr_file, str(len(args)), *args]
+        self.process.stdin.write("".join(f"{line}\n" for line in lines))
+        self.process.stdin.flush()
+        answer = self.process.stdout.readline()
+        if not answer:
+            # TLC called System.exit, so the JVM is gone and its exit code is TLC's
+            return self.process.wait()
+        return int(answer)
+
+    def close(self):
+        if self.alive():
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process.stdout.close()
+
+
+class TlcWorkerPool:
+    """
+    Keeps size JVMs resident and runs TLC jobs in them, to save the JVM startup
+    of every job. Requires Java 11 or newer.
+
+    tlc_raw and tlc_pure take the same inputs and return the same outputs as
+    modelator_py.tlc.tlc_raw and modelator_py.tlc.tlc_pure, and can be called
+    from several threads at once. A JVM is replaced after max_jobs jobs, or when
+    TLC ended it by calling System.exit. The max_heap of the commands has no
+    effect, as their JVM is already running. The files named by the args are
+    resolved against the cwd of the command (see PATH_ARGS), but files that TLC
+    names itself may be written relative to the cwd of the pool's process.
+
+    Use as a context manager, or call close() when done.
+    """
+
+    def __init__(self, size=1, *, max_jobs=100):
+        self._max_jobs = max_jobs
+        self._java_temp = tempfile.TemporaryDirectory(
+            prefix="modelator-py-tlc-java-temp-dir-"
+        )
+        self._lock = threading.Lock()
+        self._jvms = []
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(self._start())
+
+    def _start(self):
+        jvm = _Jvm(self._java_temp.name)
+        with self._lock:
+            self._jvms.append(jvm)
+        return jvm
+
+    def _stop(self, jvm):
+        with self._lock:
+            self._jvms.remove(jvm)
+        jvm.close()
+
+    def tlc_raw(self, *, cmd: RawCmd = None, json=None):
+        """
+        Run a TLC command in a resident JVM using either a RawCmd object, or build
+        the RawCmd from json.
+
+        Returns a subprocess result object.
+        """
+        assert cmd is not None or json is not None
+        assert not (cmd is not None and json is not None)
+
+        if json is not None:
+            cmd = json_to_cmd(json)
+
+        check_paths(cmd)
+
+        cmd_str = stringify_raw_cmd(replace(cmd, args=_resolve_paths(cmd)))
+        argv = shlex.split(cmd_str)
+        tlc_args = argv[argv.index("tlc2.TLC") + 1 :]
+
+        # None in _idle is a slot whose JVM could not be started
+        jvm = self._idle.get()
+        try:
+            if jvm is not None and (not jvm.alive() or self._max_jobs <= jvm.jobs):
+                self._stop(jvm)
+                jvm = None
+            if jvm is None:
+                jvm = self._start()
+            with tempfile.TemporaryDirectory(
+                prefix="modelator-py-tlc-worker-output-"
+            ) as dirname:
+                stdout_file = os.path.join(dirname, "stdout")
+                stderr_file = os.path.join(dirname, "stderr")
+                return_code = jvm.run(
+                    cmd.jar, cmd.cwd, tlc_args, stdout_file, stderr_file
+                )
+                stdout = _read_bytes(stdout_file)
+                stderr = _read_bytes(stderr_file)
+        finally:
+            self._idle.put(jvm)
+
+        return subprocess.CompletedProcess(cmd_str, return_code, stdout, stderr)
+
+    def tlc_pure(self, *, cmd=None, json=None):
+        """
+        Run a TLC command in a resident JVM, without side effects, using either a
+        PureCmd object, or build the PureCmd from json.
+
+        Returns the same dictionary as modelator_py.tlc.tlc_pure.
+        """
+        return tlc_pure(cmd=cmd, json=json, pool=self)
+
+    def close(self):
+        with self._lock:
+            jvms = list(self._jvms)
+            self._jvms.clear()
+        for jvm in jvms:
+            jvm.close()
+        self._java_temp.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _resolve_paths(cmd: RawCmd):
+    """The args of cmd, with the files they name joined to cmd.cwd."""
+    paths = {
+        name: os.path.join(cmd.cwd, getattr(cmd.args, name))
+        for name in PATH_ARGS
+        if getattr(cmd.args, name) is not None
+    }
+    if cmd.args.dump is not None:
+        *options, dump_file = str(cmd.args.dump).split()
+        paths["dump"] = " ".join([*options, os.path.join(cmd.cwd, dump_file)])
+    return replace(cmd.args, **paths)
+
+
+def _read_bytes(path):
+    if not os.path.exists(path):
+        return b""
+    with open(path, "rb") as fd:
+        return fd.read()
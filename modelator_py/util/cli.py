@@ -1,7 +1,63 @@
+import json as stdjson
+
+from ..helper import write_json
+from .informal_trace_format import JsonSerializer, trace_from_json
 from .tlc.cli import Tlc
+from .trace_store import TraceStore, is_trace_store, write_trace_store
+
+
+class Itf:
+    def convert(self, source, target, *, output_format="pretty"):
+        """
+        Convert ITF traces between Json and the binary trace store format.
+
+        If source is a trace store, its traces are written as Json to target,
+        as {"traces": [...]} or with one trace per line (output_format ndjson).
+        Otherwise source is read as Json, which can be an object like
+        {"traces": [...]} (as printed by `util tlc itf`), a single trace, a list
+        of traces or one trace per line (NDJSON), and written as a trace store.
+
+        Arguments:
+            source : Path of the file to convert.
+            target : Path of the file to write, or - for stdout (Json only).
+            output_format : Write Json "pretty" (default), "compact" or "ndjson".
+        """
+        if is_trace_store(source):
+            with TraceStore(source) as store:
+                traces = [JsonSerializer().visit(trace) for trace in store]
+            if target == "-":
+                _write_traces(traces, output_format, None)
+            else:
+                with open(target, "w") as out:
+                    _write_traces(traces, output_format, out)
+        else:
+            with open(source, "r") as fd:
+                traces = _read_json_traces(fd.read())
+            write_trace_store(target, (trace_from_json(t) for t in traces))
+
+
+def _write_traces(traces, output_format, out):
+    if output_format == "ndjson":
+        for trace in traces:
+            write_json(trace, output_format="ndjson", out=out)
+    else:
+        write_json({"traces": traces}, output_format=output_format, out=out)
+
+
+def _read_json_traces(text):
+    try:
+        data = stdjson.loads(text)
+    except ValueError:
+        return [stdjson.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(data, dict) and "traces" in data:
+        return data["traces"]
+    if isinstance(data, dict):
+        return [data]
+    return data
 
 
 class Util:
     def __init__(self, stdin):
         self._stdin = stdin
         self.tlc = Tlc(stdin)
+        self.itf = Itf()
@@ -1,12 +1,48 @@
-from abc import ABCMeta
+import abc
+
+from .visitor import IterativeVisitor
 
 """
 In memory tree representing Informal Trace Format trace.
 """
 
 
-class ITFNode(object):
-    __metaclass__ = ABCMeta
+class ITFNode(abc.ABC):
+    """
+    ITF values must not be modified once built. They are hashable, with the
+    hash computed on first use and cached, so they can be set members and dict
+    keys. Equality is structural, tells TRUE from 1, ignores the order of the
+    elements of sets, maps, records and states, and compares the hashes first.
+    """
+
+    # Traces can hold millions of values: no per-instance __dict__
+    __slots__ = ("_hash",)
+
+    @abc.abstractmethod
+    def _key(self):
+        """The hashable structure compared by == and hashed by hash()."""
+
+    def __hash__(self):
+        try:
+            return self._hash
+        except AttributeError:
+            self._hash = hash((type(self), self._key()))
+            return self._hash
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if type(self) is not type(other) or hash(self) != hash(other):
+            return False
+        return self._key() == other._key()
+
+    def __getstate__(self):
+        # Not the cached hash, as string hashes differ between processes
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
 
     def __repr__(self):
         assert False, """Not implemented as uses visitor pattern
@@ -14,64 +50,81 @@ class ITFNode(object):
 
 
 class ITFModelValue(ITFNode):
+    """Model values are interned: there is one object per name."""
+
+    __slots__ = ("name",)
+    _interned: dict = {}
+
+    def __new__(cls, name):
+        value = cls._interned.get(name)
+        if value is None:
+            value = super().__new__(cls)
+            value.name = name
+            cls._interned[name] = value
+        return value
 
     def __init__(self, name):
-        self.name = name
+        pass
 
-    def __eq__(self, other):
-        return isinstance(other, ITFModelValue) and self.name == other.name
+    def __getnewargs__(self):
+        return (self.name,)
+
+    def _key(self):
+        return self.name
 
 
 class ITFRecord(ITFNode):
     """{ "field1": <expr>, ..., "fieldN": <expr> }"""
 
+    __slots__ = ("elements",)
+
     def __init__(self, elements):
         self.elements = elements  # dict
 
-    def __eq__(self, other):
-        """Overrides the default implementation"""
-        if isinstance(other, ITFRecord):
-            return self.elements == other.elements
-        return False
+    def _key(self):
+        return frozenset((k, _value_key(v)) for k, v in self.elements.items())
 
 
 class ITFList(ITFNode):
     """[ <expr>, ..., <expr> ]"""
 
+    __slots__ = ("elements",)
+
     def __init__(self, elements):
         self.elements = elements
 
-    def __eq__(self, other):
-        """Overrides the default implementation"""
-        if isinstance(other, ITFList):
-            return self.elements == other.elements
-        return False
+    def _key(self):
+        return tuple(map(_value_key, self.elements))
 
 
 class ITFSet(ITFNode):
     """{ "#set": [ <expr>, ..., <expr> ] }"""
 
+    __slots__ = ("elements",)
+
     def __init__(self, elements):
         self.elements = elements
 
-    def __eq__(self, other):
-        """Overrides the default implementation"""
-        if isinstance(other, ITFSet):
-            return self.elements == other.elements
-        return False
+    def _key(self):
+        return frozenset(map(_value_key, self.elements))
 
 
 class ITFMap(ITFNode):
-    """{ "#map": [ [ <expr>, <expr> ], ..., [ <expr>, <expr> ] ] }"""
+    """
+    { "#map": [ [ <expr>, <expr> ], ..., [ <expr>, <expr> ] ] }
+
+    The elements are a list of (key, value) tuples.
+    """
+
+    __slots__ = ("elements",)
 
     def __init__(self, elements):
+        if elements and type(elements[0]) is not tuple:
+            elements = [tuple(p) for p in elements]
         self.elements = elements
 
-    def __eq__(self, other):
-        """Overrides the default implementation"""
-        if isinstance(other, ITFMap):
-            return self.elements == other.elements
-        return False
+    def _key(self):
+        return frozenset((_value_key(k), _value_key(v)) for k, v in self.elements)
 
 
 class ITFState(ITFNode):
@@ -84,14 +137,13 @@ class ITFState(ITFNode):
     }
     """
 
+    __slots__ = ("var_value_map",)
+
     def __init__(self, var_value_map):
         self.var_value_map = var_value_map
 
-    def __eq__(self, other):
-        """Overrides the default implementation"""
-        if isinstance(other, ITFState):
-            return self.var_value_map == other.var_value_map
-        return False
+    def _key(self):
+        return frozenset((k, _value_key(v)) for k, v in self.var_value_map.items())
 
 
 class ITFTrace(ITFNode):
@@ -105,95 +157,194 @@ class ITFTrace(ITFNode):
     }
     """
 
+    __slots__ = ("meta", "vars", "states")
+
     def __init__(self, vars_, states, meta=None):
         self.meta = meta
         self.vars = vars_
         self.states = states
 
+    def _key(self):
+        return (tuple(self.vars), tuple(self.states))
+
     def __eq__(self, other):
-        """Overrides the default implementation"""
-        if isinstance(other, ITFTrace):
-            return self.meta == other.meta and self.vars == other.vars and self.states == other.states
-        return False
+        # The meta object is compared, but not hashed as it may be a dict
+        return ITFNode.__eq__(self, other) and self.meta == other.meta
+
+    __hash__ = ITFNode.__hash__
+
+
+def _value_key(value):
+    """A key for value that is only equal to the key of an identical value."""
+    if isinstance(value, ITFNode):
+        return value
+    # TRUE == 1 in Python
+    return (type(value), value)
 
 
-class Visitor:
-    def visit(self, node, *arg, **kw):
+class Visitor(IterativeVisitor):
+    """
+    Rebuilds ITF trees. Methods are generators yielding the children to visit
+    (see IterativeVisitor), so that deeply nested values can be visited.
+    """
+
+    @classmethod
+    def _lookup(cls, node_cls):
         # Only visit ITFNode objects.
         # It is sufficient to take face-value for python built-ins.
-        if not isinstance(node, ITFNode):
-            return node
-        method_name = f"visit_{type(node).__name__}"
-        method = getattr(self, method_name)
-        return method(node, *arg, **kw)
+        if not issubclass(node_cls, ITFNode):
+            return _unchanged
+        return super()._lookup(node_cls)
 
     def visit_ITFModelValue(self, node, *arg, **kw):
         return node
 
     def visit_ITFRecord(self, node, *arg, **kw):
-        elements = {k: self.visit(v) for k, v in node.elements.items()}
+        elements = yield from _visit_fields(node.elements)
         return ITFRecord(elements)
 
     def visit_ITFList(self, node, *arg, **kw):
-        elements = [self.visit(e) for e in node.elements]
+        elements = yield from _visit_all(node.elements)
         return ITFList(elements)
 
     def visit_ITFSet(self, node, *arg, **kw):
-        elements = [self.visit(e) for e in node.elements]
+        elements = yield from _visit_all(node.elements)
         return ITFSet(elements)
 
     def visit_ITFMap(self, node, *arg, **kw):
-        elements = [[self.visit(e) for e in p] for p in node.elements]
+        elements = yield from _visit_pairs(node.elements)
         return ITFMap(elements)
 
     def visit_ITFState(self, node, *arg, **kw):
-        var_value_map = {k: self.visit(v) for k, v in node.var_value_map.items()}
+        var_value_map = yield from _visit_fields(node.var_value_map)
         return ITFState(var_value_map)
 
     def visit_ITFTrace(self, node, *arg, **kw):
-        states = [self.visit(e) for e in node.states]
+        states = [ITFState(m) for m in self._visit_state_maps(node.states)]
         return ITFTrace(node.vars, states, node.meta)
 
+    def _visit_state_maps(self, states):
+        """
+        The visited var_value_maps of the states, where a value that is shared
+        by several states (see share_unchanged_values) is visited once and
+        its result is shared too.
+        """
+        visited = {}
+
+        def visit_value(value):
+            key = id(value)
+            if key not in visited:
+                visited[key] = self.visit(value)
+            return visited[key]
+
+        return [
+            {k: visit_value(v) for k, v in state.var_value_map.items()}
+            for state in states
+        ]
+
+
+def _unchanged(visitor, node, *arg, **kw):
+    return node
+
+
+# Generators for `yield from` in Visitor methods, visiting the ITF values among
+# the given ones. Plain Python values are taken as they are without a visit.
+
+
+def _visit_all(values):
+    visited = []
+    for v in values:
+        visited.append((yield v) if isinstance(v, ITFNode) else v)
+    return visited
+
+
+def _visit_fields(fields):
+    visited = {}
+    for k, v in fields.items():
+        visited[k] = (yield v) if isinstance(v, ITFNode) else v
+    return visited
+
+
+def _visit_pairs(pairs):
+    visited = []
+    for k, v in pairs:
+        if isinstance(k, ITFNode):
+            k = yield k
+        if isinstance(v, ITFNode):
+            v = yield v
+        visited.append((k, v))
+    return visited
+
 
 class JsonSerializer(Visitor):
     def visit_ITFModelValue(self, node, *arg, **kw):
         return {"#modelvalue": node.name}
 
     def visit_ITFRecord(self, node, *arg, **kw):
-        elements = {k: self.visit(v) for k, v in node.elements.items()}
+        elements = yield from _visit_fields(node.elements)
         return elements
 
     def visit_ITFList(self, node, *arg, **kw):
-        elements = [self.visit(e) for e in node.elements]
+        elements = yield from _visit_all(node.elements)
         return elements
 
     def visit_ITFSet(self, node, *arg, **kw):
-        elements = [self.visit(e) for e in node.elements]
+        elements = yield from _visit_all(node.elements)
         return {"#set": elements}
 
     def visit_ITFMap(self, node, *arg, **kw):
-        elements = [[self.visit(e) for e in p] for p in node.elements]
-        return {"#map": elements}
+        elements = yield from _visit_pairs(node.elements)
+        return {"#map": [list(p) for p in elements]}
 
     def visit_ITFState(self, node, *arg, **kw):
-        var_value_map = {k: self.visit(v) for k, v in node.var_value_map.items()}
+        var_value_map = yield from _visit_fields(node.var_value_map)
         return var_value_map
 
     def visit_ITFTrace(self, node, *arg, **kw):
-        states = [self.visit(e) for e in node.states]
+        states = self._visit_state_maps(node.states)
         return {"#meta": node.meta, "vars": node.vars, "states": states}
 
 
+class JsonFormatter(JsonSerializer):
+    """
+    Serializes like JsonSerializer after Listifier (if lists) and Recordifier
+    (if records), in a single traversal that builds no intermediate ITF objects.
+    """
+
+    def __init__(self, lists=True, records=True):
+        self.lists = lists
+        self.records = records
+
+    def visit_ITFMap(self, node, *arg, **kw):
+        elements = node.elements
+        if self.lists and _is_sequence(elements):
+            values = yield from _visit_all(v for _, v in elements)
+            return values
+        if self.records and all(type(k) is str for k, _ in elements):
+            fields = yield from _visit_pairs(elements)
+            return dict(fields)
+        pairs = yield from _visit_pairs(elements)
+        return {"#map": [list(p) for p in pairs]}
+
+
+def _is_sequence(elements):
+    """Are the keys of the map with elements exactly 1..n, in any order?"""
+    n = len(elements)
+    seen = set()
+    for k, _ in elements:
+        if type(k) is not int or not 1 <= k <= n or k in seen:
+            return False
+        seen.add(k)
+    return True
+
+
 class Listifier(Visitor):
     def visit_ITFMap(self, node, *arg, **kw):
-        keys = [p[0] for p in node.elements]
         # Is this map has only integer keys and they are from a domain 1..n
-        if all(type(k) == int for k in keys):
-            keys.sort()
-            if keys == list(range(1, len(keys) + 1)):
-                elements = [self.visit(p[1]) for p in node.elements]
-                return ITFList(elements)
-        elements = [[self.visit(e) for e in p] for p in node.elements]
+        if _is_sequence(node.elements):
+            elements = yield from _visit_all(p[1] for p in node.elements)
+            return ITFList(elements)
+        elements = yield from _visit_pairs(node.elements)
         return ITFMap(elements)
 
 
@@ -201,13 +352,46 @@ class Recordifier(Visitor):
     def visit_ITFMap(self, node, *arg, **kw):
         keys = [p[0] for p in node.elements]
         # Is this map has only integer keys and they are from a domain 1..n
-        if all(type(k) == str for k in keys):
-            elements = {p[0]: self.visit(p[1]) for p in node.elements}
-            return ITFRecord(elements)
-        elements = [[self.visit(e) for e in p] for p in node.elements]
+        if all(type(k) is str for k in keys):
+            elements = yield from _visit_pairs(node.elements)
+            return ITFRecord(dict(elements))
+        elements = yield from _visit_pairs(node.elements)
         return ITFMap(elements)
 
 
+def share_unchanged_values(states):
+    """
+    Make each value of a variable that is equal to its value in the previous
+    state the same object as that value, so that a long trace only holds the
+    values that changed in each step. Modifies the states in place.
+    """
+    for previous, state in zip(states, states[1:]):
+        previous_values = previous.var_value_map
+        values = state.var_value_map
+        for var, value in values.items():
+            if var in previous_values and identical(previous_values[var], value):
+                values[var] = previous_values[var]
+    return states
+
+
+def identical(a, b):
+    """
+    Are a and b the same value, with the same types throughout? Unlike ==, it
+    tells TRUE from 1 at any depth. Works on ITF nodes and on Json objects.
+    """
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, ITFNode):
+        return a == b
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(map(identical, a, b))
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(identical(v, b[k]) for k, v in a.items())
+    return a == b
+
+
 def with_lists(trace: ITFTrace) -> ITFTrace:
     """
     Create a copy of the trace where lists take the place
@@ -236,3 +420,32 @@ def with_records(trace: ITFTrace) -> ITFTrace:
     """
     visitor = Recordifier()
     return visitor.visit(trace)
+
+
+def from_json(value):
+    """
+    The ITF value of a Json value, as written by JsonSerializer: arrays are
+    lists, and objects are records unless they are a "#set", "#map" or
+    "#modelvalue".
+    """
+    if isinstance(value, list):
+        return ITFList([from_json(e) for e in value])
+    if isinstance(value, dict):
+        if len(value) == 1:
+            if "#set" in value:
+                return ITFSet([from_json(e) for e in value["#set"]])
+            if "#map" in value:
+                return ITFMap([(from_json(k), from_json(v)) for k, v in value["#map"]])
+            if "#modelvalue" in value:
+                return ITFModelValue(value["#modelvalue"])
+        return ITFRecord({k: from_json(v) for k, v in value.items()})
+    return value
+
+
+def trace_from_json(trace) -> ITFTrace:
+    """The ITFTrace of a Json trace, as written by JsonSerializer."""
+    states = [
+        ITFState({k: from_json(v) for k, v in state.items() if k != "#meta"})
+        for state in trace["states"]
+    ]
+    return ITFTrace(trace["vars"], states, trace.get("#meta"))
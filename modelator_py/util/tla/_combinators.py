@@ -10,7 +10,6 @@
 from __future__ import absolute_import, division
 
 import collections.abc
-import copy
 import functools
 import logging
 import types
@@ -22,6 +21,10 @@ from . import tokens as intf
 
 logger = logging.getLogger(__name__)
 
+# Check that backtracking restores the parser state, comparing
+# the whole state after each backtrack (slow, for debugging).
+DEBUG = False
+
 
 # module Make (Tok : Intf.Tok) (Prec : Intf.Prec) = struct
 
@@ -41,10 +44,31 @@ logger = logging.getLogger(__name__)
 #     mutable user_state : 's ;
 #   }
 class Pstate:
-    def __init__(self, source, lastpos, user_state):
-        self.source = source  # list
+    """Parser state.
+
+    The input is the list `tokens` from the index `pos` on, so that
+    saving and restoring the position is constant-time.
+    """
+
+    def __init__(self, source, lastpos, user_state, packrat=None):
+        self.source = source  # list | ListSlice
         self.lastpos = lastpos  # Loc.locus
         self.user_state = user_state  # 's
+        self.packrat = packrat  # Packrat | None
+
+    @property
+    def source(self):
+        """The remaining tokens, as a `ListSlice`."""
+        return ListSlice(self.tokens, self.pos)
+
+    @source.setter
+    def source(self, source):
+        if isinstance(source, ListSlice):
+            self.tokens = source.alist
+            self.pos = source.start
+        else:
+            self.tokens = source
+            self.pos = 0
 
     def __repr__(self):
         return f"Pstate({self.source}, {self.lastpos}, " f"{self.user_state})"
@@ -147,9 +171,9 @@ class Prs:
 #     else if bloc = Loc.unknown || bloc.start = bloc.stop then aloc
 #     else Loc.merge aloc bloc
 def fuse(aloc, bloc):
-    if aloc == _location.unknown or aloc.start == aloc.stop:
+    if aloc == _location.unknown or aloc.is_empty():
         return bloc
-    elif bloc == _location.unknown or bloc.start == bloc.stop:
+    elif bloc == _location.unknown or bloc.is_empty():
         return aloc
     else:
         return aloc.merge(bloc)
@@ -229,16 +253,22 @@ def execute(ap, pst):
 #                 end ;
 #               }
 #     in execute ap pst
-def run(ap, init, source):
+def run(ap, init, source, packrat=None):
+    """Apply parser `ap` to the tokens `source`, from user state `init`.
+
+    Pass a `Packrat` as `packrat` to memoize the replies of the
+    parsers built with `memo`. Its table is cleared first.
+    """
     if not source:
         raise Exception("No tokens in file")
     else:
         t = source[0]  # token
         loc = t.loc  # locus of token (intf.locus())
-        lastpos = _location.Locus(start=loc.stop, stop=loc.stop, filename=loc.file)
+        lastpos = loc.right_of()
         # lastpos = {loc with Loc.start = loc.Loc.stop}
-    src = ListSlice(source, start=0)
-    pst = Pstate(source=src, lastpos=lastpos, user_state=init)
+    if packrat is not None:
+        packrat.clear()
+    pst = Pstate(source=source, lastpos=lastpos, user_state=init, packrat=packrat)
     r = execute(ap, pst)
     # print('parsing stopped at:')
     # print(pst.lastpos)
@@ -515,8 +545,8 @@ def f_or_(ap, bp, pst):
     arep = exec_(ap, pst)
     if isinstance(arep.res, Failed) and isinstance(arep.res.severity, Backtrack):
         restore(memo, pst)
-        memo_ = save(pst)
-        assert memo == memo_
+        if DEBUG:
+            check_restored(memo, pst)
         # pprint.pprint(pst.source.start)
         return exec_(bp, pst)
     else:
@@ -700,7 +730,8 @@ def withloc(ap):
 #   let save pst =
 #     (pst.source, pst.lastpos, pst.user_state)
 def save(pst):
-    return (pst.source, pst.lastpos, pst.user_state)
+    # The position in the token list stands for `pst.source`
+    return (pst.pos, pst.lastpos, pst.user_state)
 
 
 #   let restore (s, l, u) pst =
@@ -709,12 +740,82 @@ def save(pst):
 #     pst.ustate <- u ;
 #   ;;
 def restore(slu, pst):
-    source, lastpos, user_state = slu
-    pst.source = source
+    pos, lastpos, user_state = slu
+    pst.pos = pos
     pst.lastpos = lastpos
     pst.user_state = user_state
 
 
+def check_restored(slu, pst):
+    """Assert that `pst` is in the state saved as `slu`."""
+    pos, lastpos, user_state = slu
+    assert pst.pos == pos, (pst.pos, pos)
+    assert pst.lastpos == lastpos, (pst.lastpos, lastpos)
+    assert pst.user_state == user_state, (pst.user_state, user_state)
+
+
+class Packrat:
+    """Memo table of parser replies, for packrat parsing.
+
+    Maps a parser key, token position and user state to the reply of
+    the parser there, and to the parser state after it. Holds at most
+    `maxsize` replies, evicting the oldest first. Counts the `hits` and
+    `misses` of lookups since it was last cleared.
+    """
+
+    def __init__(self, maxsize=2**16):
+        self.maxsize = maxsize
+        self.table = dict()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.table.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """Return `dict` with counts of hits, misses and the hit rate."""
+        lookups = self.hits + self.misses
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            size=len(self.table),
+            hit_rate=self.hits / lookups if lookups else 0.0,
+        )
+
+
+def f_memo(key, build, pst):
+    packrat = pst.packrat
+    if packrat is None:
+        return exec_(build(), pst)
+    table = packrat.table
+    memo_key = (key, pst.pos, pst.user_state)
+    memo = table.get(memo_key)
+    if memo is not None:
+        packrat.hits += 1
+        rep, slu = memo
+        restore(slu, pst)
+        return rep
+    packrat.misses += 1
+    rep = exec_(build(), pst)
+    if len(table) >= packrat.maxsize:
+        del table[next(iter(table))]
+    table[memo_key] = (rep, save(pst))
+    return rep
+
+
+def memo(key, build):
+    """Parser `build()`, with replies memoized when packrat parsing.
+
+    `key` is a hashable value that identifies the parser returned by
+    `build`, such as the name of a grammar rule and its parameters.
+    With a `Packrat` in the parser state, `build` is called only when
+    there is no reply for `key` at the current position and user state.
+    """
+    return functools.partial(f_memo, key, build)
+
+
 # comment from `pco.mli`
 # Infinite lookahead parsers
 
@@ -853,14 +954,14 @@ def f_choice_iter(alternatives, pst):
     for alt in alternatives():
         if isinstance(alt, tuple):
             start, fap = alt
-            if len(pst.source) > 0 and (
+            if pst.pos < len(pst.tokens) and (
                 (
                     not isinstance(start[0], intf.Token_)
-                    and not isinstance(pst.source[0].form, start)
+                    and not isinstance(pst.tokens[pst.pos].form, start)
                 )
                 or (
                     isinstance(start[0], intf.Token_)
-                    and pst.source[0].form not in start
+                    and pst.tokens[pst.pos].form not in start
                 )
             ):
                 continue
@@ -960,37 +1061,38 @@ def star(ap):
 
     def f(pst):
         nonlocal ap
-        results = list()
         if isinstance(ap, types.GeneratorType):
             ap = next(ap)
-        while True:
-            memo = save(pst)
-            arep = exec_(ap, pst)
-            res = arep.res
-            if isinstance(res, Failed):
-                restore(memo, pst)
-                break
-            else:
-                results.append(arep)
-        res = Parsed(list())
-        rep = Reply(res=res, loc=pst.lastpos)
-        results.append(rep)
-
-        def reducer(arep, brep):
-            a, aloc = arep.res.value, arep.loc
-            b, bloc = brep.res.value, brep.loc
-            ab = [a] + b
-            loc = fuse(aloc, bloc)
-            return Reply(res=Parsed(ab), loc=loc)
-
-        while len(results) > 1:
-            r = reducer(results[-2], results[-1])
-            results = results[:-2] + [r]
-        return results[0]
+        values = list()
+        loc = _repeat(ap, pst, values)
+        return Reply(res=Parsed(values), loc=loc)
 
     return Prs(f)
 
 
+def _repeat(ap, pst, values):
+    """Apply `ap` until it fails, appending the results to `values`.
+
+    Return the location of the parsed results, fused as by folding the
+    replies with `cons` from the right, as in `star`. The results are
+    appended in place, so the time is linear in their number.
+    """
+    locs = list()
+    while True:
+        memo = save(pst)
+        arep = exec_(ap, pst)
+        res = arep.res
+        if isinstance(res, Failed):
+            restore(memo, pst)
+            break
+        values.append(res.value)
+        locs.append(arep.loc)
+    loc = pst.lastpos
+    for aloc in reversed(locs):
+        loc = fuse(aloc, loc)
+    return loc
+
+
 #   (*
 #    * let star ap =
 #    *   fix (fun st -> attempt (ap <::> st) <|> succeed [])
@@ -1006,7 +1108,25 @@ def star1(ap):
 #     ap <::> star (sp >>> ap)
 def sep1(sp, ap):
     """List of at least one `ap`, with separator `sp`."""
-    return ap << cons >> star(sp << second >> ap)
+    # Same as `ap << cons >> star(sp << second >> ap)`,
+    # without copying the list of results.
+    spap = None
+
+    def f(pst):
+        nonlocal ap, spap
+        if spap is None:
+            if isinstance(ap, types.GeneratorType):
+                ap = next(ap)
+            spap = sp << second >> ap
+        arep = exec_(ap, pst)
+        res = arep.res
+        if isinstance(res, Failed):
+            return arep
+        values = [res.value]
+        loc = _repeat(spap, pst, values)
+        return Reply(res=Parsed(values), loc=fuse(arep.loc, loc))
+
+    return Prs(f)
 
 
 #   let sep sp ap =
@@ -1061,7 +1181,9 @@ class ListSlice(collections.abc.Sequence):
                 return self.alist[i]
 
     def __eq__(self, other):
-        return self.alist == other.alist and self.start == other.start
+        # Slices of the same token list, compared by identity
+        # instead of element by element
+        return self.alist is other.alist and self.start == other.start
 
 
 #   let scan check = Prs begin
@@ -1088,21 +1210,17 @@ class ListSlice(collections.abc.Sequence):
 
 def scan(check):
     def f(pst):
-        if not pst.source:
+        if pst.pos >= len(pst.tokens):
             res = Failed(Unexpected("EOF"), Backtrack(), None)
             return Reply(res=res, loc=pst.lastpos)
-        assert pst.source
-        t = pst.source[0]
+        t = pst.tokens[pst.pos]
         tloc = t.loc  # intf.locus(t)
         a = check(t)
         if a is None:
             res = Failed(Unexpected(intf.rep(t)), Backtrack(), None)
             return Reply(res=res, loc=tloc)
         assert a is not None
-        src = pst.source[1:]
-        pst.source = src
-        pst.lastpos = copy.copy(tloc)
-        pst.lastpos.start = tloc.stop
+        consume(pst)
         res = Parsed(a)
         return Reply(res=res, loc=tloc)
 
@@ -1110,6 +1228,13 @@ def scan(check):
     return f
 
 
+def consume(pst):
+    """Move past the next token, as `scan` does when it succeeds."""
+    tloc = pst.tokens[pst.pos].loc
+    pst.pos += 1
+    pst.lastpos = tloc.right_of()
+
+
 #   let satisfy tf = scan (fun t -> if tf t then Some t else None)
 def satisfy(tf):
     def f(t):
@@ -1493,6 +1618,147 @@ def resolve(item_prs):
     return next_(list(), True)
 
 
+def resolve_iter(item_prs):
+    """Operator precedence parser, same as `resolve`, as a loop.
+
+    The items parsed by `item_prs` are shifted onto and reduced on one
+    stack (top last), by the rules of `resolve`, instead of building
+    new parsers and copying the stack for each item. The time is linear
+    in the number of items, and long operator chains do not recurse.
+    """
+
+    def f(pst):
+        start = save(pst)
+        stack = list()
+        startp = True
+        while True:
+            memo = save(pst)
+            arep = exec_(item_prs(startp), pst)
+            res = arep.res
+            if isinstance(res, Failed):
+                restore(memo, pst)
+                if isinstance(res.severity, Backtrack):
+                    break
+                restore(start, pst)
+                return arep
+            # the first item that does not fail is committed to
+            for item in res.value:
+                decided = _decide(stack, item, arep.loc)
+                if decided is not None:
+                    startp = decided
+                    break
+            else:
+                restore(memo, pst)
+                break
+        rep = exec_(_finish(stack), pst)
+        if isinstance(rep.res, Failed):
+            restore(start, pst)
+            if stack:
+                # committed to the first item
+                res = Failed(rep.res.kind, Abort(), rep.res.string)
+                rep = Reply(res=res, loc=rep.loc)
+        return rep
+
+    return f
+
+
+def _decide(stack, item, loc):
+    """Shift `item` onto `stack` (top last), reducing as `resolve` does.
+
+    Return whether an expression can start after `item`, or `None`
+    if `item` cannot follow the stack, which is then unchanged.
+    """
+    if isinstance(item, Atm) or isinstance(item.opr, Prefix):
+        if stack and isinstance(stack[-1][0], Atm):
+            return None  # missing operator
+        stack.append((item, loc))
+        # cannot start expression following atom,
+        # can start expression following prefix
+        return not isinstance(item, Atm)
+    oprec = item.prec
+    if isinstance(item.opr, Infix):
+        left = isinstance(item.opr.assoc, Left)
+        while len(stack) >= 2 and isinstance(stack[-2][0], Opr):
+            other = stack[-2][0]
+            if intf.below(oprec, other.prec):
+                _reduce_one(stack)
+                continue
+            if (
+                left
+                and isinstance(other.opr, Infix)
+                and isinstance(other.opr.assoc, Left)
+                and not intf.below(other.prec, oprec)
+            ):
+                _reduce_one(stack)
+            break
+        if stack and isinstance(stack[-1][0], Atm):
+            stack.append((item, loc))
+            return True
+        return None  # missing operator, or insufficient arguments
+    if isinstance(item.opr, Postfix):
+        while (
+            len(stack) >= 2
+            and isinstance(stack[-2][0], Opr)
+            and intf.below(oprec, stack[-2][0].prec)
+        ):
+            _reduce_one(stack)
+        if stack and isinstance(stack[-1][0], Atm):
+            stack.append((item, loc))
+            _reduce_one(stack)
+            return False
+        return None  # missing operator, or insufficient arguments
+    raise ValueError(item)
+
+
+def _reduce_one(stack):
+    """Reduce the top of `stack` (top last) to an atom, in place."""
+    if (
+        len(stack) >= 2
+        and isinstance(stack[-1][0], Opr)
+        and isinstance(stack[-1][0].opr, Postfix)
+        and isinstance(stack[-2][0], Atm)
+    ):
+        (opr, oloc), (atm, aloc) = stack.pop(), stack.pop()
+        stack.append((Atm(opr.opr.value(oloc, atm.value)), fuse(aloc, oloc)))
+    elif (
+        len(stack) >= 3
+        and isinstance(stack[-1][0], Atm)
+        and isinstance(stack[-2][0], Opr)
+        and isinstance(stack[-2][0].opr, Infix)
+        and isinstance(stack[-3][0], Atm)
+    ):
+        (b, bloc), (opr, oloc), (a, aloc) = stack.pop(), stack.pop(), stack.pop()
+        value = opr.opr.value(oloc, a.value, b.value)
+        stack.append((Atm(value), fuse(aloc, fuse(oloc, bloc))))
+    elif (
+        len(stack) >= 2
+        and isinstance(stack[-1][0], Atm)
+        and isinstance(stack[-2][0], Opr)
+        and isinstance(stack[-2][0].opr, Prefix)
+    ):
+        (atm, aloc), (opr, oloc) = stack.pop(), stack.pop()
+        stack.append((Atm(opr.opr.value(oloc, atm.value)), fuse(oloc, aloc)))
+    else:
+        raise Exception("reduce_one")
+
+
+def _finish(stack):
+    """Parser returning the expression of `stack` (top last)."""
+    if not stack:
+        return (
+            lookahead(any_())
+            << shift_eq
+            >> (lambda t: fail(f"required expression(s) missing before {intf.rep(t)}"))
+        )
+    try:
+        while len(stack) > 1 or not isinstance(stack[0][0], Atm):
+            _reduce_one(stack)
+    except Exception as e:
+        return fail("incomplete expression" + str(e))
+    atm, loc = stack[0]
+    return return_(atm.value, loc)
+
+
 def any_isinstance(items, cls):
     """`True` if any item is of type `cls`."""
     return any(isinstance(item, cls) for item in items)
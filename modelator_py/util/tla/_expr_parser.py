@@ -27,6 +27,7 @@ from ._combinators import (
     first,
     get,
     lookahead,
+    memo,
     optional,
     return_,
     second,
@@ -43,7 +44,7 @@ from ._combinators import (
     use,
     using,
 )
-from .ast import Nodes as tla_ast
+from ._optable import nodes as tla_ast
 
 
 # open Ext
@@ -75,10 +76,10 @@ from .ast import Nodes as tla_ast
 #             Util.locate (Apply (op, [a ; b])) loc
 #       end
 #     end in
-def infix(op, prec, assoc):
+def infix(op, prec, assoc, nodes=tla_ast):
     def f(oploc, a, b):
         # TODO: location annotations
-        return tla_ast.Apply(op, [a, b])
+        return nodes.Apply(op, [a, b])
 
     return pco.Opr(prec, pco.Infix(assoc, f))
 
@@ -110,10 +111,10 @@ def infix(op, prec, assoc):
 #             Util.locate (Apply (op, [a])) loc
 #       end
 #     end in
-def prefix(op, prec):
+def prefix(op, prec, nodes=tla_ast):
     def f(oploc, a):
         # TODO: location annotations
-        return tla_ast.Apply(op, [a])
+        return nodes.Apply(op, [a])
 
     return pco.Opr(prec, pco.Prefix(f))  # pco.Prefix
 
@@ -127,10 +128,10 @@ def prefix(op, prec):
 #             Util.locate (Apply (op, [a])) loc
 #       end
 #     end
-def postfix(op, prec):
+def postfix(op, prec, nodes=tla_ast):
     def f(oploc, a):
         # TODO: location annotations
-        return tla_ast.Apply(op, [a])
+        return nodes.Apply(op, [a])
 
     return pco.Opr(prec, pco.Postfix(f))  # pco.Postfix
 
@@ -159,20 +160,20 @@ def postfix(op, prec):
 #               end
 #         end
 #     end Op.optable ;
-def _generate_fixities():
+def _generate_fixities(nodes):
     fixities = dict()
-    for form, alternatives in _optable.optable.items():
+    for form, alternatives in _optable.optable_of(nodes).items():
         fixities.setdefault(form, list())
         for top in alternatives:
             if top.defn is None:
-                defn = tla_ast.Opaque(top.name)
+                defn = nodes.Opaque(top.name)
             else:
-                # defn = tla_ast.Internal(top.defn)
+                # defn = nodes.Internal(top.defn)
                 defn = top.defn
             if isinstance(top.fix, _optable.Prefix):
-                res = prefix(defn, top.prec)
+                res = prefix(defn, top.prec, nodes)
             elif isinstance(top.fix, _optable.Postfix):
-                res = postfix(defn, top.prec)
+                res = postfix(defn, top.prec, nodes)
             elif isinstance(top.fix, _optable.Infix):
                 assoc = top.fix.assoc
                 if isinstance(assoc, _optable.Left):
@@ -183,7 +184,7 @@ def _generate_fixities():
                     assoc = pco.Non()
                 else:
                     raise ValueError(assoc)
-                res = infix(defn, top.prec, assoc)
+                res = infix(defn, top.prec, assoc, nodes)
             else:
                 raise ValueError(top.fix)
             fixities[form].append(res)
@@ -193,7 +194,15 @@ def _generate_fixities():
 #     Hashtbl.replace fixities "\\X" bin_prod ;
 #     Hashtbl.replace fixities "\\times" bin_prod ;
 #     fixities
-fixities = _generate_fixities()
+@functools.lru_cache(maxsize=None)
+def fixities_of(nodes):
+    """Return the operator fixities for the node classes `nodes`.
+
+    The fixities are generated once for each family of node classes.
+    """
+    return _generate_fixities(nodes)
+
+
 #
 # let distinct =
 #   let module S = Set.Make (String) in
@@ -216,10 +225,10 @@ def hint():
 #   resolve (expr_or_op b);
 # end
 def expr(b):
+    f = functools.partial(expr_or_op, b)
+    ap = functools.partial(pco.resolve_iter, f)
     while True:
-        f = functools.partial(expr_or_op, b)
-        r = pco.resolve(f)
-        yield r
+        yield memo(("expr", b), ap)
 
 
 #     attempt anyop >>+ begin fun p pts ->
@@ -244,7 +253,7 @@ def expr(b):
 #             in
 #               choice (List.map non_test ops @ [return ops pts])
 def choice_fix_operators(b, p, pts):
-    ops = fixities[p]
+    ops = fixities_of(_optable.current_nodes())[p]
     assert isinstance(ops, list), ops
     if not ops:
         return fail(f"unknown operator {p}")
@@ -286,6 +295,60 @@ def choice_fix_operators(b, p, pts):
     return choice(new_ops)
 
 
+def expr_items(b, is_start):
+    """Parser of the items of expressions, same as `expr_or_op`.
+
+    Infix, prefix and postfix operators are parsed without building
+    the parsers of `expr_or_op`, when their next token shows that
+    `expr_or_op` would return their fixities.
+    """
+    return functools.partial(_f_expr_items, b, is_start)
+
+
+def _f_expr_items(b, is_start, pst):
+    ops = _operator_fixities(is_start, pst)
+    if ops is None:
+        return pco.exec_(expr_or_op(b, is_start), pst)
+    tloc = pst.tokens[pst.pos].loc
+    pco.consume(pst)
+    return pco.Reply(res=pco.Parsed(ops), loc=tloc)
+
+
+# Operators that `expr_or_op` parses as more than an operator,
+# before the other operators, when `is_start` is `True`, or always.
+_START_OPERATORS = {"/\\", "\\/", "[]"}
+_SPECIAL_OPERATORS = {"<>"}
+_LPAREN = tokens.PUNCT("(")
+
+
+def _operator_fixities(is_start, pst):
+    """Return the fixities of the operator at the start of `pst`.
+
+    Return `None` unless the next token is an operator token that
+    `expr_or_op` would parse with `choice_fix_operators` into its
+    fixities, without trying other alternatives: it is in the active
+    rectangle of input, and not followed by "(" (its nonfix form).
+    """
+    toks = pst.tokens
+    pos = pst.pos
+    if pos >= len(toks):
+        return None
+    t = toks[pos]
+    form = t.form
+    if not isinstance(form, tokens.OP):
+        return None
+    if form.string in _SPECIAL_OPERATORS or (
+        is_start and form.string in _START_OPERATORS
+    ):
+        return None
+    if pst.user_state.ledge > t.loc.start_col:
+        return None
+    if pos + 1 < len(toks) and toks[pos + 1].form == _LPAREN:
+        return None
+    *_, op = _optable.optable[form.string]
+    return fixities_of(_optable.current_nodes()).get(op.name) or None
+
+
 #     (* record fields *)
 #     if not is_start then
 #       attempt begin
@@ -680,8 +743,9 @@ def expr_or_op(b, is_start):
 
     # intf.kwd('FALSE') <<apply>> (lambda e: [Atm(e)])  # for testing
     #   ]
+    ap = functools.partial(choice_iter, choices)
     while True:
-        yield choice_iter(choices)
+        yield memo(("expr_or_op", b, is_start), ap)
 
 
 #
@@ -1098,8 +1162,9 @@ def complex_expr(b):
         yield ((tokens.PUNCT("SF_"),), f)
 
     #   ]
+    ap = functools.partial(choice_iter, choices)
     while True:
-        yield choice_iter(choices)
+        yield memo(("complex_expr", b), ap)
 
 
 # end
@@ -1585,8 +1650,9 @@ def atomic_expr(b):
         yield use(reduced_expr(b))
 
     #   ]
+    ap = functools.partial(choice_iter, choices)
     while True:
-        yield choice_iter(choices)
+        yield memo(("atomic_expr", b), ap)
 
 
 # end
@@ -1674,8 +1740,9 @@ def reduced_expr(b):
             intf.kwd("STRING") << bang >> tla_ast.STRING()  # tla_ast.Internal(
         )
 
+    ap = functools.partial(choice_iter, choices)
     while True:
-        yield choice_iter(choices)
+        yield memo(("reduced_expr", b), ap)
 
 
 def apply_sub_expr(prs):
@@ -1730,7 +1797,7 @@ def bull_at(bull, where):
         if (
             isinstance(t.form, tokens.OP)
             and t.form.string == bull
-            and t.loc.start.column == where
+            and t.loc.start_col == where
         ):
             return tuple()
         else:
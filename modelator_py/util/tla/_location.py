@@ -19,6 +19,8 @@ class Pt:
     a source file.
     """
 
+    __slots__ = ("line", "bol", "col")
+
     def __init__(self, line, bol, col):
         self.line = line
         self.bol = bol  # beginning of line (offset
@@ -68,41 +70,97 @@ class Pt:
 #                file : string ;
 #              }
 class Locus:
-    """Location in file."""
+    """Location in file.
+
+    The points `start` and `stop` are stored as integers,
+    and a `Pt` is built each time that one of them is read.
+    """
+
+    __slots__ = (
+        "start_line",
+        "start_bol",
+        "start_col",
+        "stop_line",
+        "stop_bol",
+        "stop_col",
+        "file",
+    )
 
     def __init__(self, start, stop, filename):
         self.start = start  # Pt | None
         self.stop = stop  # Pt | None
         self.file = filename
 
+    @property
+    def start(self):
+        if self.start_line is None:
+            return None
+        return Pt(self.start_line, self.start_bol, self.start_col)
+
+    @start.setter
+    def start(self, pt):
+        if pt is None:
+            self.start_line = self.start_bol = self.start_col = None
+        else:
+            self.start_line, self.start_bol, self.start_col = pt.line, pt.bol, pt.col
+
+    @property
+    def stop(self):
+        if self.stop_line is None:
+            return None
+        return Pt(self.stop_line, self.stop_bol, self.stop_col)
+
+    @stop.setter
+    def stop(self, pt):
+        if pt is None:
+            self.stop_line = self.stop_bol = self.stop_col = None
+        else:
+            self.stop_line, self.stop_bol, self.stop_col = pt.line, pt.bol, pt.col
+
     def __repr__(self):
         return (
             f"{self.file}: "
-            f"line {self.start.line}, column {self.start.column} to "
-            f"line {self.stop.line}, column {self.stop.column}"
+            f"line {self.start_line}, column {self.start_col} to "
+            f"line {self.stop_line}, column {self.stop_col}"
         )
 
     def __copy__(self):
-        return Locus(self.start, self.stop, self.file)
+        return _locus(*self._key())
 
     def __eq__(self, other):
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def _key(self):
         return (
-            self.start == other.start
-            and self.stop == other.stop
-            and self.file == other.file
+            self.start_line,
+            self.start_bol,
+            self.start_col,
+            self.stop_line,
+            self.stop_bol,
+            self.stop_col,
+            self.file,
         )
 
-    def __hash__(self):
-        t = (self.start, self.stop, self.file)
-        return hash(t)
+    def is_empty(self):
+        """Return `True` if `start` and `stop` are the same point."""
+        return (
+            self.start_line == self.stop_line
+            and self.start_bol == self.stop_bol
+            and self.start_col == self.stop_col
+        )
 
     # let left_of l = { l with stop = l.start }
     def left_of(self):
-        return Locus(self.start, self.start, self.filename)
+        line, bol, col = self.start_line, self.start_bol, self.start_col
+        return _locus(line, bol, col, line, bol, col, self.file)
 
     # let right_of l = { l with start = l.stop }
     def right_of(self):
-        return Locus(self.stop, self.stop, self.filename)
+        line, bol, col = self.stop_line, self.stop_bol, self.stop_col
+        return _locus(line, bol, col, line, bol, col, self.file)
 
     # let merge r1 r2 =
     #   if r1.file <> r2.file then
@@ -118,15 +176,41 @@ class Locus:
     def merge(self, other):
         if self.file != other.file:
             raise ValueError(f"different files: {self.file}, {other.file}")
-        if self.start.offset <= other.start.offset:
-            start = self.start
-        else:
-            start = other.start
-        if self.stop.offset >= other.stop.offset:
-            stop = self.stop
-        else:
-            stop = other.stop
-        return Locus(start, stop, self.file)
+        self_start = _offset(self.start_bol, self.start_col)
+        other_start = _offset(other.start_bol, other.start_col)
+        self_stop = _offset(self.stop_bol, self.stop_col)
+        other_stop = _offset(other.stop_bol, other.stop_col)
+        first = self if self_start <= other_start else other
+        last = self if self_stop >= other_stop else other
+        return _locus(
+            first.start_line,
+            first.start_bol,
+            first.start_col,
+            last.stop_line,
+            last.stop_bol,
+            last.stop_col,
+            self.file,
+        )
+
+
+def _offset(bol, col):
+    """Return offset of point, as `Pt.offset`."""
+    if bol is None or col is None:
+        raise ValueError("unknown beginning of line or column")
+    return bol + col
+
+
+def _locus(start_line, start_bol, start_col, stop_line, stop_bol, stop_col, filename):
+    """Return `Locus` with the given points, without building `Pt`s."""
+    loc = Locus.__new__(Locus)
+    loc.start_line = start_line
+    loc.start_bol = start_bol
+    loc.start_col = start_col
+    loc.stop_line = stop_line
+    loc.stop_bol = stop_bol
+    loc.stop_col = stop_col
+    loc.file = filename
+    return loc
 
 
 # let unknown = {
@@ -171,6 +255,17 @@ def locus_of_position(filename, lineno, bol, cnum):
     return Locus(pt, pt, filename)  # lp.pos_fname
 
 
+def locus_of_span(filename, lineno, bol, start_cnum, stop_cnum):
+    """Return location from offset `start_cnum` to `stop_cnum`.
+
+    The span is within the line `lineno` that starts at offset `bol`.
+    Same as merging the `locus_of_position` of both offsets.
+    """
+    start_col = start_cnum - bol + 1
+    stop_col = stop_cnum - bol + 1
+    return _locus(lineno, bol, start_col, lineno, bol, stop_col, filename)
+
+
 # let merge r1 r2 =
 #   if r1.file <> r2.file then
 #     failwith ("Loc.merge: " ^ r1.file ^ " <> " ^ r2.file)
@@ -29,8 +29,8 @@ from ._combinators import (
     times2,
     use,
 )
+from ._optable import nodes
 from ._tla_combinators import kwd, locate, punct
-from .ast import Nodes as nodes
 
 
 #
@@ -7,8 +7,49 @@
 #
 # <https://github.com/tlaplus/tlapm/blob/main/src/optable.ml>
 #
+import collections.abc
+import contextlib
+import contextvars
+import functools
 
-from .ast import Nodes as nodes
+from .ast import Nodes as _Nodes
+
+# The syntax tree node classes used by the parser modules.
+# Bound for the duration of a parse with `using_nodes`,
+# so concurrent parses with different node classes
+# do not interfere with each other.
+_current_nodes = contextvars.ContextVar("nodes", default=_Nodes)
+
+
+def current_nodes():
+    """Return the syntax tree node classes bound for parsing."""
+    return _current_nodes.get()
+
+
+@contextlib.contextmanager
+def using_nodes(nodes):
+    """Bind the syntax tree node classes `nodes` for parsing.
+
+    If `nodes is None`, then keep the current binding.
+    """
+    if nodes is None:
+        yield
+        return
+    token = _current_nodes.set(nodes)
+    try:
+        yield
+    finally:
+        _current_nodes.reset(token)
+
+
+class _CurrentNodes:
+    """Attribute access to the node classes bound for parsing."""
+
+    def __getattr__(self, name):
+        return getattr(_current_nodes.get(), name)
+
+
+nodes = _CurrentNodes()
 
 # open Builtin
 
@@ -192,7 +233,7 @@ def withdef(tuple_):
 #     '\\propto',      ( 5, 5), Infix(Non()),   [] ;
 #   ] ;
 # ]
-def _generate_tlaops():
+def _generate_tlaops(nodes):
     tlaops = [
         (
             "Logic",
@@ -358,8 +399,8 @@ class TLAOP:
 #         end ops
 #     end tlaops ;
 #     tab
-def _generate_optable():
-    tlaops = _generate_tlaops()
+def _generate_optable(nodes=_Nodes):
+    tlaops = _generate_tlaops(nodes)
     optable = dict()
     for dom, ops in tlaops:
         for name, prec, fixity, alternatives, defn in ops:
@@ -372,7 +413,29 @@ def _generate_optable():
     return optable
 
 
-optable = _generate_optable()
+@functools.lru_cache(maxsize=None)
+def optable_of(nodes):
+    """Return the table of operators for the node classes `nodes`.
+
+    The table is generated once for each family of node classes.
+    """
+    return _generate_optable(nodes)
+
+
+class _CurrentOptable(collections.abc.Mapping):
+    """Table of operators for the node classes bound for parsing."""
+
+    def __getitem__(self, name):
+        return optable_of(_current_nodes.get())[name]
+
+    def __iter__(self):
+        return iter(optable_of(_current_nodes.get()))
+
+    def __len__(self):
+        return len(optable_of(_current_nodes.get()))
+
+
+optable = _CurrentOptable()
 # pprint.pprint(optable)
 
 
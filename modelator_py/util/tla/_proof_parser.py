@@ -30,8 +30,8 @@ from ._combinators import (
     times2,
     use,
 )
+from ._optable import nodes as tla_ast
 from ._tla_combinators import kwd, punct
-from .ast import Nodes as tla_ast
 
 
 # open Ext
@@ -27,6 +27,15 @@ class Pcx:
     def __repr__(self):
         return f"Pcx({self.ledge}, {self.clean})"
 
+    # Compared by value, as part of the keys of packrat memo tables
+    def __eq__(self, other):
+        if not isinstance(other, Pcx):
+            return NotImplemented
+        return self.ledge == other.ledge and self.clean == other.clean
+
+    def __hash__(self):
+        return hash((self.ledge, self.clean))
+
 
 init = Pcx(-1, True)
 
@@ -81,7 +90,7 @@ def scan(ts):
         << pco.shift_eq
         >> (
             lambda px: pco.scan(
-                lambda t: ts(t.form) if px.ledge <= t.loc.start.column else None
+                lambda t: ts(t.form) if px.ledge <= t.loc.start_col else None
             )
         )
     )
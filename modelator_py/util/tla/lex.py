@@ -7,8 +7,10 @@
 #
 # <https://github.com/tlaplus/tlapm/blob/main/src/alexer.mll>
 #
+import bisect
 import logging
 import re
+import threading
 
 import ply.lex
 
@@ -17,6 +19,9 @@ from . import tokens as intf
 
 logger = logging.getLogger(__name__)
 
+# Check the location of each token against the input (slow, for debugging).
+DEBUG = False
+
 
 RESERVED = {
     "ACTION",
@@ -139,9 +144,22 @@ class Lexer:
     tab = "\t"
     newline = r"\r|\n|\r\n"
 
-    def __init__(self, debug=False):
+    def __init__(self, debug=False, lextab=None):
+        """Build the lexer.
+
+        @param lextab: name of a module with
+            precomputed lexer tables, for example
+            `"modelator_py.util.tla._lextab"`.
+            The tables are loaded from that module,
+            and written to it if it does not exist.
+            If `None`, then build from the rules.
+        @type lextab: `str` or `None`
+        """
         self.tokens = self.delimiters + self.operators + self.misc + list(self.reserved)
-        self.build(debug=debug)
+        if lextab is None:
+            self.build(debug=debug)
+        else:
+            self.build(debug=debug, optimize=True, lextab=lextab)
         self._initialize_state()
 
     def build(self, debug=False, debuglog=None, **kwargs):
@@ -163,6 +181,10 @@ class Lexer:
 
     def _initialize_state(self):
         """Reset the lexer's state."""
+        # a previous input may have stopped
+        # inside a comment or string
+        self._lexer.begin("INITIAL")
+        self._lexer.lexstatestack = list()
         self._lexer.lineno = 1
         self._string_start = None
 
@@ -482,8 +504,10 @@ def tokenize(data, omit_preamble=True):
         module_name = lextokens[2].value
     else:
         module_name = "unknown module"
+    line_starts = _line_starts(data)
     tokens = [
-        _map_to_token(data, token, module_name=module_name) for token in lextokens
+        _map_to_token(data, token, module_name=module_name, line_starts=line_starts)
+        for token in lextokens
     ]
     return tokens
 
@@ -493,8 +517,30 @@ def lex(data):
     return _lex(data)
 
 
+# Name of a module with precomputed lexer tables
+# used by `get_lexer`, or `None` to build from the rules.
+LEXTAB = None
+_cache = threading.local()
+
+
+def get_lexer():
+    """Return a reusable `Lexer`.
+
+    Building a `Lexer` compiles the master regex
+    from all the token rules, so the instance is
+    built once and then reset with `Lexer.input`.
+    A `Lexer` carries the scanning state, so there
+    is one instance for each thread.
+    """
+    lexer = getattr(_cache, "lexer", None)
+    if lexer is None:
+        lexer = Lexer(lextab=LEXTAB)
+        _cache.lexer = lexer
+    return lexer
+
+
 def _lex(data):
-    lexer = Lexer()
+    lexer = get_lexer()
     lexer.input(data)
     output = list()
     for token in lexer:
@@ -510,31 +556,48 @@ def _omit_preamble(data):
     return data[n:]
 
 
-def _map_to_token(data, token, module_name="dummy_file"):
-    # `data` is needed to find
-    # the beginning of line
+def _map_to_token(data, token, module_name="dummy_file", line_starts=None):
+    # `data` is needed to find the beginning of line,
+    # from the offsets `line_starts` of the lines in `data`
     token_ = _map_to_token_(token)
     # print(token.__dict__)
     # _print_lextoken_info(token)
     # print('\n')
+    if line_starts is None:
+        line_starts = _line_starts(data)
     line_number = token.lineno
-    bol = find_beginning_of_line(data, token)
+    i = bisect.bisect_right(line_starts, token.lexpos) - 1
+    bol = line_starts[i]
     start_column_offset = token.lexpos
-    start_loc = _location.locus_of_position(
-        module_name, line_number, bol, start_column_offset
+    stop_column_offset = token.lexpos + len(token.value)
+    loc = _location.locus_of_span(
+        module_name, line_number, bol, start_column_offset, stop_column_offset
     )
+    if DEBUG:
+        _check_location(data, token, bol)
+    return intf.Token(token_, None, loc)
+
+
+def _line_starts(data):
+    """Return `list` of offsets of the beginning of each line."""
+    return [0] + [match.end() for match in re.finditer("\n", data)]
+
+
+def _check_location(data, token, bol):
+    """Assert that `token` is at its location in `data`."""
+    if bol != find_beginning_of_line(data, token):
+        raise AssertionError(bol, find_beginning_of_line(data, token))
     if "\n" in token.value:
         raise AssertionError(token.type, token.value)
+    start_column_offset = token.lexpos
     stop_column_offset = token.lexpos + len(token.value)
-    stop_loc = _location.locus_of_position(
-        module_name, line_number, bol, stop_column_offset
-    )
     if data[start_column_offset:stop_column_offset] != token.value:
         raise AssertionError(data[start_column_offset:stop_column_offset], token.value)
+    start_loc = _location.locus_of_position("", token.lineno, bol, start_column_offset)
+    stop_loc = _location.locus_of_position("", token.lineno, bol, stop_column_offset)
     loc = start_loc.merge(stop_loc)
     if len(token.value) != loc.stop.column - loc.start.column:
         raise AssertionError(token.value, loc.stop.column, loc.start.column)
-    return intf.Token(token_, None, loc)
 
 
 # This mapping is a separate step because `ply.lex`
@@ -668,7 +731,7 @@ def _join_with_newlines(tokens):
     current_line = 1
     strings = list()
     for token in tokens:
-        token_line = token.loc.start.line
+        token_line = token.loc.start_line
         diff = token_line - current_line
         if diff < 0:
             raise AssertionError(token_line, current_line)
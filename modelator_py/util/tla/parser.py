@@ -5,12 +5,13 @@
 from . import _combinators as pco
 from . import _expr_parser as ep
 from . import _module_parser as mp
-from . import _optable
-from . import _proof_parser as pfp
-from . import _tla_combinators, lex
+from . import _optable, _tla_combinators, lex
+from ._combinators import Packrat
 
+__all__ = ["Packrat", "parse", "parse_expr"]
 
-def parse(module_text, nodes=None):
+
+def parse(module_text, nodes=None, packrat=None):
     """Return abstract syntax tree for `str`ing `module_text`.
 
     `module_text` is a module specification.
@@ -29,17 +30,20 @@ def parse(module_text, nodes=None):
 
     tree = parser.parse(module_text, nodes=Nodes)
     ```
+
+    Pass a `Packrat` as `packrat` to memoize the replies of
+    subparsers (packrat parsing), which avoids reparsing input
+    when backtracking. See `Packrat.stats` for the hit rate.
     """
-    memo = _save(nodes)
-    parser = mp.parse()
-    init = _tla_combinators.init
-    tokens = lex.tokenize(module_text, omit_preamble=True)
-    tree, pst = pco.run(parser, init=init, source=tokens)
-    _restore(memo)
+    with _optable.using_nodes(nodes):
+        parser = mp.parse()
+        init = _tla_combinators.init
+        tokens = lex.tokenize(module_text, omit_preamble=True)
+        tree, pst = pco.run(parser, init=init, source=tokens, packrat=packrat)
     return tree
 
 
-def parse_expr(expr, nodes=None):
+def parse_expr(expr, nodes=None, packrat=None):
     r"""Return abstract syntax tree for `str`ing `expr`.
 
     `expr` is an expression string.
@@ -54,40 +58,12 @@ def parse_expr(expr, nodes=None):
 
     tree = parser.parse_expr(expr, nodes=Nodes)
     ```
-    """
-    memo = _save(nodes)
-    parser = ep.expr(False)
-    init = _tla_combinators.init
-    tokens = lex.tokenize(expr, omit_preamble=False)
-    tree, pst = pco.run(parser, init=init, source=tokens)
-    _restore(memo)
-    return tree
-
 
-def _save(nodes):
-    """Store the `tla_ast` attribute of parser modules.
-
-    Set the AST nodes that are used by parser modules
-    to the classes of `nodes`.
+    Pass a `Packrat` as `packrat` for packrat parsing, as in `parse`.
     """
-    if nodes is None:
-        return None
-    assert nodes is not None
-    memo = (ep.tla_ast, mp.nodes, pfp.tla_ast, _optable.nodes)
-    ep.tla_ast = nodes
-    mp.nodes = nodes
-    pfp.tla_ast = nodes
-    _optable.nodes = nodes
-    _optable.optable = _optable._generate_optable()
-    ep.fixities = ep._generate_fixities()
-    return memo
-
-
-def _restore(memo):
-    """Set the `tla_ast` attribute of parser modules."""
-    if memo is None:
-        return
-    assert memo is not None
-    (ep.tla_ast, mp.nodes, pfp.tla_ast, _optable.nodes) = memo
-    _optable.optable = _optable._generate_optable()
-    ep.fixities = ep._generate_fixities()
+    with _optable.using_nodes(nodes):
+        parser = ep.expr(False)
+        init = _tla_combinators.init
+        tokens = lex.tokenize(expr, omit_preamble=False)
+        tree, pst = pco.run(parser, init=init, source=tokens, packrat=packrat)
+    return tree
@@ -25,6 +25,8 @@
 class Token_:
     """Type of tokens."""
 
+    __slots__ = ()
+
     def __str__(self):
         return f"{type(self).__name__}({self.string})"
 
@@ -35,6 +37,8 @@ class Token_:
 class BOF(Token_):
     """Beginning of file."""
 
+    __slots__ = ()
+
     def __eq__(self, other):
         return isinstance(other, BOF)
 
@@ -42,6 +46,8 @@ class BOF(Token_):
 class ID(Token_):
     """Identifiers."""
 
+    __slots__ = ("string",)
+
     def __init__(self, string):
         self.string = string
 
@@ -52,6 +58,8 @@ class ID(Token_):
 class OP(Token_):
     """Operators."""
 
+    __slots__ = ("string",)
+
     def __init__(self, string):
         self.string = string
 
@@ -62,6 +70,8 @@ class OP(Token_):
 class KWD(Token_):
     """Keywords."""
 
+    __slots__ = ("string",)
+
     def __init__(self, string):
         self.string = string
 
@@ -72,6 +82,8 @@ class KWD(Token_):
 class NUM(Token_):
     """Numbers."""
 
+    __slots__ = ("string1", "string2")
+
     def __init__(self, string1, string2):
         self.string1 = string1
         self.string2 = string2
@@ -93,6 +105,8 @@ class NUM(Token_):
 class STR(Token_):
     """Strings."""
 
+    __slots__ = ("string",)
+
     def __init__(self, string):
         self.string = string
 
@@ -103,6 +117,8 @@ class STR(Token_):
 class PUNCT(Token_):
     """Miscellaneous punctuation."""
 
+    __slots__ = ("string",)
+
     def __init__(self, string):
         self.string = string
 
@@ -112,6 +128,8 @@ class PUNCT(Token_):
 
 #     | ST of [`Star | `Plus | `Num of int] * string * int
 class StepStar:
+    __slots__ = ()
+
     def __str__(self):
         return "<*>"
 
@@ -120,6 +138,8 @@ class StepStar:
 
 
 class StepPlus:
+    __slots__ = ()
+
     def __str__(self):
         return "<+>"
 
@@ -128,6 +148,8 @@ class StepPlus:
 
 
 class StepNum:
+    __slots__ = ("value",)
+
     def __init__(self, value):
         self.value = value  # int
 
@@ -142,6 +164,8 @@ class StepNum:
 class ST(Token_):
     """Step token."""
 
+    __slots__ = ("kind", "string", "i")
+
     def __init__(self, kind, string, i):
         self.kind = kind  # StepStar | StepPlus | StepNum
         self.string = string
@@ -168,6 +192,8 @@ class ST(Token_):
 class Token:
     """Type of tokens."""
 
+    __slots__ = ("form", "rep", "loc")
+
     def __init__(self, token_, rep, loc):
         self.form = token_  # Token_
         self.rep = rep  # str | None
@@ -12,16 +12,17 @@
 # <https://github.com/tlaplus/tlapm/blob/main/src/proof/p_parser.ml>
 import copy
 
+from ..visitor import IterativeVisitor
 from .to_str import Nodes as _Nodes
 
 
 def _visit_bounds(visitor, bounds, *arg, **kw):
-    """Call the `visit` method of each bound."""
+    """Visit each bound, for `yield from` in `visit_*` methods."""
     bounds_ = list()
     for name, kind, dom in bounds:
         name_ = copy.copy(name)
-        kind_ = visitor.visit(kind, *arg, **kw)
-        dom_ = visitor.visit(dom, *arg, **kw)
+        kind_ = yield kind
+        dom_ = yield dom
         bound = (name_, kind_, dom_)
         bounds_.append(bound)
     return bounds_
@@ -30,32 +31,31 @@ def _visit_bounds(visitor, bounds, *arg, **kw):
 def _visit_usable(visitor, usable, *arg, **kw):
     facts = list()
     for fact in usable["facts"]:
-        fact_ = visitor.visit(fact, *arg, **kw)
+        fact_ = yield fact
         facts.append(fact_)
     defs = list()
     for defn in usable["defs"]:
-        defn_ = visitor.visit(defn, *arg, **kw)
+        defn_ = yield defn
         defs.append(defn_)
     usable = dict(facts=facts, defs=defs)
     return usable
 
 
-class NodeTransformer:
-    def __init__(self):
-        self.nodes = _Nodes
+class NodeTransformer(IterativeVisitor):
+    """Rebuilds syntax trees.
 
-    def visit(self, node, *arg, **kw):
-        """Call the implementation method for `node`.
+    For each `node` of class named `ClsName`,
+    there is a method named `visit_ClsName`.
 
-        For each `node` of class named `ClsName`,
-        there is a method named `visit_ClsName`.
+    Override the `visit_*` methods to change
+    the visitor's behavior, by subclassing it.
+    The methods visiting the children of a node
+    are generators that yield each child and get
+    back its visited value (see `IterativeVisitor`).
+    """
 
-        Override the `visit_*` methods to change
-        the visitor's behavior, by subclassing it.
-        """
-        method_name = f"visit_{type(node).__name__}"
-        method = getattr(self, method_name)
-        return method(node, *arg, **kw)
+    def __init__(self):
+        self.nodes = _Nodes
 
     def visit_FALSE(self, node, *arg, **kw):
         return self.nodes.FALSE()
@@ -148,23 +148,23 @@ class NodeTransformer:
         return self.nodes.Internal(node.value)
 
     def visit_Apply(self, node, *arg, **kw):
-        op = self.visit(node.op, *arg, **kw)
+        op = yield node.op
         operands = list()
         for operand in node.operands:
-            res = self.visit(operand, *arg, **kw)
+            res = yield operand
             operands.append(res)
         return self.nodes.Apply(op, operands)
 
     def visit_Function(self, node, *arg, **kw):
-        bounds = _visit_bounds(self, node.bounds, *arg, **kw)
-        expr = self.visit(node.expr, *arg, **kw)
+        bounds = yield from _visit_bounds(self, node.bounds, *arg, **kw)
+        expr = yield node.expr
         return self.nodes.Function(bounds, expr)
 
     def visit_FunctionApply(self, node, *arg, **kw):
-        op = self.visit(node.op, *arg, **kw)
+        op = yield node.op
         args = list()
         for arg_ in node.args:
-            res = self.visit(arg_, *arg, **kw)
+            res = yield arg_
             args.append(res)
         return self.nodes.FunctionApply(op, args)
 
@@ -178,21 +178,21 @@ class NodeTransformer:
         name_shapes = list()
         for name, shape in node.name_shapes:
             name_ = copy.copy(name)
-            shape_ = self.visit(shape, *arg, **kw)
+            shape_ = yield shape
             name_shapes.append((name_, shape_))
-        expr = self.visit(node.expr, *arg, **kw)
+        expr = yield node.expr
         return self.nodes.Lambda(name_shapes, expr)
 
     def visit_TemporalSub(self, node, *arg, **kw):
-        op = self.visit(node.op, *arg, **kw)
-        action = self.visit(node.action, *arg, **kw)
-        subscript = self.visit(node.subscript, *arg, **kw)
+        op = yield node.op
+        action = yield node.action
+        subscript = yield node.subscript
         return self.nodes.TemporalSub(op, action, subscript)
 
     def visit_Sub(self, node, *arg, **kw):
-        op = self.visit(node.op, *arg, **kw)
-        action = self.visit(node.action, *arg, **kw)
-        subscript = self.visit(node.subscript, *arg, **kw)
+        op = yield node.op
+        action = yield node.action
+        subscript = yield node.subscript
         return self.nodes.Sub(op, action, subscript)
 
     def visit_BoxOp(self, node, *arg, **kw):
@@ -202,13 +202,13 @@ class NodeTransformer:
         return self.nodes.DiamondOp()
 
     def visit_Dot(self, node, *arg, **kw):
-        expr = self.visit(node.expr, *arg, **kw)
+        expr = yield node.expr
         string = copy.copy(node.string)
         return self.nodes.Dot(expr, string)
 
     def visit_Parens(self, node, *arg, **kw):
-        expr = self.visit(node.expr, *arg, **kw)
-        pform = self.visit(node.pform, *arg, **kw)
+        expr = yield node.expr
+        pform = yield node.pform
         return self.nodes.Parens(expr, pform)
 
     def visit_Syntax(self, node, *arg, **kw):
@@ -230,17 +230,17 @@ class NodeTransformer:
         return self.nodes.IndexedLabel(string, name_int_list)
 
     def visit_If(self, node, *arg, **kw):
-        test = self.visit(node.test, *arg, **kw)
-        then = self.visit(node.then, *arg, **kw)
-        else_ = self.visit(node.else_, *arg, **kw)
+        test = yield node.test
+        then = yield node.then
+        else_ = yield node.else_
         return self.nodes.If(test, then, else_)
 
     def visit_Let(self, node, *arg, **kw):
         definitions = list()
         for defn in node.definitions:
-            defn_ = self.visit(defn, *arg, **kw)
+            defn_ = yield defn
             definitions.append(defn_)
-        expr = self.visit(node.expr, *arg, **kw)
+        expr = yield node.expr
         return self.nodes.Let(definitions, expr)
 
     def visit_Forall(self, node, *arg, **kw):
@@ -250,50 +250,50 @@ class NodeTransformer:
         return self.nodes.Exists()
 
     def visit_RigidQuantifier(self, node, *arg, **kw):
-        quantifier = self.visit(node.quantifier, *arg, **kw)
-        bounds = _visit_bounds(self, node.bounds, *arg, **kw)
-        expr = self.visit(node.expr, *arg, **kw)
+        quantifier = yield node.quantifier
+        bounds = yield from _visit_bounds(self, node.bounds, *arg, **kw)
+        expr = yield node.expr
         return self.nodes.RigidQuantifier(quantifier, bounds, expr)
 
     def visit_TemporalQuantifier(self, node, *arg, **kw):
-        quantifier = self.visit(node.quantifier, *arg, **kw)
+        quantifier = yield node.quantifier
         variables = [copy.copy(var) for var in node.variables]
-        expr = self.visit(node.expr, *arg, **kw)
+        expr = yield node.expr
         return self.nodes.TemporalQuantifier(quantifier, variables, expr)
 
     def visit_Choose(self, node, *arg, **kw):
         if node.bound is None:
             bound = None
         else:
-            bound = self.visit(node.bound, *arg, **kw)
-        expr = self.visit(node.expr, *arg, **kw)
+            bound = yield node.bound
+        expr = yield node.expr
         return self.nodes.Choose(bound, expr)
 
     def visit_Case(self, node, *arg, **kw):
         arms = list()
         for guard, expr in node.arms:
-            guard_ = self.visit(guard, *arg, **kw)
-            expr_ = self.visit(expr, *arg, **kw)
+            guard_ = yield guard
+            expr_ = yield expr
             arms.append((guard_, expr_))
-        other = self.visit(node.other, *arg, **kw)
+        other = yield node.other
         return self.nodes.Case(arms, other)
 
     def visit_SetEnum(self, node, *arg, **kw):
         exprs = list()
         for expr in node.exprs:
-            expr_ = self.visit(expr, *arg, **kw)
+            expr_ = yield expr
             exprs.append(expr_)
         return self.nodes.SetEnum(exprs)
 
     def visit_SetSt(self, node, *arg, **kw):
         name = copy.copy(node.name)
-        bound = self.visit(node.bound, *arg, **kw)
-        expr = self.visit(node.expr, *arg, **kw)
+        bound = yield node.bound
+        expr = yield node.expr
         return self.nodes.SetSt(name, bound, expr)
 
     def visit_SetOf(self, node, *arg, **kw):
-        expr = self.visit(node.expr, *arg, **kw)
-        bounds = _visit_bounds(self, node.boundeds, *arg, **kw)
+        expr = yield node.expr
+        bounds = yield from _visit_bounds(self, node.boundeds, *arg, **kw)
         return self.nodes.SetOf(expr, bounds)
 
     def visit_And(self, node, *arg, **kw):
@@ -303,10 +303,10 @@ class NodeTransformer:
         return self.nodes.Or()
 
     def visit_List(self, node, *arg, **kw):
-        op = self.visit(node.op, *arg, **kw)
+        op = yield node.op
         exprs = list()
         for expr in node.exprs:
-            expr_ = self.visit(expr, *arg, **kw)
+            expr_ = yield expr
             exprs.append(expr_)
         return self.nodes.List(op, exprs)
 
@@ -314,7 +314,7 @@ class NodeTransformer:
         items = list()
         for name, expr in node.items:
             name_ = copy.copy(name)
-            expr_ = self.visit(expr, *arg, **kw)
+            expr_ = yield expr
             pair = (name_, expr_)
             items.append(pair)
         return self.nodes.Record(items)
@@ -323,7 +323,7 @@ class NodeTransformer:
         items = list()
         for name, expr in node.items:
             name_ = copy.copy(name)
-            expr_ = self.visit(expr, *arg, **kw)
+            expr_ = yield expr
             pair = (name_, expr_)
             items.append(pair)
         return self.nodes.RecordSet(items)
@@ -333,24 +333,24 @@ class NodeTransformer:
         return self.nodes.Except_dot(name)
 
     def visit_Except_apply(self, node, *arg, **kw):
-        expr = self.visit(node.expr, *arg, **kw)
+        expr = yield node.expr
         return self.nodes.Except_apply(expr)
 
     def visit_Except(self, node, *arg, **kw):
-        expr = self.visit(node.expr, *arg, **kw)
+        expr = yield node.expr
         exspec_list = list()
         for expoints, e in node.exspec_list:
-            e_ = self.visit(e, *arg, **kw)
+            e_ = yield e
             expoints_ = list()
             for expoint in expoints:
-                expoint_ = self.visit(expoint, *arg, **kw)
+                expoint_ = yield expoint
                 expoints_.append(expoint_)
             pair = (expoints_, e_)
             exspec_list.append(pair)
         return self.nodes.Except(expr, exspec_list)
 
     def visit_Domain(self, node, *arg, **kw):
-        expr = self.visit(node.expr, *arg, **kw)
+        expr = yield node.expr
         return self.nodes.Domain(expr)
 
     def visit_NoDomain(self, node, *arg, **kw):
@@ -360,8 +360,8 @@ class NodeTransformer:
         return self.nodes.Ditto()
 
     def visit_Bounded(self, node, *arg, **kw):
-        expr = self.visit(node.expr, *arg, **kw)
-        vis = self.visit(node.visibility, *arg, **kw)
+        expr = yield node.expr
+        vis = yield node.visibility
         return self.nodes.Bounded(expr, vis)
 
     def visit_Unbounded(self, node, *arg, **kw):
@@ -380,22 +380,22 @@ class NodeTransformer:
         return self.nodes.At(node.boolean)
 
     def visit_Arrow(self, node, *arg, **kw):
-        expr1 = self.visit(node.expr1, *arg, **kw)
-        expr2 = self.visit(node.expr2, *arg, **kw)
+        expr1 = yield node.expr1
+        expr2 = yield node.expr2
         return self.nodes.Arrow(expr1, expr2)
 
     def visit_Tuple(self, node, *arg, **kw):
         exprs = list()
         for expr in node.exprs:
-            expr_ = self.visit(expr, *arg, **kw)
+            expr_ = yield expr
             exprs.append(expr_)
         return self.nodes.Tuple(exprs)
 
     def visit_Bang(self, node, *arg, **kw):
-        expr = self.visit(node.expr, *arg, **kw)
+        expr = yield node.expr
         sel_list = list()
         for sel in node.sel_list:
-            sel_ = self.visit(sel, *arg, **kw)
+            sel_ = yield sel
             sel_list.append(sel_)
         return self.nodes.Bang(expr, sel_list)
 
@@ -412,23 +412,23 @@ class NodeTransformer:
         return self.nodes.Number(node.integer, node.mantissa)
 
     def visit_Fairness(self, node, *arg, **kw):
-        op = self.visit(node.op, *arg, **kw)
-        subscript = self.visit(node.subscript, *arg, **kw)
-        expr = self.visit(node.expr, *arg, **kw)
+        op = yield node.op
+        subscript = yield node.subscript
+        expr = yield node.expr
         return self.nodes.Fairness(op, subscript, expr)
 
     def visit_SelLab(self, node, *arg, **kw):
         string = copy.copy(node.string)
         exprs = list()
         for e in node.exprs:
-            expr = self.visit(e, *arg, **kw)
+            expr = yield e
             exprs.append(expr)
         return self.nodes.SelLab(string, exprs)
 
     def visit_SelInst(self, node, *arg, **kw):
         exprs = list()
         for e in node.exprs:
-            expr = self.visit(e, *arg, **kw)
+            expr = yield e
             exprs.append(expr)
         return self.nodes.SelInst(exprs)
 
@@ -450,15 +450,15 @@ class NodeTransformer:
     def visit_Sequent(self, node, *arg, **kw):
         context = list()
         for item in node.context:
-            item_ = self.visit(item, *arg, **kw)
+            item_ = yield item
             context.append(item_)
-        goal = self.visit(node.goal, *arg, **kw)
+        goal = yield node.goal
         return self.nodes.Sequent(context, goal)
 
     def visit_Fact(self, node, *arg, **kw):
-        expr = self.visit(node.expr, *arg, **kw)
-        vis = self.visit(node.visibility, *arg, **kw)
-        time = self.visit(node.time, *arg, **kw)
+        expr = yield node.expr
+        vis = yield node.visibility
+        time = yield node.time
         return self.nodes.Fact(expr, vis, time)
 
     def visit_Flex(self, node, *arg, **kw):
@@ -467,9 +467,9 @@ class NodeTransformer:
 
     def visit_Fresh(self, node, *arg, **kw):
         name = copy.copy(node.name)
-        shape = self.visit(node.shape, *arg, **kw)
-        kind = self.visit(node.kind, *arg, **kw)
-        domain = self.visit(node.domain, *arg, **kw)
+        shape = yield node.shape
+        kind = yield node.kind
+        domain = yield node.domain
         return self.nodes.Fresh(name, shape, kind, domain)
 
     def visit_Constant(self, node, *arg, **kw):
@@ -486,7 +486,7 @@ class NodeTransformer:
 
     def visit_OperatorDef(self, node, *arg, **kw):
         name = copy.copy(node.name)
-        expr = self.visit(node.expr, *arg, **kw)
+        expr = yield node.expr
         return self.nodes.OperatorDef(name, expr)
 
     def visit_Instance(self, node, *arg, **kw):
@@ -496,7 +496,7 @@ class NodeTransformer:
         sub = list()
         for name, expr in node.sub:
             name_ = copy.copy(name)
-            expr_ = self.visit(expr, *arg, **kw)
+            expr_ = yield expr
             sub.append((name_, expr_))
         return self.nodes.Instance(name, args, module, sub)
 
@@ -504,7 +504,7 @@ class NodeTransformer:
         declarations = list()
         for name, shape in node.declarations:
             name_ = copy.copy(name)
-            shape_ = self.visit(shape, *arg, **kw)
+            shape_ = yield shape
             pair = (name_, shape_)
             declarations.append(pair)
         return self.nodes.Constants(declarations)
@@ -517,7 +517,7 @@ class NodeTransformer:
         declarations = list()
         for name, shape in node.declarations:
             name_ = copy.copy(name)
-            shape_ = self.visit(shape, *arg, **kw)
+            shape_ = yield shape
             pair = (name_, shape_)
             declarations.append(pair)
         return self.nodes.Recursives(declarations)
@@ -532,20 +532,20 @@ class NodeTransformer:
         return self.nodes.User()
 
     def visit_Definition(self, node, *arg, **kw):
-        defn = self.visit(node.definition, *arg, **kw)
-        wd = self.visit(node.wheredef, *arg, **kw)
-        vis = self.visit(node.visibility, *arg, **kw)
-        local = self.visit(node.local, *arg, **kw)
+        defn = yield node.definition
+        wd = yield node.wheredef
+        vis = yield node.visibility
+        local = yield node.local
         return self.nodes.Definition(defn, wd, vis, local)
 
     def visit_AnonymousInstance(self, node, *arg, **kw):
-        instance = self.visit(node.instance, *arg, **kw)
-        local = self.visit(node.local, *arg, **kw)
+        instance = yield node.instance
+        local = yield node.local
         return self.nodes.AnonymousInstance(instance, local)
 
     def visit_Mutate(self, node, *arg, **kw):
-        kind = self.visit(node.kind, *arg, **kw)
-        usable = _visit_usable(self, node.usable, *arg, **kw)
+        kind = yield node.kind
+        usable = yield from _visit_usable(self, node.usable, *arg, **kw)
         return self.nodes.Mutate(kind, usable)
 
     def visit_ModuleHide(self, node, *arg, **kw):
@@ -560,12 +560,12 @@ class NodeTransformer:
         instancees = [copy.copy(s) for s in node.instancees]
         body = list()
         for unit in node.body:
-            unit_ = self.visit(unit, *arg, **kw)
+            unit_ = yield unit
             body.append(unit_)
         return self.nodes.Module(name, extendees, instancees, body)
 
     def visit_Submodule(self, node, *arg, **kw):
-        module = self.visit(node.module, *arg, **kw)
+        module = yield node.module
         return self.nodes.Submodule(module)
 
     def visit_Suppress(self, node, *arg, **kw):
@@ -591,7 +591,7 @@ class NodeTransformer:
             name = None
         else:
             name = copy.copy(node.name)
-        expr = self.visit(node.expr, *arg, **kw)
+        expr = yield node.expr
         return self.nodes.Axiom(name, expr)
 
     def visit_Theorem(self, node, *arg, **kw):
@@ -599,8 +599,8 @@ class NodeTransformer:
             name = None
         else:
             name = copy.copy(node.name)
-        body = self.visit(node.body, *arg, **kw)
-        proof = self.visit(node.proof, *arg, **kw)
+        body = yield node.body
+        proof = yield node.proof
         return self.nodes.Theorem(name, body, proof)
 
     def visit_Named(self, node, *arg, **kw):
@@ -617,96 +617,96 @@ class NodeTransformer:
         return self.nodes.Obvious()
 
     def visit_Omitted(self, node, *arg, **kw):
-        omission = self.visit(node.omission, *arg, **kw)
+        omission = yield node.omission
         return self.nodes.Omitted(omission)
 
     def visit_By(self, node, *arg, **kw):
-        usable = _visit_usable(self, node, *arg, **kw)
+        usable = yield from _visit_usable(self, node, *arg, **kw)
         return self.nodes.By(usable, node.only)
 
     def visit_Steps(self, node, *arg, **kw):
         steps = list()
         for step in node.steps:
-            step_ = self.visit(step, *arg, **kw)
+            step_ = yield step
             steps.append(step_)
-        qed_step = self.visit(node.qed_step, *arg, **kw)
+        qed_step = yield node.qed_step
         return self.nodes.Steps(steps, qed_step)
 
     def visit_Hide(self, node, *arg, **kw):
-        usable = _visit_usable(self, node.usable, *arg, **kw)
+        usable = yield from _visit_usable(self, node.usable, *arg, **kw)
         res = self.nodes.Hide(usable)
-        res.step_number = self.visit(node.step_number, *arg, **kw)
+        res.step_number = yield node.step_number
         return res
 
     def visit_Define(self, node, *arg, **kw):
         definitions = list()
         for defn in node.definitions:
-            defn_ = self.visit(defn, *arg, **kw)
+            defn_ = yield defn
             definitions.append(defn_)
         res = self.nodes.Define(definitions)
-        res.step_number = self.visit(node.step_number, *arg, **kw)
+        res.step_number = yield node.step_number
         return res
 
     def visit_Assert(self, node, *arg, **kw):
-        sequent = self.visit(node.sequent, *arg, **kw)
-        proof = self.visit(node.proof, *arg, **kw)
+        sequent = yield node.sequent
+        proof = yield node.proof
         res = self.nodes.Assert(sequent, proof)
-        res.step_number = self.visit(node.step_number, *arg, **kw)
+        res.step_number = yield node.step_number
         return res
 
     def visit_Suffices(self, node, *arg, **kw):
-        sequent = self.visit(node.sequent, *arg, **kw)
-        proof = self.visit(node.proof, *arg, **kw)
+        sequent = yield node.sequent
+        proof = yield node.proof
         res = self.nodes.Suffices(sequent, proof)
-        res.step_number = self.visit(node.step_number, *arg, **kw)
+        res.step_number = yield node.step_number
         return res
 
     def visit_Pcase(self, node, *arg, **kw):
-        expr = self.visit(node.expr, *arg, **kw)
-        proof = self.visit(node.proof, *arg, **kw)
+        expr = yield node.expr
+        proof = yield node.proof
         res = self.nodes.Pcase(expr, proof)
-        res.step_number = self.visit(node.step_number, *arg, **kw)
+        res.step_number = yield node.step_number
         return res
 
     def visit_Pick(self, node, *arg, **kw):
-        bounds = _visit_bounds(self, node.bounds, *arg, **kw)
-        expr = self.visit(node.expr, *arg, **kw)
-        proof = self.visit(node.proof, *arg, **kw)
+        bounds = yield from _visit_bounds(self, node.bounds, *arg, **kw)
+        expr = yield node.expr
+        proof = yield node.proof
         res = self.nodes.Pick(bounds, expr, proof)
-        res.step_number = self.visit(node.step_number, *arg, **kw)
+        res.step_number = yield node.step_number
         return res
 
     def visit_Use(self, node, *arg, **kw):
-        usable = _visit_usable(self, node.usable, *arg, **kw)
+        usable = yield from _visit_usable(self, node.usable, *arg, **kw)
         res = self.nodes.Use(usable, node.only)
-        res.step_number = self.visit(node.step_number, *arg, **kw)
+        res.step_number = yield node.step_number
         return res
 
     def visit_Have(self, node, *arg, **kw):
-        expr = self.visit(node.expr, *arg, **kw)
+        expr = yield node.expr
         res = self.nodes.Have(expr)
-        res.step_number = self.visit(node.step_number, *arg, **kw)
+        res.step_number = yield node.step_number
         return res
 
     def visit_Take(self, node, *arg, **kw):
-        bounds = _visit_bounds(self, node.bounds, *arg, **kw)
+        bounds = yield from _visit_bounds(self, node.bounds, *arg, **kw)
         res = self.nodes.Take(bounds)
-        res.step_number = self.visit(node.step_number, *arg, **kw)
+        res.step_number = yield node.step_number
         return res
 
     def visit_Witness(self, node, *arg, **kw):
         exprs = list()
         for expr in node.exprs:
-            expr_ = self.visit(expr, *arg, **kw)
+            expr_ = yield expr
             exprs.append(expr_)
         res = self.nodes.Witness(exprs)
-        res.step_number = self.visit(node.step_number, *arg, **kw)
+        res.step_number = yield node.step_number
         return res
 
     def visit_Qed(self, node, *arg, **kw):
-        proof = self.visit(node.proof, *arg, **kw)
+        proof = yield node.proof
         res = self.nodes.Qed(proof)
-        res.step_number = self.visit(node.step_number, *arg, **kw)
+        res.step_number = yield node.step_number
         return res
 
     def visit_Dvar(self, node, *arg, **kw):
@@ -726,11 +726,11 @@ class NodeTransformer:
 
     def visit_BackendPragma(self, node, *arg, **kw):
         name = copy.copy(node.name)
-        expr = self.visit(node.expr, *arg, **kw)
+        expr = yield node.expr
         backend_args = list()
         for s, backend_arg in node.backend_args:
             s_ = copy.copy(s)
-            backend_arg_ = self.visit(backend_arg, *arg, **kw)
+            backend_arg_ = yield backend_arg
             pair = (s_, backend_arg_)
             backend_args.append(pair)
         return self.BackendPragma(name, expr, backend_args)
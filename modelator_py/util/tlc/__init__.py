@@ -1,3 +1,3 @@
-from .itf import TlcITFCmd, tlc_itf
+from .itf import STATE_CACHE, TlcITFCmd, tlc_itf, tlc_itf_stream
 
-__all__ = ["TlcITFCmd", "tlc_itf"]
+__all__ = ["STATE_CACHE", "TlcITFCmd", "tlc_itf", "tlc_itf_stream"]
@@ -1,6 +1,7 @@
 import json as stdjson
 
-from .itf import TlcITFCmd, tlc_itf
+from ...helper import write_json
+from .itf import TlcITFCmd, json_to_cmd, tlc_itf, tlc_itf_stream
 
 
 class Tlc:
@@ -13,6 +14,10 @@ class Tlc:
         lists=True,
         records=True,
         json=False,  # Read parameters from Json?
+        stream=False,  # Print one trace per line while reading stdin?
+        backend=None,
+        workers=None,
+        output_format="pretty",
     ):
         """
         Extract a list of Informal Trace Format traces from the stdout of TLC.
@@ -24,7 +29,18 @@ class Tlc:
             lists : Convert 1-indexed functions (TLA+ sequences) to ITF lists?
             records : Convert string-indexed functions (TLA+ records) to ITF records?
             json : Read arguments from json instead of cli?
+            stream : Read stdin line by line and print each trace as soon as it
+                is complete, as one line of Json (NDJSON)?
+            backend : Run the conversion "serial", or in a "thread" or "process"
+                pool? Picked from the size of the input if not given.
+            workers : Number of pool workers (default: number of cores)
+            output_format : Print {"traces": [...]} "pretty" (default) or
+                "compact", or print one trace per line ("ndjson")?
         """
+        if stream:
+            self._itf_stream(lists=lists, records=records, json=json)
+            return
+
         result = None
         if json:
             json_dict = stdjson.loads(self._stdin.read())
@@ -39,6 +55,8 @@ class Tlc:
             cmd.stdout = self._stdin.read()
             cmd.lists = lists
             cmd.records = records
+            cmd.backend = backend
+            cmd.workers = workers
 
             assert (
                 cmd.stdout is not None
@@ -46,8 +64,28 @@ class Tlc:
 
             result = tlc_itf(cmd=cmd)
 
+        if output_format == "ndjson":
+            for trace in result:
+                write_json(trace, output_format="ndjson")
+            return
+
         obj_to_print = {}
         obj_to_print["traces"] = result
 
-        to_print = stdjson.dumps(obj_to_print, indent=4, sort_keys=True)
-        print(to_print)
+        write_json(obj_to_print, output_format=output_format)
+
+    def _itf_stream(self, *, lists, records, json):
+        assert (
+            self._stdin is not None
+        ), "TLC's stdout string should be passed on stdin if not passing json"
+
+        lines = self._stdin
+        if json:
+            cmd = json_to_cmd(stdjson.loads(self._stdin.read()))
+            assert cmd.stdout is not None, "tlc_itf requires TLC's stdout as input data"
+            lines = cmd.stdout.splitlines(keepends=True)
+            lists = cmd.lists
+            records = cmd.records
+
+        for trace in tlc_itf_stream(lines, lists=lists, records=records):
+            write_json(trace, output_format="ndjson")
@@ -1,34 +1,48 @@
+import functools
 from dataclasses import dataclass
 from typing import Optional
 
-from modelator_py.helper import parallel_map
+from modelator_py.helper import LRUCache, parallel_map
 
-from ..informal_trace_format import JsonSerializer, with_lists, with_records
-from .stdout_to_informal_trace_format import (
-    extract_traces,
-    tlc_trace_to_informal_trace_format_trace,
-)
+from ..informal_trace_format import JsonFormatter
+from .state_to_informal_trace_format import state_to_informal_trace_format_state
+from .stdout_to_informal_trace_format import extract_traces, extract_traces_from_file
 
 # mypy: ignore-errors
 
+# Json objects of converted TLC states, by state text and conversion options,
+# for callers that convert the output of many runs of the same model: pass it
+# as the cache of tlc_itf or tlc_itf_stream to parse their shared states once.
+STATE_CACHE = LRUCache(maxsize=10000)
+
 
 @dataclass
 class TlcITFCmd:
     stdout: Optional[str] = None  # Captured stdout from TLC execution
     lists: Optional[str] = None  # Transform 1-indexed TLA+ functions into lists
     records: Optional[str] = None  # Transform string indexed functions into records
+    backend: Optional[str] = None  # "serial", "thread" or "process" (default: auto)
+    workers: Optional[int] = None  # Number of pool workers (default: cpu count)
 
 
 def json_to_cmd(json) -> TlcITFCmd:
-    json = {"stdout": None, "lists": True, "records": True} | json
+    json = {
+        "stdout": None,
+        "lists": True,
+        "records": True,
+        "backend": None,
+        "workers": None,
+    } | json
     cmd = TlcITFCmd()
     cmd.stdout = json["stdout"]
     cmd.lists = json["lists"]
     cmd.records = json["records"]
+    cmd.backend = json["backend"]
+    cmd.workers = json["workers"]
     return cmd
 
 
-def tlc_itf(*, cmd=None, json=None):  # types: ignore
+def tlc_itf(*, cmd=None, json=None, cache=None):  # types: ignore
     """
     Extract a list of execution traces in the Informal Trace Format from the
     stdout of a TLC execution.
@@ -36,6 +50,13 @@ def tlc_itf(*, cmd=None, json=None):  # types: ignore
     Returns a list of ITFTrace objects.
 
     Benefits from multiple cpu cores as parallelizes TLA+ raw text to AST parsing.
+    Small inputs are converted in-process unless cmd.backend says otherwise.
+
+    Each distinct state is converted once. If an LRUCache is given as cache
+    (e.g. STATE_CACHE), states are looked up in it first, so that calls sharing
+    the cache parse their common states once. The returned states are always
+    new objects, which can be modified without affecting the cache or each
+    other.
     """
 
     if json is not None:
@@ -43,15 +64,105 @@ def tlc_itf(*, cmd=None, json=None):  # types: ignore
 
     assert cmd.stdout is not None, "tlc_itf requires TLC's stdout as input data"
 
-    tlc_traces = extract_traces(cmd.stdout)
+    tlc_traces, _ = extract_traces(cmd.stdout)
+
+    # States are the unit of work, so that a single long trace is spread over
+    # all workers too. The states of all traces not found in the cache are
+    # mapped in order, in balanced contiguous chunks, and then regrouped by
+    # trace. All stages run in the worker, so only the TLC state strings are
+    # sent to the pool and only Json-ready objects come back.
+    mapper = functools.partial(parallel_map, backend=cmd.backend, workers=cmd.workers)
+    tlc_states = [state for trace in tlc_traces for state in trace]
+    itf_states = _tlc_states_to_itf_json(
+        tlc_states, lists=cmd.lists, records=cmd.records, cache=cache, mapper=mapper
+    )
+
+    itf_traces_objects = []
+    begin = 0
+    for trace in tlc_traces:
+        end = begin + len(trace)
+        itf_traces_objects.append(_itf_trace_json(itf_states[begin:end]))
+        begin = end
+    return itf_traces_objects
 
-    itf_traces = parallel_map(tlc_trace_to_informal_trace_format_trace, tlc_traces)
 
-    if cmd.lists:
-        itf_traces = parallel_map(with_lists, itf_traces)
-    if cmd.records:
-        itf_traces = parallel_map(with_records, itf_traces)
+def _tlc_states_to_itf_json(tlc_states, *, lists, records, cache, mapper=None):
+    keys = [(state, lists, records) for state in tlc_states]
+    shared = cache is not None
+    if not shared:
+        # Still convert each distinct state of this call once
+        cache = LRUCache(maxsize=len(keys))
+    itf_states = cache.map(_tlc_state_key_to_itf_json, keys, mapper)
+    return _unshared(itf_states, shared)
 
-    itf_traces_objects = parallel_map(lambda t: JsonSerializer().visit(t), itf_traces)
 
-    return itf_traces_objects
+def _unshared(itf_states, shared):
+    """
+    The Json states, where each state that the cache holds (if shared) or that
+    appears earlier in the list is replaced by a copy.
+    """
+    seen = set()
+    unshared = []
+    for state in itf_states:
+        if shared or id(state) in seen:
+            state = _copy_json(state)
+        else:
+            seen.add(id(state))
+        unshared.append(state)
+    return unshared
+
+
+def _copy_json(value):
+    if isinstance(value, dict):
+        return {k: _copy_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy_json(v) for v in value]
+    return value
+
+
+def _tlc_state_key_to_itf_json(key):
+    tlc_state, lists, records = key
+    return _tlc_state_to_itf_json(tlc_state, lists=lists, records=records)
+
+
+def _tlc_state_to_itf_json(tlc_state, *, lists, records):
+    itf_state = state_to_informal_trace_format_state(tlc_state)
+    return JsonFormatter(lists=lists, records=records).visit(itf_state)
+
+
+def _itf_trace_json(itf_states):
+    """
+    The Json object of the ITFTrace with the given Json states, as built by
+    tlc_trace_to_informal_trace_format_trace and JsonSerializer.
+    """
+    vars = []
+    if 0 < len(itf_states):
+        vars = list(itf_states[0].keys())
+    return {"#meta": None, "vars": vars, "states": itf_states}
+
+
+def _tlc_trace_to_itf_json(tlc_trace, *, lists, records, cache):
+    return _itf_trace_json(
+        _tlc_states_to_itf_json(tlc_trace, lists=lists, records=records, cache=cache)
+    )
+
+
+def tlc_itf_stream(lines, *, lists=True, records=True, cache=None):
+    """
+    Extract execution traces in the Informal Trace Format from the lines of the
+    stdout of a TLC execution, while it is being read.
+
+    Yields one Json-ready ITF trace object as soon as the trace is complete, so
+    memory is bounded by the largest trace rather than by the size of the output.
+
+    Arguments:
+        lines : iterator over the lines of TLC's stdout (e.g. a file object)
+        lists : Convert 1-indexed functions (TLA+ sequences) to ITF lists?
+        records : Convert string-indexed functions (TLA+ records) to ITF records?
+        cache : optional LRUCache of converted states, as in tlc_itf
+    """
+
+    for tlc_trace, _ in extract_traces_from_file(lines):
+        yield _tlc_trace_to_itf_json(
+            tlc_trace, lists=lists, records=records, cache=cache
+        )
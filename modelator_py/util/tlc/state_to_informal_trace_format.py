@@ -1,6 +1,16 @@
-from modelator_py.util.informal_trace_format import ITFMap, ITFModelValue, ITFSet, ITFState
+import re
+import sys
+
+from modelator_py.util.informal_trace_format import (
+    ITFMap,
+    ITFModelValue,
+    ITFSet,
+    ITFState,
+)
 from modelator_py.util.tla import parser, visit
+from modelator_py.util.tla.lex import PREFIX_OPERATORS, RESERVED
 from modelator_py.util.tla.to_str import Nodes
+from modelator_py.util.visitor import Visit
 
 
 def merge_itf_maps(f, g):
@@ -30,22 +40,11 @@ class Visitor(visit.NodeTransformer):
     a list of [<variable name>, <value>] pairs.
 
     TLC states are given in a conjunction list. This visitor ONLY
-    work on such input.
+    work on such input. Its methods are generators yielding the children
+    to visit (see `IterativeVisitor`), so that deeply nested values such
+    as long `@@` chains can be visited.
     """
 
-    def visit(self, node, *arg, **kw):
-        """Call the implementation method for `node`.
-
-        For each `node` of class named `ClsName`,
-        there is a method named `visit_ClsName`.
-
-        Override the `visit_*` methods to change
-        the visitor's behavior, by subclassing it.
-        """
-        method_name = f"visit_{type(node).__name__}"
-        method = getattr(self, method_name)
-        return method(node, *arg, **kw)
-
     def visit_Opaque(self, node, *arg, **kw):
         # .name
         if kw.get("in_rhs") is True:
@@ -60,10 +59,10 @@ class Visitor(visit.NodeTransformer):
         """
         # .op
         # .exprs
-        self.visit(node.op, *arg, **kw)
+        yield node.op
         variable_pairs = []
         for expr in node.exprs:
-            e = self.visit(expr, *arg, **kw)
+            e = yield expr
             variable_pairs.append(e)
         return variable_pairs
 
@@ -71,7 +70,7 @@ class Visitor(visit.NodeTransformer):
         # .exprs
         elements = []
         for expr in node.exprs:
-            e = self.visit(expr, *arg, **kw)
+            e = yield expr
             elements.append(e)
         return ITFSet(elements)
 
@@ -79,9 +78,8 @@ class Visitor(visit.NodeTransformer):
         # .items
         pairs = []
         for name, expr in node.items:
-            e = self.visit(expr, *arg, **kw)
-            pair = [name, e]
-            pairs.append(pair)
+            e = yield expr
+            pairs.append((name, e))
         return ITFMap(pairs)
 
     def visit_String(self, node, *arg, **kw):
@@ -96,8 +94,8 @@ class Visitor(visit.NodeTransformer):
     def visit_Parens(self, node, *arg, **kw):
         # .expr
         # .pform
-        expr = self.visit(node.expr, *arg, **kw)
-        self.visit(node.pform, *arg, **kw)
+        expr = yield node.expr
+        yield node.pform
         return expr
 
     def visit_Syntax(self, node, *arg, **kw):
@@ -108,9 +106,8 @@ class Visitor(visit.NodeTransformer):
         i = 1
         pairs = []
         for expr in node.exprs:
-            e = self.visit(expr, *arg, **kw)
-            pair = [i, e]
-            pairs.append(pair)
+            e = yield expr
+            pairs.append((i, e))
             i += 1
         return ITFMap(pairs)
 
@@ -126,32 +123,32 @@ class Visitor(visit.NodeTransformer):
 
         assert type(node.op) in {Nodes.Eq, Nodes.Opaque}
 
-        self.visit(node.op, *arg, **kw)
+        yield node.op
 
         if type(node.op) == Nodes.Eq:
             assert len(node.operands) == 2
             variable_name = node.operands[0].name
             kw = {k: v for k, v in kw.items()}
             kw["in_rhs"] = True
-            variable_value = self.visit(node.operands[1], *arg, **kw)
+            variable_value = yield Visit(node.operands[1], *arg, **kw)
             return [variable_name, variable_value]
         if type(node.op) == Nodes.Opaque:
             assert node.op.name in {":>", "@@", "-."}
             if node.op.name == ":>":
                 assert len(node.operands) == 2
-                key = self.visit(node.operands[0], *arg, **kw)
-                value = self.visit(node.operands[1], *arg, **kw)
-                return ITFMap([[key, value]])
+                key = yield node.operands[0]
+                value = yield node.operands[1]
+                return ITFMap([(key, value)])
             if node.op.name == "@@":
                 assert len(node.operands) == 2
-                f = self.visit(node.operands[0], *arg, **kw)
-                g = self.visit(node.operands[1], *arg, **kw)
+                f = yield node.operands[0]
+                g = yield node.operands[1]
                 assert type(f) == ITFMap
                 assert type(g) == ITFMap
                 return merge_itf_maps(f, g)
             if node.op.name == "-.":
                 assert len(node.operands) == 1
-                return -self.visit(node.operands[0], *arg, **kw)
+                return -(yield node.operands[0])
 
     def visit_Number(self, node, *arg, **kw):
         """WARNING: does not support floating point"""
@@ -163,11 +160,192 @@ class Visitor(visit.NodeTransformer):
         pass
 
 
+class UnsupportedStateExpression(Exception):
+    """The state expression is outside the value language printed by TLC."""
+
+
+# Tokens of the values printed by TLC. Lookaheads reject the longer
+# TLA+ tokens that start with the same characters (e.g. `=>`, `(*`, `]_`)
+# so that such input is left to the general parser.
+_TOKEN_REGEX = re.compile(
+    r"""[ \n]*(?:
+        (?P<number>[0-9]+(?![A-Za-z0-9_.]))
+        | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+        | (?P<string>"(?:[^"\\\n]|\\["\\tnfr])*")
+        | (?P<punct>/\\|:>|@@|\|->|<<|>>(?!_)|=(?![=<>|])|-(?![-.+>|])
+            |\((?![*+\-/\\.])|\[(?!\])|\](?!_)|\}(?!\*\))|[{),])
+        | (?P<end>\Z)
+    )""",
+    re.VERBOSE,
+)
+
+
+def _tokenize_state(state_expr_str):
+    """Return the tokens of `state_expr_str` as (kind, text) pairs."""
+    tokens = []
+    pos = 0
+    while True:
+        m = _TOKEN_REGEX.match(state_expr_str, pos)
+        if m is None:
+            raise UnsupportedStateExpression(state_expr_str[pos : pos + 20])
+        kind = m.lastgroup
+        tokens.append((kind, m.group(kind)))
+        if kind == "end":
+            return tokens
+        pos = m.end()
+
+
+class TlcStateParser:
+    """
+    Recursive descent parser for the state expressions printed by TLC.
+
+    TLC prints a state as a bulleted conjunction `/\\ var = value` of
+    values built from numbers, strings, booleans, model values, sets,
+    tuples, records and functions written with `:>` and `@@`. The parser
+    builds the ITF values in a single pass over the tokens and raises
+    `UnsupportedStateExpression` for anything else.
+    """
+
+    def __init__(self, state_expr_str):
+        self._tokens = _tokenize_state(state_expr_str)
+        self._i = 0
+
+    def _peek(self):
+        return self._tokens[self._i][1]
+
+    def _next(self):
+        token = self._tokens[self._i]
+        self._i += 1
+        return token
+
+    def _expect(self, text):
+        kind, value = self._next()
+        if kind != "punct" or value != text:
+            raise UnsupportedStateExpression(f"expected {text}, found {value}")
+
+    def _name(self):
+        kind, value = self._next()
+        if kind != "name" or value in RESERVED or value in PREFIX_OPERATORS:
+            raise UnsupportedStateExpression(f"expected a name, found {value}")
+        if value == "_" or value.startswith(("WF_", "SF_")):
+            raise UnsupportedStateExpression(f"expected a name, found {value}")
+        return sys.intern(value)
+
+    def parse_state(self):
+        """Return the list of [<variable name>, <value>] pairs."""
+        bulleted = self._peek() == "/\\"
+        pairs = []
+        while True:
+            if bulleted:
+                self._expect("/\\")
+            name = self._name()
+            self._expect("=")
+            pairs.append([name, self.parse_value()])
+            kind, value = self._tokens[self._i]
+            if kind == "end":
+                return pairs
+            if not bulleted or value != "/\\":
+                raise UnsupportedStateExpression(f"unexpected {value}")
+
+    def parse_value(self):
+        # `@@` has lower precedence than `:>` and is left associative
+        value = self._parse_colon_gt()
+        while self._peek() == "@@":
+            self._i += 1
+            other = self._parse_colon_gt()
+            if not isinstance(value, ITFMap) or not isinstance(other, ITFMap):
+                raise UnsupportedStateExpression("@@ of a value that is not a function")
+            value = merge_itf_maps(value, other)
+        return value
+
+    def _parse_colon_gt(self):
+        key = self._parse_atom()
+        if self._peek() != ":>":
+            return key
+        self._i += 1
+        value = self._parse_atom()
+        if self._peek() == ":>":
+            raise UnsupportedStateExpression(":> is not associative")
+        return ITFMap([(key, value)])
+
+    def _parse_atom(self):
+        kind, value = self._next()
+        if kind == "number":
+            return int(value)
+        if kind == "string":
+            return sys.intern(value[1:-1])
+        if kind == "name":
+            if value == "TRUE":
+                return True
+            if value == "FALSE":
+                return False
+            self._i -= 1
+            return ITFModelValue(self._name())
+        if kind != "punct":
+            raise UnsupportedStateExpression(f"unexpected {value}")
+        if value == "-":
+            kind, value = self._next()
+            if kind != "number":
+                raise UnsupportedStateExpression(f"unexpected {value} after -")
+            return -int(value)
+        if value == "(":
+            expr = self.parse_value()
+            self._expect(")")
+            return expr
+        if value == "{":
+            return ITFSet(self._parse_list("}"))
+        if value == "<<":
+            elements = self._parse_list(">>")
+            return ITFMap(list(enumerate(elements, start=1)))
+        if value == "[":
+            pairs = []
+            while True:
+                name = self._name()
+                self._expect("|->")
+                pairs.append((name, self.parse_value()))
+                if self._peek() != ",":
+                    break
+                self._i += 1
+            self._expect("]")
+            return ITFMap(pairs)
+        raise UnsupportedStateExpression(f"unexpected {value}")
+
+    def _parse_list(self, closing):
+        """Parse the comma separated values before `closing`."""
+        elements = []
+        if self._peek() == closing:
+            self._i += 1
+            return elements
+        while True:
+            elements.append(self.parse_value())
+            if self._peek() != ",":
+                break
+            self._i += 1
+        self._expect(closing)
+        return elements
+
+
 def state_to_informal_trace_format_state(state_expr_str: str):
     """
     Converts a state expression string as found in the stdout of TLC
     into an in memory AST representation.
 
+    States in the value language printed by TLC are read by the
+    dedicated `TlcStateParser`. Other expressions fall back to the
+    general TLA+ parser, which is a slow operation.
+    """
+    try:
+        var_value_pairs = TlcStateParser(state_expr_str).parse_state()
+    except UnsupportedStateExpression:
+        return _state_to_informal_trace_format_state_by_tla_parser(state_expr_str)
+    return ITFState({key: value for key, value in var_value_pairs})
+
+
+def _state_to_informal_trace_format_state_by_tla_parser(state_expr_str: str):
+    """
+    Converts a state expression string as found in the stdout of TLC
+    into an in memory AST representation, using the TLA+ parser.
+
     Note: this is a slow operation.
     """
     tree = parser.parse_expr(state_expr_str, nodes=Nodes)
@@ -1,8 +1,9 @@
-import typing
+import itertools
 import re
+import typing
 from typing import Iterator
 
-from modelator_py.util.informal_trace_format import ITFTrace
+from modelator_py.util.informal_trace_format import ITFTrace, share_unchanged_values
 
 from .state_to_informal_trace_format import state_to_informal_trace_format_state
 
@@ -42,14 +43,33 @@ def _trace_lines_model_checking_mode(line_iter: typing.Iterator[str]) -> typing.
 
         return single_state_footer or multi_state_footer
 
+    def is_end_of_trace(line, previous_line):
+        """Every state of a trace is followed by a blank line, so a trace is
+        complete once a blank line is followed by a line that is not a state."""
+        return (
+            previous_line == ""
+            and line != ""
+            and not line.startswith("State ")
+            and not line.startswith("Back to state ")
+        )
+
     header_open = False
-    header_cnt = 0
-    header_ix = -1
+    trace_open = False
+    previous_line = None
     trace = []
 
-    for i, line in enumerate(line_iter):
+    for line in line_iter:
         line = line.strip("\n")
-        if (header_ix >= 0
+
+        # Yield the trace as soon as it is known to be complete, rather than at
+        # the next trace or at the footer, which matters when the lines come
+        # from a running TLC process.
+        if trace_open and is_end_of_trace(line, previous_line):
+            trace_open = False
+            yield trace
+            trace = []
+
+        if (trace_open
                 and not is_start_of_new_trace(line)
                 and not (is_header(line) or is_footer(line))
                 and line):
@@ -57,22 +77,25 @@ def _trace_lines_model_checking_mode(line_iter: typing.Iterator[str]) -> typing.
 
         if is_start_of_new_trace(line):
             header_open = True
-            if 0 < header_cnt:
+            if trace_open:
+                trace_open = False
                 yield trace
                 trace = []
 
         if is_header(line):
-            header_cnt += 1
-            header_ix = i
+            trace_open = True
 
         # we need boolean header_open because the footer the conditions for the footer
         # of a single state trace will be met also in the line after the footer of a multi-state trace
         if header_open and is_footer(line):
             header_open = False
-            if 0 < header_cnt:
+            if trace_open:
                 yield trace
             break
 
+        previous_line = line
+
+
 def trace_lines_model_checking_mode_from_file(f) -> typing.Iterator[typing.List[str]]:
     """
     Returns list of lists. Each sublist is a list of lines
@@ -94,16 +117,7 @@ def trace_lines_model_checking_mode(stdout) -> typing.List[typing.List[str]]:
     return list(_trace_lines_model_checking_mode(stdout.split("\n")))
 
 
-def trace_lines_simulation_mode(stdout) -> typing.List[typing.List[str]]:
-    """
-    Returns list of lists. Each sublist is a list of lines
-    that make a trace.
-
-    Args:
-        stdout : stdout of TLC execution run in simulation mode
-    """
-    ret = []
-    lines = stdout.split("\n")
+def _trace_lines_simulation_mode(line_iter: typing.Iterator[str]) -> typing.Iterator[typing.List[str]]:
 
     def is_header(line):
         """Begins a trace and may also end a previous trace"""
@@ -114,19 +128,55 @@ def trace_lines_simulation_mode(stdout) -> typing.List[typing.List[str]]:
         """Ends the list of traces"""
         return line.startswith("Finished in")
 
-    header_cnt = 0
-    header_ix = -1
-    for i, line in enumerate(lines):
+    # The last four lines before the next header (or the footer) belong to
+    # the error report of the next trace, not to the current one.
+    trace = None
+    for line in line_iter:
+        line = line.strip("\n")
         if is_header(line):
-            if 0 < header_cnt:
-                trace = lines[header_ix : i - 4]
-                ret.append(trace)
-            header_cnt += 1
-            header_ix = i
-        if is_footer(line) and 0 < header_cnt:
-            ret.append(lines[header_ix : i - 4])
+            if trace is not None:
+                yield trace[:-4]
+            trace = []
+        if is_footer(line) and trace is not None:
+            yield trace[:-4]
+            trace = None
+        if trace is not None:
+            trace.append(line)
+
+
+def trace_lines_simulation_mode(stdout) -> typing.List[typing.List[str]]:
+    """
+    Returns list of lists. Each sublist is a list of lines
+    that make a trace.
 
-    return ret
+    Args:
+        stdout : stdout of TLC execution run in simulation mode
+    """
+    return list(_trace_lines_simulation_mode(stdout.split("\n")))
+
+
+def trace_lines_from_file(f) -> typing.Iterator[typing.List[str]]:
+    """
+    Yields lists of lines that make a trace, as soon as each trace is complete.
+
+    The TLC mode is detected from the "Running ..." line near the top of the
+    output, so only the lines up to that point are buffered.
+
+    Args:
+        f : iterator over the lines of the stdout of a TLC execution
+    """
+    line_iter = iter(f)
+    head = []
+    simulation = False
+    for line in line_iter:
+        head.append(line)
+        if line.startswith("Running "):
+            simulation = "Running Random Simulation" in line
+            break
+    lines = itertools.chain(head, line_iter)
+    if simulation:
+        return _trace_lines_simulation_mode(lines)
+    return _trace_lines_model_checking_mode(lines)
 
 
 def split_into_states(lines: typing.List[str]) -> typing.Tuple[typing.List[typing.List[str]], typing.Optional[typing.Tuple[int, int]]]:
@@ -184,8 +234,9 @@ def extract_traces_from_file(f: Iterator[str]) -> Iterator[list]:
     This generator yields 2-tuples, where the first entry is a trace
     and the second entry contains loop information in the case of lassos, or None if it's a normal trace.
     A trace is a list of substrings from the input and each substring is a state.
+    Both model checking and simulation mode output are supported.
     """
-    for trace in trace_lines_model_checking_mode_from_file(f):
+    for trace in trace_lines_from_file(f):
         trace_with_loop_info = split_into_states(trace)
         trace_split = trace_with_loop_info[0]
         loop_info = trace_with_loop_info[1]
@@ -215,15 +266,21 @@ def extract_traces(stdout: str):
     traces_state_strings = [["\n".join(lines) for lines in t] for t in traces_split]
     return traces_state_strings, loop_infos
 
-def tlc_trace_to_informal_trace_format_trace(trace: typing.List[str]):
+def tlc_trace_to_informal_trace_format_trace(trace: typing.List[str], cache=None):
     """
     Convert a tla trace from TLC stdout to the Informal Trace Format
     https://apalache.informal.systems/docs/adr/015adr-trace.html?highlight=trace%20format#adr-015-informal-trace-format-in-json
 
-    Trace input is a list of states. Each state is a string.
+    Trace input is a list of states. Each state is a string. If an LRUCache is
+    given as cache, states are looked up in it before being parsed, so that
+    states shared by several traces are parsed once.
     """
 
-    states = [state_to_informal_trace_format_state(state) for state in trace]
+    if cache is None:
+        states = [state_to_informal_trace_format_state(state) for state in trace]
+    else:
+        states = cache.map(state_to_informal_trace_format_state, trace)
+    share_unchanged_values(states)
     vars = []
     if 0 < len(states):
         vars = list(states[0].var_value_map.keys())
@@ -0,0 +1,278 @@
+"""
+Compact binary storage of collections of ITF traces.
+
+A store file is laid out as
+
+    MAGIC
+    columns: for each trace and each variable, the encoded values of the
+        variable in the states where it changed, followed by an array of one
+        little-endian 8 byte offset per state, pointing to the value of the
+        variable in that state (so unchanged values are stored once)
+    index: Json object with the string dictionary and, for each trace, its
+        meta object, variables (as string ids), number of states and the
+        offset of the offset array of each variable
+    footer: offset and length of the index, then MAGIC
+
+Values are a tag byte followed by the tag's payload. Integers are zigzag
+varints, and strings, model value names and record fields are varint ids in
+the string dictionary.
+
+The file is memory-mapped when read, and states are only decoded when they
+are accessed.
+"""
+
+import json as stdjson
+import mmap
+import struct
+import typing
+
+from .informal_trace_format import (
+    ITFList,
+    ITFMap,
+    ITFModelValue,
+    ITFRecord,
+    ITFSet,
+    ITFState,
+    ITFTrace,
+    identical,
+)
+
+# mypy: ignore-errors
+
+MAGIC = b"MITFSTORE1\n"
+
+_FALSE, _TRUE, _INT, _STR, _MODELVALUE, _LIST, _SET, _MAP, _RECORD = range(9)
+
+_OFFSET = struct.Struct("<Q")
+_FOOTER = struct.Struct("<QQ")
+
+
+def is_trace_store(path) -> bool:
+    """Does the file at path start like a trace store?"""
+    with open(path, "rb") as fd:
+        return fd.read(len(MAGIC)) == MAGIC
+
+
+def write_trace_store(path, traces: typing.Iterable[ITFTrace]):
+    """Write the ITF traces to a new store file at path."""
+    with open(path, "wb") as fd:
+        writer = _Writer(fd)
+        for trace in traces:
+            writer.write_trace(trace)
+        writer.finish()
+
+
+class _Writer:
+    def __init__(self, fd):
+        self._fd = fd
+        self._strings: typing.Dict[str, int] = {}
+        self._traces: typing.List[dict] = []
+        self._fd.write(MAGIC)
+
+    def _string_id(self, s):
+        string_id = self._strings.get(s)
+        if string_id is None:
+            string_id = self._strings[s] = len(self._strings)
+        return string_id
+
+    def write_trace(self, trace: ITFTrace):
+        columns = []
+        for var in trace.vars:
+            offsets = []
+            previous = None
+            for i, state in enumerate(trace.states):
+                value = state.var_value_map[var]
+                if i == 0 or not identical(value, previous):
+                    offsets.append(self._fd.tell())
+                    buffer = bytearray()
+                    self._encode(value, buffer)
+                    self._fd.write(buffer)
+                    previous = value
+                else:
+                    offsets.append(offsets[-1])
+            columns.append(self._fd.tell())
+            self._fd.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+
+        self._traces.append(
+            {
+                "meta": trace.meta,
+                "vars": [self._string_id(var) for var in trace.vars],
+                "states": len(trace.states),
+                "columns": columns,
+            }
+        )
+
+    def _encode(self, value, buffer: bytearray):
+        t = type(value)
+        if t is bool:
+            buffer.append(_TRUE if value else _FALSE)
+        elif t is int:
+            buffer.append(_INT)
+            _write_varint((value << 1) ^ -1 if value < 0 else value << 1, buffer)
+        elif t is str:
+            buffer.append(_STR)
+            _write_varint(self._string_id(value), buffer)
+        elif t is ITFModelValue:
+            buffer.append(_MODELVALUE)
+            _write_varint(self._string_id(value.name), buffer)
+        elif t is ITFList or t is ITFSet:
+            buffer.append(_LIST if t is ITFList else _SET)
+            _write_varint(len(value.elements), buffer)
+            for e in value.elements:
+                self._encode(e, buffer)
+        elif t is ITFMap:
+            buffer.append(_MAP)
+            _write_varint(len(value.elements), buffer)
+            for k, v in value.elements:
+                self._encode(k, buffer)
+                self._encode(v, buffer)
+        elif t is ITFRecord:
+            buffer.append(_RECORD)
+            _write_varint(len(value.elements), buffer)
+            for k, v in value.elements.items():
+                _write_varint(self._string_id(k), buffer)
+                self._encode(v, buffer)
+        else:
+            raise TypeError(f"Cannot store {value=} of type {t.__name__}")
+
+    def finish(self):
+        strings = sorted(self._strings, key=self._strings.__getitem__)
+        index = stdjson.dumps({"strings": strings, "traces": self._traces})
+        index = index.encode()
+        index_offset = self._fd.tell()
+        self._fd.write(index)
+        self._fd.write(_FOOTER.pack(index_offset, len(index)))
+        self._fd.write(MAGIC)
+
+
+def _write_varint(n, buffer: bytearray):
+    while n >= 0x80:
+        buffer.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buffer.append(n)
+
+
+class TraceStore:
+    """
+    Read-only access to a trace store file, which is memory-mapped.
+
+    store[t] is the t-th ITFTrace, with the values of unchanged variables
+    shared between states, and store.state(t, i) decodes only the i-th state
+    of the t-th trace. Use as a context manager, or call close() when done.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as fd:
+            self._mm = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mm
+        end = len(mm) - len(MAGIC)
+        if mm[: len(MAGIC)] != MAGIC or mm[end:] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a trace store")
+        index_offset, index_length = _FOOTER.unpack_from(mm, end - _FOOTER.size)
+        index = stdjson.loads(mm[index_offset : index_offset + index_length])
+        self._strings = index["strings"]
+        self._traces = index["traces"]
+
+    def __len__(self):
+        return len(self._traces)
+
+    def __getitem__(self, t) -> ITFTrace:
+        info = self._traces[t]
+        decoded = {}  # value offset -> value, to share unchanged values
+        var_value_maps = [{} for _ in range(info["states"])]
+        for var, offsets in zip(self.vars(t), self._columns(t)):
+            for values, offset in zip(var_value_maps, offsets):
+                if offset not in decoded:
+                    decoded[offset] = self._decode(offset)[0]
+                values[var] = decoded[offset]
+        return ITFTrace(
+            self.vars(t), [ITFState(m) for m in var_value_maps], info["meta"]
+        )
+
+    def __iter__(self):
+        return (self[t] for t in range(len(self)))
+
+    def vars(self, t) -> typing.List[str]:
+        """The variables of the t-th trace."""
+        return [self._strings[i] for i in self._traces[t]["vars"]]
+
+    def num_states(self, t) -> int:
+        """The number of states of the t-th trace."""
+        return self._traces[t]["states"]
+
+    def state(self, t, i) -> ITFState:
+        """The i-th state of the t-th trace, decoding nothing else."""
+        info = self._traces[t]
+        if not 0 <= i < info["states"]:
+            raise IndexError(f"State {i} out of range for trace {t}")
+        var_value_map = {}
+        for var, column in zip(self.vars(t), info["columns"]):
+            (offset,) = _OFFSET.unpack_from(self._mm, column + _OFFSET.size * i)
+            var_value_map[var] = self._decode(offset)[0]
+        return ITFState(var_value_map)
+
+    def _columns(self, t):
+        info = self._traces[t]
+        n = info["states"]
+        return [struct.unpack_from(f"<{n}Q", self._mm, c) for c in info["columns"]]
+
+    def _decode(self, pos):
+        """The value encoded at pos, and the position after it."""
+        mm = self._mm
+        tag = mm[pos]
+        pos += 1
+        if tag == _FALSE:
+            return False, pos
+        if tag == _TRUE:
+            return True, pos
+        if tag in (_INT, _STR, _MODELVALUE):
+            n, pos = _read_varint(mm, pos)
+            if tag == _INT:
+                return (n >> 1) ^ -(n & 1), pos
+            if tag == _STR:
+                return self._strings[n], pos
+            return ITFModelValue(self._strings[n]), pos
+        size, pos = _read_varint(mm, pos)
+        if tag == _LIST or tag == _SET:
+            elements = []
+            for _ in range(size):
+                e, pos = self._decode(pos)
+                elements.append(e)
+            return (ITFList if tag == _LIST else ITFSet)(elements), pos
+        if tag == _MAP:
+            pairs = []
+            for _ in range(size):
+                k, pos = self._decode(pos)
+                v, pos = self._decode(pos)
+                pairs.append((k, v))
+            return ITFMap(pairs), pos
+        if tag == _RECORD:
+            fields = {}
+            for _ in range(size):
+                k, pos = _read_varint(mm, pos)
+                v, pos = self._decode(pos)
+                fields[self._strings[k]] = v
+            return ITFRecord(fields), pos
+        raise ValueError(f"Corrupt trace store: unknown tag {tag} at {pos - 1}")
+
+    def close(self):
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _read_varint(mm, pos):
+    n = 0
+    shift = 0
+    while True:
+        byte = mm[pos]
+        pos += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
@@ -0,0 +1,90 @@
+"""Explicit-stack traversal engine for visitors over trees."""
+import types
+
+
+class Visit:
+    """Yielded by a visit_* generator to visit node with other arguments."""
+
+    __slots__ = ("node", "arg", "kw")
+
+    def __init__(self, node, *arg, **kw):
+        self.node = node
+        self.arg = arg
+        self.kw = kw
+
+
+class IterativeVisitor:
+    """
+    Base of visitors calling visit_<ClassName> for each node of class ClassName.
+
+    A visit_* method either returns its result, or is a generator which yields
+    each child it needs visited, with the same arguments, or a Visit(child, ...)
+    to pass other arguments, is sent back the result of visiting it, and
+    returns its own result. The generators are driven from an explicit stack,
+    so deep trees don't hit Python's recursion limit. Exceptions propagate
+    through the generators as they would through recursive calls.
+
+    The method for each class of node is looked up once per visitor class.
+    """
+
+    def visit(self, node, *arg, **kw):
+        table = self._visit_table()
+        method = table.get(type(node)) or self._method(node)
+        result = method(self, node, *arg, **kw)
+        if type(result) is not types.GeneratorType:
+            return result
+
+        stack = [(result, arg, kw)]
+        value = None
+        error = None
+        while True:
+            generator, arg, kw = stack[-1]
+            try:
+                if error is None:
+                    request = generator.send(value)
+                else:
+                    request, error = generator.throw(error), None
+            except StopIteration as stop:
+                stack.pop()
+                if not stack:
+                    return stop.value
+                value = stop.value
+                continue
+            except BaseException as e:
+                stack.pop()
+                if not stack:
+                    raise
+                error = e
+                continue
+
+            try:
+                if type(request) is Visit:
+                    arg, kw = request.arg, request.kw
+                    request = request.node
+                method = table.get(type(request)) or self._method(request)
+                value = method(self, request, *arg, **kw)
+            except BaseException as e:
+                error = e
+                continue
+            if type(value) is types.GeneratorType:
+                stack.append((value, arg, kw))
+                value = None
+
+    @classmethod
+    def _visit_table(cls):
+        """The methods of this class by class of node, filled as needed."""
+        table = cls.__dict__.get("_visit_methods")
+        if table is None:
+            table = {}
+            cls._visit_methods = table
+        return table
+
+    def _method(self, node):
+        cls = type(self)
+        method = cls._visit_table()[type(node)] = cls._lookup(type(node))
+        return method
+
+    @classmethod
+    def _lookup(cls, node_cls):
+        """The function visiting nodes of class node_cls."""
+        return getattr(cls, f"visit_{node_cls.__name__}")
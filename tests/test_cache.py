@@ -0,0 +1,179 @@
+import os
+import time
+import unittest.mock
+
+from modelator_py.apalache.args import ApalacheArgs
+from modelator_py.cache import ResultCache, tool_ran
+from modelator_py.tlc.args import TlcArgs
+from modelator_py.tlc.pure import tlc_pure
+
+
+def _jar(tmp_path, content=b"not really a jar"):
+    jar = tmp_path / "tla2tools.jar"
+    jar.write_bytes(content)
+    return str(jar)
+
+
+def test_key_depends_on_jar_args_and_files(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    jar = _jar(tmp_path)
+    files = {"A.tla": "---- MODULE A ----\n====", "A.cfg": "INIT Init"}
+    key = cache.key("tlc", jar, TlcArgs(file="A.tla", workers=4), files)
+
+    # Values are compared as they are passed on the command line
+    assert key == cache.key("tlc", jar, TlcArgs(file="A.tla", workers="4"), files)
+    assert key == cache.key(
+        "tlc", jar, TlcArgs(file="A.tla", workers=4), dict(reversed(files.items()))
+    )
+
+    assert key != cache.key("tlc", jar, TlcArgs(file="A.tla", workers=2), files)
+    assert key != cache.key(
+        "tlc", jar, TlcArgs(file="A.tla", workers=4), {**files, "A.cfg": "INIT I"}
+    )
+    assert key != cache.key("apalache", jar, ApalacheArgs(file="A.tla"), files)
+    assert key != cache.key(
+        "tlc", jar, TlcArgs(file="A.tla", workers=4), files, max_heap="1g"
+    )
+    os.utime(jar, ns=(0, 0))
+    _jar(tmp_path, b"another jar")
+    assert key != cache.key("tlc", jar, TlcArgs(file="A.tla", workers=4), files)
+
+
+def test_get_put_refresh_and_clear(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    assert cache.get("ab12") is None
+    cache.put("ab12", {"return_code": 0})
+    assert cache.get("ab12") == {"return_code": 0}
+    assert ResultCache(str(tmp_path), refresh=True).get("ab12") is None
+    assert cache.stats()["entries"] == 1
+    cache.clear()
+    assert cache.get("ab12") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_eviction_by_age_and_size(tmp_path):
+    cache = ResultCache(str(tmp_path), max_age=60, max_size=None)
+    cache.put("aa", {"stdout": "old"})
+    long_ago = time.time() - 120
+    os.utime(cache._path("aa"), (long_ago, long_ago))
+    assert cache.get("aa") is None
+    cache.put("bb", {"stdout": "new"})
+    cache.evict()
+    assert cache.stats()["entries"] == 1
+
+    cache = ResultCache(str(tmp_path / "sized"), max_size=None, max_age=None)
+    for i, key in enumerate(["k1", "k2", "k3"]):
+        cache.put(key, {"stdout": "x" * 100})
+        os.utime(cache._path(key), (i, i))
+    cache = ResultCache(str(tmp_path / "sized"), max_size=250, max_age=None)
+    cache.evict()
+    assert cache.get("k1") is None
+    assert cache.get("k2") is not None
+    assert cache.get("k3") is not None
+
+
+def test_put_only_scans_when_eviction_is_due(tmp_path):
+    cache = ResultCache(str(tmp_path), max_size=1000, max_age=None)
+    with unittest.mock.patch.object(
+        ResultCache, "_entries", wraps=cache._entries
+    ) as entries:
+        for i in range(5):
+            cache.put(f"k{i}", {"stdout": "x" * 100})
+        # The first store scans, then the size is tracked as entries are added
+        assert entries.call_count == 1
+        for i in range(5, 10):
+            cache.put(f"k{i}", {"stdout": "x" * 100})
+        # Going over max_size evicts down to EVICT_TO of it, with room to spare
+        assert entries.call_count == 2
+    assert cache.stats()["size"] <= 1000
+
+
+def test_pure_replays_cached_result_without_java(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    data = {
+        "jar": _jar(tmp_path),
+        "args": {"file": "A.tla"},
+        "files": {"A.tla": "---- MODULE A ----\n===="},
+    }
+    expected = {
+        "files": {},
+        "shell_cmd": "java ...",
+        "return_code": 0,
+        "stdout": "Finished in 00s at (2022-01-01 00:00:00)\n",
+        "stderr": "",
+    }
+    # tlc_pure always runs TLC with -cleanup
+    key = cache.key(
+        "tlc", data["jar"], TlcArgs(file="A.tla", cleanup=True), data["files"]
+    )
+    cache.put(key, expected)
+
+    assert tlc_pure(json=data, cache=cache) == expected
+
+
+def test_pure_expands_user_in_cached_jar(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    cache = ResultCache(str(tmp_path / "cache"))
+    jar = _jar(tmp_path)
+    files = {"A.tla": "---- MODULE A ----\n===="}
+    expected = {"files": {}, "return_code": 0, "stdout": "", "stderr": ""}
+    key = cache.key("tlc", jar, TlcArgs(file="A.tla", cleanup=True), files)
+    cache.put(key, expected)
+
+    data = {"jar": "~/tla2tools.jar", "args": {"file": "A.tla"}, "files": files}
+    assert tlc_pure(json=data, cache=cache) == expected
+
+
+def test_failed_launches_are_not_cached(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    data = {
+        "jar": _jar(tmp_path),
+        "args": {"file": "A.tla"},
+        "files": {"A.tla": "---- MODULE A ----\n===="},
+    }
+    not_found = {"return_code": 127, "stdout": "", "stderr": "sh: java: not found"}
+    with unittest.mock.patch("modelator_py.tlc.pure.tlc_raw") as tlc_raw:
+        tlc_raw.return_value.returncode = 127
+        tlc_raw.return_value.stdout = b""
+        tlc_raw.return_value.stderr = b"sh: java: not found"
+        tlc_raw.return_value.args = "java ..."
+        for _ in range(2):
+            assert tlc_pure(json=data, cache=cache)["return_code"] == 127
+        assert tlc_raw.call_count == 2
+    assert cache.stats()["entries"] == 0
+
+    assert not tool_ran(not_found)
+    assert not tool_ran({"return_code": -9, "stdout": "", "stderr": ""})
+    assert not tool_ran(
+        {
+            "return_code": 1,
+            "stdout": "",
+            "stderr": "Invalid maximum heap size: -Xmx1z\n"
+            "Error: Could not create the Java Virtual Machine.\n",
+        }
+    )
+    assert tool_ran({"return_code": 12, "stdout": "Error: ...", "stderr": ""})
+
+
+def test_changing_max_heap_misses_the_cache(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    data = {
+        "jar": _jar(tmp_path),
+        "args": {"file": "A.tla"},
+        "files": {"A.tla": "---- MODULE A ----\n===="},
+        "max_heap": "1g",
+    }
+    expected = {"files": {}, "return_code": 0, "stdout": "", "stderr": ""}
+    args = TlcArgs(file="A.tla", cleanup=True)
+    key = cache.key("tlc", data["jar"], args, data["files"], "1g")
+    cache.put(key, expected)
+    assert tlc_pure(json=data, cache=cache) == expected
+
+    with unittest.mock.patch("modelator_py.tlc.pure.tlc_raw") as tlc_raw:
+        tlc_raw.return_value.returncode = 0
+        tlc_raw.return_value.stdout = b"ran"
+        tlc_raw.return_value.stderr = b""
+        tlc_raw.return_value.args = "java -Xmx8g ..."
+        result = tlc_pure(json={**data, "max_heap": "8g"}, cache=cache)
+        assert result["stdout"] == "ran"
+        assert tlc_raw.call_count == 1
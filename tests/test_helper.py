@@ -0,0 +1,159 @@
+import asyncio
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from modelator_py import helper
+from modelator_py.helper import (
+    LRUCache,
+    parallel_map,
+    parse_memory,
+    run_batch,
+    run_process_async,
+    temporary_directory_async,
+    write_json,
+)
+
+
+def test_parse_memory():
+    assert parse_memory(100) == 100
+    assert parse_memory("100") == 100
+    assert parse_memory("512k") == 512 * 1024
+    assert parse_memory("2G") == 2 * 1024**3
+
+
+def test_parallel_map_keeps_order():
+    data = list(range(10))
+    for backend in ["serial", "thread", "process"]:
+        assert parallel_map(abs, [-e for e in data], backend=backend) == data
+
+
+def test_run_batch_respects_limits():
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def work(job):
+        with lock:
+            running.append(job)
+            peak.append(sum(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(job)
+        if job == 3:
+            raise RuntimeError("job failed")
+        return job
+
+    jobs = [1, 2, 3, 1, 2, 3]
+    results = dict(
+        run_batch(work, jobs, resources=lambda j: (j, 0), max_jobs=3, max_cores=4)
+    )
+
+    assert max(peak) <= 4
+    assert sorted(results) == list(range(len(jobs)))
+    assert results[2] == {"error": "RuntimeError: job failed"}
+    assert [results[i] for i in [0, 1, 3, 4]] == [1, 2, 1, 2]
+
+
+def test_run_batch_runs_oversized_job_alone():
+    results = list(
+        run_batch(lambda j: j, ["a"], resources=lambda j: (1, 100), max_memory=10)
+    )
+    assert results == [(0, "a")]
+
+
+def test_run_process_async_reads_lines_incrementally():
+    lines = []
+    script = "import time; print('a', flush=True); time.sleep(0.2); print('b')"
+    cmd_str = f'{sys.executable} -c "{script}"'
+
+    async def run():
+        task = asyncio.ensure_future(run_process_async(cmd_str, on_stdout=lines.append))
+        await asyncio.sleep(0.1)
+        # The first line is seen before the process has finished
+        assert lines == [b"a\n"] and not task.done()
+        return await task
+
+    result = asyncio.run(run())
+    assert result.returncode == 0
+    assert result.stdout == b"a\nb\n"
+    assert lines == [b"a\n", b"b\n"]
+
+
+def test_run_process_async_timeout_kills_process():
+    cmd_str = f'{sys.executable} -c "import time; time.sleep(10)"'
+    start = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(run_process_async(cmd_str, timeout=0.2))
+    assert time.monotonic() - start < 5
+
+
+def test_temporary_directory_async():
+    async def run():
+        async with temporary_directory_async(prefix="modelator-py-test-") as dirname:
+            assert os.path.isdir(dirname)
+        return dirname
+
+    assert not os.path.exists(asyncio.run(run()))
+
+
+def test_lru_cache_map_computes_each_key_once():
+    calls = []
+
+    def square(x):
+        calls.append(x)
+        return x * x
+
+    cache = LRUCache(maxsize=2)
+    assert cache.map(square, [1, 2, 1, 3]) == [1, 4, 1, 9]
+    assert calls == [1, 2, 3]
+    assert cache.stats() == {"hits": 1, "misses": 3, "size": 2, "maxsize": 2}
+
+    # 1 was the least recently used key, so it was dropped
+    assert cache.map(square, [3, 1], mapper=parallel_map) == [9, 1]
+    assert calls == [1, 2, 3, 1]
+    assert (cache.hits, cache.misses) == (2, 4)
+
+
+def test_write_json_formats():
+    obj = {"b": [1, {"#set": []}], "a": "é"}
+
+    out = io.StringIO()
+    write_json(obj, out=out)
+    assert out.getvalue() == json.dumps(obj, indent=4, sort_keys=True) + "\n"
+
+    for output_format in ["compact", "ndjson"]:
+        out = io.StringIO()
+        write_json(obj, output_format=output_format, out=out)
+        write_json(obj, output_format=output_format, out=out)
+        lines = out.getvalue().splitlines()
+        assert [json.loads(line) for line in lines] == [obj, obj]
+        assert lines[0].startswith('{"a":')
+
+    # Compact output goes to the binary buffer of text streams that have one
+    buffer = io.BytesIO()
+    out = io.TextIOWrapper(buffer, encoding="utf-8")
+    write_json(obj, output_format="compact", out=out)
+    assert json.loads(buffer.getvalue()) == obj
+
+    with pytest.raises(ValueError):
+        write_json(obj, output_format="yaml")
+
+
+def test_write_json_compact_without_orjson(monkeypatch):
+    obj = {"s": "é", "f": 1e20, "n": float("nan"), "l": [float("-inf"), 1.5]}
+    outputs = []
+    for orjson in [helper.orjson, None]:
+        monkeypatch.setattr(helper, "orjson", orjson)
+        out = io.StringIO()
+        write_json(obj, output_format="compact", out=out)
+        outputs.append(out.getvalue())
+
+    for output in outputs:
+        assert '"s":"é"' in output and '"n":null' in output
+        assert json.loads(output) == {"s": "é", "f": 1e20, "n": None, "l": [None, 1.5]}
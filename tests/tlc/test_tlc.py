@@ -1,6 +1,7 @@
 import json
 import logging
 import os
+import shutil
 import unittest.mock
 from contextlib import redirect_stdout
 from io import StringIO
@@ -8,7 +9,9 @@ from io import StringIO
 import pytest
 
 from modelator_py.tlc.cli import Tlc
+from modelator_py.tlc.pure import tlc_pure_batch, tlc_pure_itf
 from modelator_py.tlc.raw import RawCmd, TlcArgs, stringify_raw_cmd
+from modelator_py.tlc.worker import TlcWorkerPool, _resolve_paths
 
 from ..helper import get_resource_dir, get_tlc_path
 
@@ -72,6 +75,131 @@ def test_pure_with_json():
     assert "Finished in" in json_obj["stdout"]
 
 
+def test_pure_batch_isolates_failures():
+    good = {
+        "jar": get_tlc_path(),
+        "args": {"file": "Missing.tla"},
+        "files": {},
+        "max_heap": "64m",
+    }
+    relative_jar = {**good, "jar": "tlc.jar"}
+    jobs = [relative_jar, "not json", json.dumps(good)]
+
+    results = dict(tlc_pure_batch(jsons=jobs, max_jobs=2, max_memory="1g"))
+
+    assert sorted(results) == [0, 1, 2]
+    assert "must be absolute" in results[0]["error"]
+    assert "JSONDecodeError" in results[1]["error"]
+    assert "-Xmx64m" in results[2]["shell_cmd"]
+
+
+def test_cli_batch_indexes_count_blank_lines():
+    relative_jar = {"jar": "tlc.jar", "args": {"file": "A.tla"}, "files": {}}
+    stdin = StringIO(f"\n{json.dumps(relative_jar)}\n  \nnot json\n")
+
+    s = StringIO()
+    with redirect_stdout(s):
+        Tlc(stdin).batch(max_jobs=1)
+    results = {r["index"]: r for r in map(json.loads, s.getvalue().splitlines())}
+
+    assert sorted(results) == [1, 3]
+    assert "must be absolute" in results[1]["error"]
+    assert "JSONDecodeError" in results[3]["error"]
+
+
+@pytest.mark.skipif(shutil.which("java") is None, reason="Requires java")
+def test_worker_pool_pure():
+    files = {}
+    for fn in ["HelloWorld.cfg", "HelloWorld.tla"]:
+        with open(os.path.join(get_resource_dir(), fn), "r") as fd:
+            files[fn] = fd.read()
+
+    data = {
+        "jar": get_tlc_path(),
+        "args": {
+            "workers": "auto",
+            "config": "HelloWorld.cfg",
+            "file": "HelloWorld.tla",
+        },
+        "files": files,
+    }
+
+    with TlcWorkerPool(1) as pool:
+        # The second job runs in the JVM left running by the first one
+        results = [pool.tlc_pure(json=data) for _ in range(2)]
+
+    for result in results:
+        assert "Finished in" in result["stdout"]
+
+
+def test_worker_pool_resolves_paths_against_cwd():
+    args = TlcArgs(file="A.tla", dump="dot,colorize states.dot", recover="/ck")
+    args = _resolve_paths(RawCmd(args=args, cwd="/job"))
+    assert args.file == "/job/A.tla"
+    assert args.dump == "dot,colorize /job/states.dot"
+    assert args.recover == "/ck"
+    assert args.config is None
+
+
+def test_worker_pool_keeps_slot_when_jvm_fails_to_start(tmp_path):
+    class Jvm:
+        started = 0
+        fail = False
+
+        def __init__(self, java_temp_dir):
+            if Jvm.fail:
+                raise OSError("java not found")
+            Jvm.started += 1
+            self.jobs = 0
+
+        def alive(self):
+            return True
+
+        def run(self, *args):
+            self.jobs += 1
+            return 0
+
+        def close(self):
+            pass
+
+    jar = tmp_path / "tla2tools.jar"
+    jar.write_bytes(b"")
+    data = {"jar": str(jar), "cwd": str(tmp_path), "args": {"file": "A.tla"}}
+    with unittest.mock.patch("modelator_py.tlc.worker._Jvm", Jvm):
+        with TlcWorkerPool(1, max_jobs=1) as pool:
+            assert pool.tlc_raw(json=data).returncode == 0
+            # The used up JVM is stopped, and its replacement fails to start
+            Jvm.fail = True
+            with pytest.raises(OSError):
+                pool.tlc_raw(json=data)
+            Jvm.fail = False
+            assert pool.tlc_raw(json=data).returncode == 0
+            assert Jvm.started == 2
+            assert len(pool._jvms) == 1
+
+
+@pytest.mark.skipif(shutil.which("java") is None, reason="Requires java")
+def test_pure_itf_stops_after_max_traces():
+    files = {}
+    for fn in ["TlcMultipleTraceParse.cfg", "TlcMultipleTraceParse.tla"]:
+        with open(os.path.join(get_resource_dir(), fn), "r") as fd:
+            files[fn] = fd.read()
+
+    data = {
+        "jar": get_tlc_path(),
+        "args": {
+            "cont": True,
+            "config": "TlcMultipleTraceParse.cfg",
+            "file": "TlcMultipleTraceParse.tla",
+        },
+        "files": files,
+    }
+
+    traces = list(tlc_pure_itf(json=data, max_traces=1))
+    assert len(traces) == 1
+    assert traces[0]["states"]
+
+
 @pytest.mark.skip(
     reason="The 'tlc raw' command has side effects. E.g. polluting the filesystem"
 )
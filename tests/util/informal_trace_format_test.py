@@ -0,0 +1,103 @@
+import pickle
+
+import pytest
+
+from modelator_py.util.informal_trace_format import (
+    ITFList,
+    ITFMap,
+    ITFModelValue,
+    ITFNode,
+    ITFRecord,
+    ITFSet,
+    ITFState,
+    ITFTrace,
+    JsonFormatter,
+    JsonSerializer,
+    identical,
+    share_unchanged_values,
+    with_lists,
+    with_records,
+)
+
+
+def test_compact_values():
+    assert ITFModelValue("a") is ITFModelValue("a")
+    assert pickle.loads(pickle.dumps(ITFModelValue("a"))) is ITFModelValue("a")
+    assert ITFMap([[1, "x"]]).elements == [(1, "x")]
+    assert not hasattr(ITFMap([]), "__dict__")
+    assert not hasattr(ITFState({}), "__dict__")
+
+    trace = ITFTrace(["x"], [ITFState({"x": ITFMap([(1, ITFModelValue("a"))])})])
+    assert pickle.loads(pickle.dumps(trace)) == trace
+
+
+def test_unchanged_values_are_shared():
+    states = [
+        ITFState({"x": ITFMap([(1, 2)]), "y": ITFList([True])}),
+        ITFState({"x": ITFMap([(1, 2)]), "y": ITFList([1])}),
+        ITFState({"x": ITFMap([(1, 3)]), "y": ITFList([1])}),
+    ]
+    share_unchanged_values(states)
+    x = [s.var_value_map["x"] for s in states]
+    y = [s.var_value_map["y"] for s in states]
+    assert x[0] is x[1] and x[1] is not x[2]
+    # TRUE and 1 compare equal in Python, but are different TLA+ values
+    assert y[0] is not y[1] and y[1] is y[2]
+    assert not identical(True, 1)
+
+    # Visitors keep the values shared
+    trace = with_lists(ITFTrace(["x", "y"], states))
+    assert trace.states[0].var_value_map["x"] is trace.states[1].var_value_map["x"]
+    json = JsonSerializer().visit(trace)
+    assert json["states"][0]["x"] is json["states"][1]["x"]
+    assert json["states"][1]["y"] == [1]
+
+
+def test_values_are_hashable_and_compare_unordered():
+    a, b = ITFModelValue("a"), ITFModelValue("b")
+    assert ITFSet([1, a, "x"]) == ITFSet(["x", 1, a])
+    assert hash(ITFSet([1, a, "x"])) == hash(ITFSet(["x", 1, a]))
+    assert ITFMap([(1, a), (2, b)]) == ITFMap([(2, b), (1, a)])
+    assert ITFRecord({"f": 1, "g": 2}) == ITFRecord({"g": 2, "f": 1})
+    assert ITFList([1, 2]) != ITFList([2, 1])
+    assert ITFSet([True]) != ITFSet([1])
+    assert ITFMap([(1, 2)]) != ITFRecord({"1": 2})
+
+    states = [
+        ITFState({"x": ITFSet([1, 2]), "y": a}),
+        ITFState({"y": a, "x": ITFSet([2, 1])}),
+        ITFState({"x": ITFSet([1]), "y": a}),
+    ]
+    assert len(set(states)) == 2
+
+    # The cached hash is not pickled, as it differs between processes
+    hash(states[0])
+    assert "_hash" not in states[0].__getstate__()
+
+
+def test_json_formatter_matches_separate_passes():
+    value = ITFMap(
+        [
+            (1, ITFMap([("f", ITFMap([(1, 2), (2, 3)])), ("g", ITFMap([]))])),
+            (2, ITFSet([ITFMap([(1, "a"), ("b", 2)]), ITFMap([(2, 1)])])),
+        ]
+    )
+    trace = ITFTrace(["x"], [ITFState({"x": value})])
+    for lists in [False, True]:
+        for records in [False, True]:
+            expected = trace
+            if lists:
+                expected = with_lists(expected)
+            if records:
+                expected = with_records(expected)
+            expected = JsonSerializer().visit(expected)
+            formatter = JsonFormatter(lists=lists, records=records)
+            assert formatter.visit(trace) == expected
+
+
+def test_nodes_must_define_key():
+    class ITFNoKey(ITFNode):
+        __slots__ = ()
+
+    with pytest.raises(TypeError):
+        ITFNoKey()
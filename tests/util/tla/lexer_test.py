@@ -1,6 +1,7 @@
 """Tests of module `tla.lex`."""
 import pprint
 
+import modelator_py.util.tla._location as _location
 import modelator_py.util.tla.lex as lex
 
 MODULE_FOO = r"""
@@ -67,5 +68,53 @@ def test_lexer():
         print(token.loc)
 
 
+def test_reused_lexer():
+    """Test that the reused lexer is reset between inputs."""
+    lexer = lex.get_lexer()
+    assert lexer is lex.get_lexer()
+    # stop inside a multi-line comment
+    lex._lex("x = 1 (* unterminated")
+    values = [token.value for token in lex._lex('x = "a"')]
+    assert values == ["x", "=", '"a"'], values
+
+
+def test_token_locations(monkeypatch):
+    """Test that token locations are those of the tokens in the input."""
+    data = lex._omit_preamble(MODULE_FOO)
+    lextokens = lex._lex(data)
+    tokens = lex.tokenize(MODULE_FOO)
+    assert len(tokens) == len(lextokens)
+    for token, lextoken in zip(tokens, lextokens):
+        bol = lex.find_beginning_of_line(data, lextoken)
+        loc = token.loc
+        assert loc.file == "Foo"
+        assert loc.start.line == loc.stop.line == lextoken.lineno
+        assert loc.start.bol == bol
+        assert loc.start.column == lex.find_column(data, lextoken)
+        assert loc.stop.column - loc.start.column == len(lextoken.value)
+        assert not hasattr(token, "__dict__")
+    # the checks of each location pass
+    monkeypatch.setattr(lex, "DEBUG", True)
+    assert lex.tokenize(MODULE_FOO) == tokens
+
+
+def test_locus_points():
+    """Test that points of locations are built from their integers."""
+    start = _location.Pt(line=2, bol=10, col=3)
+    stop = _location.Pt(line=3, bol=20, col=1)
+    loc = _location.Locus(start, stop, "Foo")
+    assert (loc.start, loc.stop) == (start, stop)
+    assert loc.start is not loc.start
+    assert loc == _location.locus_of_position("Foo", 2, 10, 12).merge(
+        _location.locus_of_position("Foo", 3, 20, 20)
+    )
+    right = loc.right_of()
+    assert right.start == right.stop == stop
+    assert right.is_empty() and not loc.is_empty()
+    assert loc.left_of().stop == start
+    assert _location.unknown.start is None
+    assert _location.unknown == _location.Locus(None, None, "<unknown>")
+
+
 if __name__ == "__main__":
     test_lexer()
@@ -1,4 +1,5 @@
 """Tests for the package `tla`."""
+import concurrent.futures
 
 import modelator_py.util.tla._combinators as pco
 import modelator_py.util.tla._expr_parser as ep
@@ -470,5 +471,97 @@ def _parser_parse_expr_to_str(text):
     return r
 
 
+def test_parser_parse_expr_concurrent_nodes():
+    """Test `tla.parser.parse_expr` in threads with different nodes."""
+    text = r"x = 1 /\ y = x @@ z"
+
+    def parse(nodes):
+        r = parser.parse_expr(text, nodes=nodes)
+        return nodes, r
+
+    families = [to_str.Nodes, None] * 8
+    with concurrent.futures.ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(parse, families))
+    for nodes, r in results:
+        has_to_str = hasattr(r, "to_str")
+        assert has_to_str == (nodes is to_str.Nodes), (nodes, r)
+        assert hasattr(r.operands[1].operands[1], "to_str") == has_to_str
+
+
+def test_repetition_combinators():
+    """Test `star`, `sep1` and `sep` results and locations."""
+    tokens = lex.tokenize("1, 2, 3 4", omit_preamble=False)
+    nat = _tla_combinators.nat()
+    comma = _tla_combinators.punct(",")
+    for ap, expected, remaining in [
+        (pco.star(nat), [1], 5),
+        (pco.sep1(comma, nat), [1, 2, 3], 1),
+        (pco.sep(comma, nat), [1, 2, 3], 1),
+        (pco.sep(comma, comma), [], 6),
+    ]:
+        source = pco.ListSlice(tokens, start=0)
+        pst = pco.Pstate(source, tokens[0].loc, _tla_combinators.init)
+        rep = pco.exec_(ap, pst)
+        assert rep.res.value == expected
+        assert len(pst.source) == remaining
+        if expected:
+            assert rep.loc.start == tokens[0].loc.start
+            assert rep.loc.stop == tokens[len(tokens) - remaining - 1].loc.stop
+
+
+def test_parser_parse_expr_checks_backtracking(monkeypatch):
+    """Test parsing with the checks of restored states enabled."""
+    monkeypatch.setattr(pco, "DEBUG", True)
+    for expr in expr_tests:
+        r = parser.parse_expr(expr)
+        assert r is not None
+
+
+def test_parser_parse_expr_packrat():
+    """Test that packrat parsing returns the same syntax trees."""
+    packrat = parser.Packrat(maxsize=100)
+    hits = 0
+    for expr in expr_tests:
+        r = parser.parse_expr(expr, nodes=to_str.Nodes)
+        r_ = parser.parse_expr(expr, nodes=to_str.Nodes, packrat=packrat)
+        assert r_.to_str(width=80) == r.to_str(width=80)
+        stats = packrat.stats()
+        assert stats["size"] <= 100
+        assert stats["misses"] > 0
+        hits += stats["hits"]
+    assert hits > 0
+    for module in module_tests:
+        r = parser.parse(module, nodes=to_str.Nodes)
+        r_ = parser.parse(module, nodes=to_str.Nodes, packrat=packrat)
+        assert r_.to_str() == r.to_str()
+
+
+def test_expr_resolve_iter_agrees_with_resolve(monkeypatch):
+    """Test that expressions parse the same without the operator fast path."""
+    exprs = expr_tests + [
+        " a - -b ",
+        " - a - b ",
+        " x.f.g[1][2]' ",
+        " 1 + 2 * 3 - 4 ^ 2 ^ 3 % 5 ",
+        " a \\X b \\X c ",
+        " +(1, 2) * -(3) ",
+        " 1 + ",
+        " 1 + * 2 ",
+        " 1 = 2 = 3 ",
+    ]
+    fast = [_parse_expr_to_str(expr) for expr in exprs]
+    modules = [parser.parse(module, nodes=to_str.Nodes) for module in module_tests]
+    monkeypatch.setattr(pco, "resolve_iter", pco.resolve)
+    monkeypatch.setattr(ep, "expr_items", ep.expr_or_op)
+    assert [_parse_expr_to_str(expr) for expr in exprs] == fast
+    for module, r in zip(module_tests, modules):
+        assert parser.parse(module, nodes=to_str.Nodes).to_str() == r.to_str()
+
+
+def _parse_expr_to_str(expr):
+    r = parser.parse_expr(expr, nodes=to_str.Nodes)
+    return None if r is None else r.to_str(width=80)
+
+
 if __name__ == "__main__":
     test_expr_parser()
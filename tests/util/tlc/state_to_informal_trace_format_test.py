@@ -1,7 +1,14 @@
+import json
 import os
 
+import pytest
+
+from modelator_py.util.informal_trace_format import ITFState, JsonSerializer
 from modelator_py.util.tla import parser, to_str
 from modelator_py.util.tlc.state_to_informal_trace_format import (
+    TlcStateParser,
+    UnsupportedStateExpression,
+    _state_to_informal_trace_format_state_by_tla_parser,
     state_to_informal_trace_format_state,
 )
 
@@ -72,3 +79,44 @@ def test_tla_state_expression_to_informal_trace_format_state():
     for s in expressions:
         res = state_to_informal_trace_format_state(s)
         assert res is not None
+
+
+def test_tlc_state_parser_agrees_with_tla_parser():
+    """
+    The dedicated parser for TLC values must produce the same ITF state as
+    the general TLA+ parser.
+    """
+
+    fns = [f"TlcStateExpressionExample{i}.txt" for i in range(9)]
+
+    expressions = []
+
+    for fn in fns:
+        path = os.path.join(get_resource_dir(), fn)
+        with open(path, "r") as fd:
+            expressions.append(fd.read())
+
+    expressions += [
+        "x = {}",
+        "x = <<>>",
+        '/\\ x = -3\n/\\ y = (1 :> -2 @@ 2 :> "a")',
+        "x = [a |-> <<1, b>>, c |-> {TRUE, FALSE}]",
+        'x = "a\\"b"',
+        "x = 1 :> 2 @@ <<3>> :> (4)",
+    ]
+
+    for s in expressions:
+        pairs = TlcStateParser(s).parse_state()
+        fast = JsonSerializer().visit(ITFState(dict(pairs)))
+        slow = JsonSerializer().visit(
+            _state_to_informal_trace_format_state_by_tla_parser(s)
+        )
+        assert json.dumps(fast) == json.dumps(slow), s
+
+
+def test_state_outside_tlc_values_falls_back_to_tla_parser():
+    for s in ["x = 1.5", "/\\ x = {1} \\* comment", "x = <<1>>_y"]:
+        with pytest.raises(UnsupportedStateExpression):
+            TlcStateParser(s).parse_state()
+    res = state_to_informal_trace_format_state("x = 1.5")
+    assert res == _state_to_informal_trace_format_state_by_tla_parser("x = 1.5")
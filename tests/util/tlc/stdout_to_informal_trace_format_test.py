@@ -1,7 +1,12 @@
+import json
 import os
+from contextlib import redirect_stdout
+from io import StringIO
 
+from modelator_py.helper import LRUCache
 from modelator_py.util.informal_trace_format import with_lists, with_records
-from modelator_py.util.tlc.itf import TlcITFCmd, tlc_itf
+from modelator_py.util.tlc.cli import Tlc
+from modelator_py.util.tlc.itf import TlcITFCmd, tlc_itf, tlc_itf_stream
 from modelator_py.util.tlc.stdout_to_informal_trace_format import (
     extract_traces,
     tlc_trace_to_informal_trace_format_trace, extract_traces_from_file,
@@ -63,14 +68,15 @@ def test_extract_trace_initState_from_tlc_file():
     assert len(tlc_traces) == 1
 
 def test_extract_trace_initStateContinue_from_tlc():
+    # The output is cut off inside a third trace, which is incomplete
     fn = "TlcTraceParseInitStateContinue.txt"
     tlc_traces, loop_infos = _extract_trace_from_tlc(fn)
-    assert len(tlc_traces) == 3
+    assert [len(t) for t in tlc_traces] == [1, 2]
 
 def test_extract_trace_initStateContinue_from_tlc_file():
     fn = "TlcTraceParseInitStateContinue.txt"
     tlc_traces = _extract_trace_from_tlc_file(fn)
-    assert len(tlc_traces) == 3
+    assert [len(t) for t, _ in tlc_traces] == [1, 2]
 
 def test_extract_trace_from_tlc_simulation_mode():
     fn = "TlcTraceParseSimulationMode.txt"
@@ -224,3 +230,142 @@ def test_extract_informal_trace_format_traces_from_tlc_real_world_example():
     cmd.lists = True
     cmd.records = True
     tlc_itf(cmd=cmd)
+
+
+def test_trace_lines_from_file_match_extract_traces():
+    fns = [
+        "TlcTraceAbsenceParse.txt",
+        "TlcTraceParse.txt",
+        "TlcLassoTraceParse.txt",
+        "TlcTraceParseInitStateContinue.txt",
+        "TlcMultipleTraceParse.txt",
+        "TlcMultipleTraceParseCutoff1.txt",
+        "TlcTraceParseSimulationMode.txt",
+        "TlcMultipleTraceParseSimulationMode.txt",
+    ]
+    for fn in fns:
+        tlc_traces, loop_infos = _extract_trace_from_tlc(fn)
+        streamed = _extract_trace_from_tlc_file(fn)
+        assert streamed == list(zip(tlc_traces, loop_infos)), fn
+
+
+def test_tlc_itf_stream_matches_tlc_itf():
+    fns = ["TlcMultipleTraceParse.txt", "TlcMultipleTraceParseSimulationMode.txt"]
+    for fn in fns:
+        fn = os.path.join(get_resource_dir(), fn)
+        with open(fn, "r") as fd:
+            content = fd.read()
+        with open(fn, "r") as fd:
+            streamed = list(tlc_itf_stream(fd))
+
+        cmd = TlcITFCmd(stdout=content, lists=True, records=True)
+        assert streamed == tlc_itf(cmd=cmd)
+
+
+def test_tlc_cli_itf_stream_prints_ndjson():
+    fn = os.path.join(get_resource_dir(), "TlcMultipleTraceParse.txt")
+    with open(fn, "r") as fd:
+        out = StringIO()
+        with redirect_stdout(out):
+            Tlc(fd).itf(stream=True)
+
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 4
+    assert all("states" in json.loads(line) for line in lines)
+
+
+def test_tlc_itf_backends_agree():
+    fn = os.path.join(get_resource_dir(), "TlcMultipleTraceParse.txt")
+    with open(fn, "r") as fd:
+        content = fd.read()
+
+    results = []
+    for backend in ["serial", "thread", "process", None]:
+        cmd = TlcITFCmd(stdout=content, lists=True, records=True)
+        cmd.backend = backend
+        cmd.workers = 2
+        results.append(tlc_itf(cmd=cmd))
+
+    assert len(results[0]) == 4
+    assert all(r == results[0] for r in results)
+
+
+def test_tlc_itf_single_trace():
+    fn = os.path.join(get_resource_dir(), "TlcTraceParseSimulationMode.txt")
+    with open(fn, "r") as fd:
+        content = fd.read()
+
+    for backend in ["serial", "process"]:
+        cmd = TlcITFCmd(stdout=content, lists=True, records=True, backend=backend)
+        (trace,) = tlc_itf(cmd=cmd)
+        assert trace is not None and trace["states"]
+
+
+def test_tlc_itf_single_trace_states_in_parallel():
+    fn = os.path.join(get_resource_dir(), "TlcTraceParse.txt")
+    with open(fn, "r") as fd:
+        content = fd.read()
+
+    (serial,) = tlc_itf(cmd=TlcITFCmd(stdout=content, backend="serial"))
+    cmd = TlcITFCmd(stdout=content, backend="process", workers=2)
+    (parallel,) = tlc_itf(cmd=cmd)
+    assert 1 < len(serial["states"])
+    assert parallel == serial
+
+
+def test_trace_is_yielded_as_soon_as_it_is_complete():
+    fn = os.path.join(get_resource_dir(), "TlcTraceParse.txt")
+    with open(fn, "r") as fd:
+        lines = fd.read().split("\n")
+    # With -continue, TLC keeps printing progress long before the footer
+    footer = next(i for i, line in enumerate(lines) if "states generated" in line)
+    lines.insert(footer, "Progress(2) at 2022-02-09 08:59:37: 2 states generated")
+
+    consumed = []
+
+    def read():
+        for line in lines:
+            consumed.append(line)
+            yield line
+
+    trace, _ = next(extract_traces_from_file(read()))
+    assert consumed[-1].startswith("Progress")
+    assert len(trace) == 2 and not any("Progress" in state for state in trace)
+
+
+def test_tlc_itf_parses_shared_states_once():
+    fn = os.path.join(get_resource_dir(), "TlcMultipleTraceParse.txt")
+    with open(fn, "r") as fd:
+        content = fd.read()
+    tlc_traces, _ = extract_traces(content)
+    states = [state for trace in tlc_traces for state in trace]
+
+    cache = LRUCache()
+    cmd = TlcITFCmd(stdout=content, lists=True, records=True, backend="serial")
+    assert tlc_itf(cmd=cmd, cache=cache) == tlc_itf(cmd=cmd, cache=LRUCache(0))
+    assert cache.misses == len(set(states))
+    assert cache.hits == len(states) - len(set(states))
+
+    tlc_itf(cmd=cmd, cache=cache)
+    assert cache.misses == len(set(states))
+
+
+def test_tlc_itf_returns_unshared_states():
+    fn = os.path.join(get_resource_dir(), "TlcMultipleTraceParse.txt")
+    with open(fn, "r") as fd:
+        content = fd.read()
+    cmd = TlcITFCmd(stdout=content, lists=True, records=True, backend="serial")
+    expected = tlc_itf(cmd=cmd)
+
+    for cache in [None, LRUCache()]:
+        traces = tlc_itf(cmd=cmd, cache=cache)
+        states = [state for trace in traces for state in trace["states"]]
+        assert len({id(state) for state in states}) == len(states)
+        for state in states:
+            for var in state:
+                state[var] = "CORRUPTED"
+        assert tlc_itf(cmd=cmd, cache=cache) == expected
+
+    lines = iter(content.splitlines(keepends=True))
+    traces = list(tlc_itf_stream(lines, lists=True, records=True))
+    assert traces == expected
@@ -0,0 +1,74 @@
+import json
+import os
+
+import pytest
+
+from modelator_py.util.cli import Itf
+from modelator_py.util.informal_trace_format import (
+    ITFList,
+    ITFMap,
+    ITFModelValue,
+    ITFRecord,
+    ITFSet,
+    ITFState,
+    ITFTrace,
+    identical,
+)
+from modelator_py.util.tlc.itf import TlcITFCmd, tlc_itf
+from modelator_py.util.trace_store import TraceStore, write_trace_store
+
+from ..helper import get_resource_dir
+
+
+def test_round_trip_shares_unchanged_values(tmp_path):
+    x = ITFMap([(1, ITFSet([ITFModelValue("a"), "s"])), (2, -(2**70))])
+    trace = ITFTrace(
+        ["x", "y"],
+        [
+            ITFState({"x": x, "y": ITFList([True, 1])}),
+            ITFState({"x": x, "y": ITFList([1, 1])}),
+            ITFState({"x": ITFRecord({"f": False}), "y": ITFList([1, 1])}),
+        ],
+        meta={"source": "test"},
+    )
+    empty = ITFTrace([], [])
+    path = str(tmp_path / "traces.itfb")
+    write_trace_store(path, [trace, empty])
+
+    with TraceStore(path) as store:
+        assert len(store) == 2
+        assert store.num_states(0) == 3
+        assert store.vars(0) == ["x", "y"]
+        loaded = store[0]
+        assert loaded == trace
+        assert all(identical(a, b) for a, b in zip(loaded.states, trace.states))
+        values = [s.var_value_map for s in loaded.states]
+        assert values[0]["x"] is values[1]["x"]
+        assert values[1]["y"] is values[2]["y"]
+        assert store.state(0, 1) == trace.states[1]
+        assert store[1] == empty
+        with pytest.raises(IndexError):
+            store.state(0, 3)
+
+
+def test_not_a_trace_store(tmp_path):
+    path = tmp_path / "traces.json"
+    path.write_text("{}")
+    with pytest.raises(ValueError):
+        TraceStore(str(path))
+
+
+def test_cli_convert_round_trip(tmp_path):
+    fn = os.path.join(get_resource_dir(), "TlcMultipleTraceParse.txt")
+    with open(fn, "r") as fd:
+        traces = tlc_itf(cmd=TlcITFCmd(stdout=fd.read(), lists=True, records=True))
+    json_path = tmp_path / "traces.json"
+    json_path.write_text("\n".join(json.dumps(t) for t in traces))
+
+    store_path = str(tmp_path / "traces.itfb")
+    Itf().convert(str(json_path), store_path)
+    out_path = str(tmp_path / "out.json")
+    Itf().convert(store_path, out_path)
+
+    with open(out_path, "r") as fd:
+        assert json.load(fd) == {"traces": traces}
@@ -0,0 +1,63 @@
+import sys
+
+import pytest
+
+from modelator_py.util.informal_trace_format import ITFList, JsonSerializer
+from modelator_py.util.visitor import IterativeVisitor, Visit
+
+
+class Depth(IterativeVisitor):
+    def visit_list(self, node, depth=0):
+        deepest = depth
+        for child in node:
+            deepest = max(deepest, (yield Visit(child, depth + 1)))
+        return deepest
+
+    def visit_int(self, node, depth=0):
+        if node < 0:
+            raise ValueError(node)
+        return depth
+
+
+def nested(depth, leaf):
+    node = leaf
+    for _ in range(depth):
+        node = [node]
+    return node
+
+
+def test_deep_trees_do_not_recurse():
+    depth = 10 * sys.getrecursionlimit()
+    assert Depth().visit(nested(depth, 0)) == depth
+
+    value = 1
+    for _ in range(depth):
+        value = ITFList([value])
+    json = JsonSerializer().visit(value)
+    for _ in range(depth):
+        json = json[0]
+    assert json == 1
+
+
+def test_exceptions_propagate_through_parents():
+    class Recovering(Depth):
+        def visit_list(self, node, depth=0):
+            try:
+                return (yield from super().visit_list(node, depth))
+            except ValueError:
+                return "caught"
+
+    with pytest.raises(ValueError):
+        Depth().visit(nested(100, -1))
+    assert Recovering().visit([[1, [-1]]]) == "caught"
+
+
+def test_methods_are_looked_up_per_class():
+    class Doubling(Depth):
+        def visit_int(self, node, depth=0):
+            return 2 * depth
+
+    assert Depth().visit([[1], 2]) == 2
+    assert Doubling().visit([[1], 2]) == 4
+    with pytest.raises(AttributeError):
+        Depth().visit("no visit_str")